@@ -0,0 +1,27 @@
+from sf2db.app.app import App
+from sf2db.app.config import Configs
+from sf2db.salesforce import SFAdapters
+from sf2db.util.logging import logger
+from sf2db.util.path import absolute
+
+if __name__ == "__main__":
+    # Writes the tables of the mappings in salesforce_to_db.json to db_tables.json, derived from the describe of
+    # their Salesforce objects. Entries of tables that are not mapped are kept
+    log = logger()
+    log.info("Starting the generation of db_tables.json...")  
+    
+    this_file_path  = __file__
+
+    try: 
+        app = App(path_db_table_def=absolute (this_file_path, Configs.DB_TABLES), 
+                path_db_config=absolute (this_file_path, Configs.DB_COFIG), 
+                path_sf_credentials=absolute (this_file_path, Configs.SALESFORCE_CREDENTIALS), 
+                path_sf2db_mappings=absolute (this_file_path, Configs.SF2DB_MAPPINGS),
+                salesforce_client_adapter=SFAdapters.SimpleSalesforceAdapter,
+                path_sync_config=absolute (this_file_path, Configs.SYNC_CONFIG))
+        
+        app.generate_db_table_config()
+    except Exception as e:
+        log.critical(f"Unknown error occured in `src.generate_db_tables.py` : {str(e)}")  
+    else : 
+        log.info("Stopping the generation now....")  
@@ -17,14 +17,18 @@ if __name__ == "__main__":
     SF2DB_MAPPINGS_PATH = absolute (this_file_path, Configs.SF2DB_MAPPINGS)
     DB_TABLE_DEFINITIONS_PATH = absolute (this_file_path, Configs.DB_TABLES)
     DB_CONFIG_PATH = absolute (this_file_path, Configs.DB_COFIG)
+    SYNC_CONFIG_PATH = absolute (this_file_path, Configs.SYNC_CONFIG)
     SALESFORCE_CLIENT_ADAPTER = SFAdapters.SimpleSalesforceAdapter
+    SALESFORCE_BULK_CLIENT_ADAPTER = SFAdapters.BulkSalesforceAdapter
    
     try: 
         app = App(path_db_table_def=DB_TABLE_DEFINITIONS_PATH, 
                 path_db_config=DB_CONFIG_PATH, 
                 path_sf_credentials=SF_CREDENTIALS_PATH, 
                 path_sf2db_mappings=SF2DB_MAPPINGS_PATH,
-                salesforce_client_adapter=SALESFORCE_CLIENT_ADAPTER)
+                salesforce_client_adapter=SALESFORCE_CLIENT_ADAPTER,
+                path_sync_config=SYNC_CONFIG_PATH,
+                salesforce_bulk_client_adapter=SALESFORCE_BULK_CLIENT_ADAPTER)
         
         app.run()
     except Exception as e:
@@ -1,20 +1,52 @@
 
-from typing import List
+import functools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
+from sqlalchemy.orm import Session
+
+from sf2db.app.metrics import (stage_timer, timed_batches, write_json_report,
+                               write_prometheus_textfile)
+from sf2db.app.pipeline import run_pipeline
+from sf2db.app.plan import SyncPlan, compile_sync_plans
+from sf2db.app.spool import (pending_spool_files, read_spool, remove_spool,
+                             spool_file, write_spool)
+from sf2db.app.settings import (SyncSettings, SyncSettingsValueError,
+                                get_sync_settings)
+from sf2db.app.summary import MappingResult, log_summary
 from sf2db.db.model_factory import (DBTableGenerationError, generate_db_table,
                                     generate_db_table_definition)
 from sf2db.db.models import DBTable
 from sf2db.db.session import (DatabaseInitializationError,
                               DatabaseOperationError, DBSession,
-                              DuplicateRecordError)
+                              DuplicateRecordError, get_bulk_load_settings,
+                              get_engine_options)
+from sf2db.db.state import (Checkpoint, clear_checkpoint, deleted_records_key,
+                            get_checkpoint, get_watermark, set_checkpoint,
+                            set_watermark)
+from sf2db.db.loaders import LOADER_NATIVE, RowLoader, get_loader
+from sf2db.db.writer import (DEFAULT_INSERT_CHUNK_SIZE, WriteModeError,
+                             clear_table, delete_rows, is_empty)
 from sf2db.mapping.model_factory import MappingValueError, mapping_factory
 from sf2db.mapping.models import TableMapping
 from sf2db.salesforce.SFInterface import (SalesforceFetchError,
-                                          SalesforceLoginError, SFInterface)
-from sf2db.salesforce.soql import build_query
+                                          SalesforceLoginError,
+                                          SalesforceQueryResult, SFInterface)
+from sf2db.salesforce.chunking import split_id_ranges
+from sf2db.salesforce.describe import (DescribeCache, DescribeCacheError,
+                                       table_config_from_describe,
+                                       table_definition_from_describe,
+                                       validate_mapping)
+from sf2db.salesforce.http_session import create_http_session
+from sf2db.salesforce.soql import build_query, keyset_condition
+from sf2db.salesforce.throttle import RequestLimiter, RetryPolicy
 from sf2db.util import json_reader, yaml_reader
 from sf2db.util.logging import logger
-from sf2db.util.sf_to_db_converter import convert
+from sf2db.util.sf_to_db_converter import parse_sf_datetime
 
 log = logger()
     
@@ -24,7 +56,9 @@ class App:
                  path_sf2db_mappings: str,
                  path_db_table_def: str,
                  path_db_config: str,
-                 salesforce_client_adapter : SFInterface
+                 salesforce_client_adapter : SFInterface,
+                 path_sync_config: Optional[str] = None,
+                 salesforce_bulk_client_adapter : Optional[SFInterface] = None
                  ) -> None:
         log.debug("Instantiating src.sf2db.app.App")  
 
@@ -32,33 +66,74 @@ class App:
         self._path_sf2db_mappings = path_sf2db_mappings
         self._path_db_table_def = path_db_table_def
         self.path_db_config = path_db_config
+        self._path_sync_config = path_sync_config
 
         # Placehodlers of configs
         self._db_connection_str:str =""
+        self._insert_chunk_size:int = DEFAULT_INSERT_CHUNK_SIZE
+        self._loader : RowLoader
         self.sf2db_mappings : List [TableMapping]
-        self.db_tables : List[DBTable]
+        # Generated DBTables by table name
+        self.db_tables : Dict[str, DBTable] = {}
+        self.settings : SyncSettings = SyncSettings()
 
         self._sf_adapter = salesforce_client_adapter
+        self._sf_bulk_adapter = salesforce_bulk_client_adapter
 
         self.db_session = None
         self.sf_client :SFInterface = None
+        self.sf_bulk_client : Optional[SFInterface] = None
+        self.summary : List[MappingResult] = []
+        # Describe of each mapped Salesforce object and the problems found in mappings before any fetch, by mapping key
+        self._describes : Dict[str, Dict[str, Any]] = {}
+        self._mapping_errors : Dict[str, List[str]] = {}
+        # Compiled once the tables are generated, by mapping key
+        self._sync_plans : Dict[str, SyncPlan] = {}
 
     def _create_db_session(self):
         """ Loads the target db connection string from  `db_config` and create an instance of DB Session
         """
         try : 
-            self._db_connection_str = yaml_reader.read_yaml(self.path_db_config).get("connection-string")
-            self.db_session = DBSession(db_uri=self._db_connection_str)
+            _db_config = yaml_reader.read_yaml(self.path_db_config)
+            self._db_connection_str = _db_config.get("connection-string")
+            self._insert_chunk_size = _db_config.get("insert-chunk-size", DEFAULT_INSERT_CHUNK_SIZE)
+            if not isinstance(self._insert_chunk_size, int) or self._insert_chunk_size < 1:
+                raise DatabaseInitializationError(f"`insert-chunk-size` must be a positive integer. Value provided => {self._insert_chunk_size}")
+            self.db_session = DBSession(db_uri=self._db_connection_str, 
+                                        engine_options=get_engine_options(_db_config.get("pool")),
+                                        bulk_load_settings=get_bulk_load_settings(_db_config.get("bulk-load")))
+            # Chosen by the dialect of the connection string e.g. COPY on PostgreSQL
+            self._loader = get_loader(self.db_session.engine.dialect, 
+                                      chunk_size=self._insert_chunk_size,
+                                      loader=_db_config.get("loader", LOADER_NATIVE))
+            log.debug(f"Loading rows with `{type(self._loader).__name__}` for dialect `{self.db_session.engine.dialect.name}`")
         except (yaml_reader.YAMLFileNotFoundError, yaml_reader.YAMLFileNotFoundError) as e : 
             log.exception(f"Error loading `salesforce_to_db.json` file @ {self.path_db_config} : {str(e)}")  
             raise
-        except DatabaseInitializationError as e : 
+        except (DatabaseInitializationError, ValueError) as e : 
             log.exception(f"Error initialising database : {str(e)}")
             raise
         else : 
             log.info(f"Successfully initialized the database")
 
 
+    def _load_sync_settings(self):
+        """ Loads the optional tuning parameters from `sync_config.yaml`. Defaults are used when the file is absent """
+        if self._path_sync_config is None:
+            return
+        try:
+            self.settings = get_sync_settings(yaml_reader.read_yaml(self._path_sync_config))
+        except yaml_reader.YAMLFileNotFoundError:
+            log.info(f"No `sync_config.yaml` file @ {self._path_sync_config}; using default settings")
+        except yaml_reader.YAMLParseError as e:
+            log.exception(f"Error loading `sync_config.yaml` file @ {self._path_sync_config} : {str(e)}")
+            raise
+        except SyncSettingsValueError as e:
+            log.exception(f"Error creating `SyncSettings` from `sync_config.yaml` file @ {self._path_sync_config} : {str(e)}")
+            raise
+        else:
+            log.debug(f"Successfully loaded sync settings : {self.settings}")
+
     def _load_sf2db_mappings(self):
         """ Saves all mappings of Salesforce objects to DB Tables from `salesforce_to_db.json` """
         try: 
@@ -73,13 +148,59 @@ class App:
         else : 
             log.debug(f"Successfully mapped salesforce to databased tables")
      
+    def _load_describes(self):
+        """ Loads the describe of each mapped Salesforce object, from the cache while it is fresh,
+            and checks the fields of every mapping against it so bad mappings fail before any fetch
+
+            Without a Salesforce connection (`replay`) only cached describes are used
+            and mappings of objects that were never described are not checked
+        """
+        describe_cache = DescribeCache(self.settings.describe_cache_dir, ttl_seconds=self.settings.describe_cache_ttl)
+        mappings_by_object: Dict[str, List[TableMapping]] = {}
+        for mapping in self.sf2db_mappings:
+            mappings_by_object.setdefault(mapping.salesforce_object_name, []).append(mapping)
+        for object_name, mappings in mappings_by_object.items():
+            try:
+                describe = describe_cache.get(object_name, sf_client=self.sf_client)
+            except DescribeCacheError as e:
+                log.warning(f"Mappings of `{object_name}` are not validated : {str(e)}")
+                continue
+            except SalesforceFetchError as e:
+                log.exception(f"Error describing Salesforce object `{object_name}` : {str(e)}")
+                for mapping in mappings:
+                    self._mapping_errors[mapping.key] = [f"Error describing `{object_name}` : {str(e)}"]
+                continue
+
+            for mapping in mappings:
+                self._describes[mapping.key] = describe
+                problems = validate_mapping(describe, mapping)
+                if problems:
+                    self._mapping_errors[mapping.key] = problems
+                    log.error(f"Mapping `{mapping.key}` does not match Salesforce object `{object_name}` : {'; '.join(problems)}")
+        log.debug(f"Validated {len(self.sf2db_mappings)} mappings; {len(self._mapping_errors)} invalid")
+
+    def _derived_table_configs(self) -> List[Dict[str, Any]]:
+        """ `db_tables.json` entries derived from the describes of the valid mappings, one per table """
+        table_configs: Dict[str, Dict[str, Any]] = {}
+        for mapping in self.sf2db_mappings:
+            if mapping.key in self._describes and mapping.key not in self._mapping_errors:
+                table_configs.setdefault(mapping.db_table_name, table_config_from_describe(self._describes[mapping.key], mapping))
+        return list(table_configs.values())
+
     def _generate_db_tables(self):
-        """ Generates SQLAlchemy.Base classes based on definitions in `db_tables.json`"""
-        db_factory_fn = lambda definition_config: generate_db_table(db_table_definition=generate_db_table_definition(definition_config))
-            
+        """ Generates SQLAlchemy.Base classes based on definitions in `db_tables.json`
+            Tables of mappings missing from `db_tables.json` are derived from the describe of their Salesforce object
+        """
         try : 
             _config_data = json_reader.read_json(self._path_db_table_def)
-            self.db_tables = [db_factory_fn (definition_config=_t_def) for _t_def in _config_data]
+            for _t_def in _config_data:
+                db_table = generate_db_table(db_table_definition=generate_db_table_definition(_t_def))
+                self.db_tables[db_table.__tablename__] = db_table
+            for mapping in self.sf2db_mappings:
+                if mapping.db_table_name in self.db_tables or mapping.key not in self._describes or mapping.key in self._mapping_errors:
+                    continue
+                log.info(f"Deriving database table `{mapping.db_table_name}` from the describe of `{mapping.salesforce_object_name}`")
+                self.db_tables[mapping.db_table_name] = generate_db_table(db_table_definition=table_definition_from_describe(self._describes[mapping.key], mapping))
         except (json_reader.JSONFileNotFoundError, json_reader.JSONParseError) as e : 
             log.exception(f"Error loading `db_tables.json` file @ {self._path_db_table_def} : {str(e)}")  
             raise
@@ -91,15 +212,81 @@ class App:
         else : 
             log.debug(f"Successfully dynamically created DBTables subclasses using `db_tables.json` file @ {self._path_db_table_def} s")
 
+    def _compile_sync_plans(self):
+        """ Resolves each mapping against its DBTable once, so running it is a lookup of its `SyncPlan`
+            Mappings whose table is neither in `db_tables.json` nor derived fail without fetching
+        """
+        self._sync_plans = compile_sync_plans(self.sf2db_mappings, self.db_tables, checkpoint_interval=self.settings.checkpoint_interval)
+        for mapping in self.sf2db_mappings:
+            if mapping.key not in self._sync_plans and mapping.key not in self._mapping_errors:
+                self._mapping_errors[mapping.key] = [f"Database table `{mapping.db_table_name}` is not defined in `db_tables.json`"]
+                log.error(f"Mapping `{mapping.key}` has no database table `{mapping.db_table_name}` in `db_tables.json` @ {self._path_db_table_def}")
+        log.debug(f"Compiled {len(self._sync_plans)} sync plans")
+
+    def _create_db_schema(self):
+        """ Creates the tables of the generated DBTables and the sync state table once per run """
+        try:
+            self.db_session.create_schema()
+        except DatabaseInitializationError as e:
+            log.exception(f"Error creating database tables : {str(e)}")
+            raise
+        else:
+            log.debug(f"Successfully created database tables")
+
+    def _repair_tables(self):
+        """ Restores the tables of the mappings that a bulk load killed before it could restore them (e.g. by a crash 
+            of sf2db) left UNLOGGED or without their declared indexes. Run once at startup, before any mapping
+            A table that can not be repaired is logged and restored again after the load of its mapping
+        """
+        tables = {plan.db_table.__table__.name: plan.db_table.__table__ for plan in self._sync_plans.values()}
+        for table in tables.values():
+            try:
+                if self.db_session.restore_logged(table):
+                    log.warning(f"Switched database table `{table.name}` back to LOGGED, as an interrupted bulk load left it UNLOGGED")
+                created = self.db_session.create_indexes(table) if table.indexes else 0
+                if created:
+                    log.warning(f"Built {created} indexes of database table `{table.name}` that an interrupted bulk load left missing")
+            except (DuplicateRecordError, DatabaseOperationError) as e:
+                log.exception(f"Error repairing database table `{table.name}` : {str(e)}")
+
+    def _http_pool_size(self) -> int:
+        """ Salesforce requests that can be in flight at once : `max_concurrent_requests`, 
+            or one per mapping worker and `Id` range of the most chunked mapping
+        """
+        if self.settings.max_concurrent_requests:
+            return self.settings.max_concurrent_requests
+        return self.settings.max_workers * max([mapping.chunks or 1 for mapping in self.sf2db_mappings] + [1])
+
     def _create_salesforce_connection(self):
         """ Logins to Salesforce using client adapter `self._sf_adapter`.
             `self._sf_adapter` confines to `SFInterface`
         """
         try: 
             _credential_data = yaml_reader.read_yaml(self._path_sf_credentials)
+            # One limiter shared by both clients caps Salesforce requests across all worker threads
+            # and slows down every worker together as the daily API limit is approached
+            request_limiter = RequestLimiter(self.settings.max_concurrent_requests,
+                                             api_usage_slowdown=self.settings.api_usage_slowdown,
+                                             api_usage_slowdown_delay=self.settings.api_usage_slowdown_delay,
+                                             api_usage_stop=self.settings.api_usage_stop,
+                                             retry_policy=RetryPolicy(max_retries=self.settings.max_retries,
+                                                                      backoff_seconds=self.settings.retry_backoff_seconds))
+
+            # Both clients also share one pool of keep-alive connections, with a connection for each request that can be in flight
+            http_session = create_http_session(self._http_pool_size())
+
             self.sf_client = self._sf_adapter(_credential_data)
+            self.sf_client.request_limiter = request_limiter
+            self.sf_client.http_session = http_session
             self.sf_client.login()
 
+            # Bulk API client is only needed when large objects are routed to it
+            if self._sf_bulk_adapter is not None and self.settings.bulk_api_threshold is not None:
+                self.sf_bulk_client = self._sf_bulk_adapter(_credential_data)
+                self.sf_bulk_client.request_limiter = request_limiter
+                self.sf_bulk_client.http_session = http_session
+                self.sf_bulk_client.login()
+
         except (yaml_reader.YAMLFileNotFoundError, yaml_reader.YAMLFileNotFoundError) as e : 
             log.exception(f"Error loading `salesforce_credentatials.yaml` file @ {self._path_sf2db_mappings} : {str(e)}") 
             raise
@@ -110,7 +297,291 @@ class App:
             log.debug(f"Successfully logged into Salesforce")
      
     
-    def _persist_salesforce_to_db(self, mapping: TableMapping) -> None:
+    def _read_sync_state(self, mapping: TableMapping, checkpointed: bool) -> Tuple[Optional[datetime], Optional[Checkpoint]]:
+        """ Reads the last committed watermark of an incremental mapping and the checkpoint of an unfinished run """
+        with self.db_session as db_session:
+            watermark = get_watermark(db_session, mapping_key=mapping.key) if mapping.sync_mode == "incremental" else None
+            checkpoint = get_checkpoint(db_session, mapping_key=mapping.key) if checkpointed else None
+        log.debug(f"Sync state of `{mapping.key}` : watermark on `{mapping.watermark_field}` {watermark}, checkpoint {checkpoint}")
+        return watermark, checkpoint
+
+    def _is_full_load(self, mapping: TableMapping, db_table: DBTable, checkpoint: Optional[Checkpoint]) -> bool:
+        """ Whether the run writes every row of the table i.e. replaces its rows or fills it for the first time
+            A resumed run keeps the rows committed before the interruption, so it is not a full load
+        """
+        if checkpoint is not None:
+            return False
+        if mapping.write_mode == "replace":
+            return True
+        with self.db_session as db_session:
+            return is_empty(db_session, db_table=db_table)
+
+    def _build_indexes(self, mapping: TableMapping, db_table: DBTable, result: MappingResult) -> None:
+        """ Creates the indexes of the table a deferred build, or an interrupted earlier run, left missing """
+        started = time.perf_counter()
+        try:
+            created = self.db_session.create_indexes(db_table.__table__)
+        except (DuplicateRecordError, DatabaseOperationError) as e:
+            log.exception(f"Error building the indexes of database table `{mapping.db_table_name}` : {str(e)}")
+            result.succeeded = False
+            result.error = result.error or f"Error building indexes : {str(e)}"
+            return
+        if created:
+            log.info(f"Built {created} indexes of database table `{mapping.db_table_name}` in {time.perf_counter() - started:.2f}s")
+
+    def _propagate_deletes(self, mapping: TableMapping, db_table: DBTable, result: MappingResult) -> None:
+        """ Deletes the rows of records deleted or merged away in Salesforce since the last run, 
+            or sets their `IsDeleted` column with `delete_mode: soft`
+
+            Deleted records are read with `queryAll` in `watermark_field` order. Their own watermark is committed 
+            with the deletes, so deletes that fail are looked up again by the next run
+        """
+        state_key = deleted_records_key(mapping.key)
+        with self.db_session as db_session:
+            deleted_since = get_watermark(db_session, mapping_key=state_key)
+        where_clauses: List[Any] = ["IsDeleted = true"]
+        if deleted_since is not None:
+            where_clauses.append((mapping.watermark_field, ">", deleted_since))
+        soql_query = build_query(object_name=mapping.salesforce_object_name,
+                                 columns=["Id", mapping.watermark_field],
+                                 where_clauses=where_clauses,
+                                 order_by=(mapping.watermark_field, "ASC"),
+                                 limit=None)
+        flag_column = mapping.column_of("IsDeleted") if mapping.delete_mode == "soft" else None
+
+        last_deleted = None
+        with stage_timer(result, "delete_seconds"), self.db_session as db_session:
+            for sf_batch in self.sf_client.query_iter(soql_query, batch_size=self.settings.fetch_batch_size, include_deleted=True):
+                result.rows_deleted += delete_rows(db_session, db_table,
+                                                   key_column=mapping.column_of("Id"),
+                                                   keys=[record["Id"] for record in sf_batch],
+                                                   flag_column=flag_column,
+                                                   chunk_size=self._insert_chunk_size)
+                last_deleted = sf_batch[-1][mapping.watermark_field] or last_deleted
+            if last_deleted:
+                set_watermark(db_session, 
+                              mapping_key=state_key, 
+                              watermark_field=mapping.watermark_field, 
+                              watermark=parse_sf_datetime(last_deleted))
+        log.info(f"{'Flagged' if flag_column else 'Deleted'} {result.rows_deleted} rows of `{mapping.db_table_name}` whose records were deleted in Salesforce")
+
+    def _select_sf_client(self, mapping: TableMapping, where_clauses, expected_count: Optional[int] = None) -> SFInterface:
+        """ Picks the Bulk API client when the mapping is expected to return more records than `bulk_api_threshold`
+            Records are counted with a `COUNT()` query unless `expected_count` is known already
+        """
+        if self.sf_bulk_client is None:
+            return self.sf_client
+
+        if expected_count is None:
+            count_query = build_query(
+                object_name=mapping.salesforce_object_name,
+                columns=["COUNT()"],
+                where_clauses=where_clauses,
+                limit=None)
+            try:
+                expected_count = self.sf_client.count(count_query)
+            except SalesforceFetchError as e:
+                log.warning(f"Error counting records of `{mapping.salesforce_object_name}`; Falling back to the default client : {str(e)}")
+                return self.sf_client
+
+        if expected_count > self.settings.bulk_api_threshold:
+            log.info(f"Using Bulk API for `{mapping.salesforce_object_name}` : {expected_count} records expected")
+            return self.sf_bulk_client
+        return self.sf_client
+
+    def _fetch_batches(self,
+                       mapping: TableMapping,
+                       soql_query: str,
+                       where_clauses: List[Any],
+                       result: MappingResult,
+                       spool: Optional[Path] = None,
+                       expected_count: Optional[int] = None) -> Iterable[List[SalesforceQueryResult]]:
+        """ Record batches of `soql_query`. Streamed from Salesforce as they are consumed, 
+            or fetched into the `spool` file first and read back from it when staging is enabled.
+            `expected_count` is the number of records the query is known to return, if any
+        """
+        sf_client = self._select_sf_client(mapping, where_clauses, expected_count=expected_count)
+        sf_batches = timed_batches(sf_client.query_iter(soql_query, batch_size=self.settings.fetch_batch_size), result)
+        if spool is None:
+            return sf_batches
+        # Fetched in full before the DB transaction opens; the file is kept until its records are committed
+        spooled = write_spool(spool, sf_batches)
+        log.debug(f"Staged {spooled} records of `{mapping.key}` in {spool}")
+        return read_spool(spool, batch_size=self.settings.fetch_batch_size)
+
+    def _load_batches(self,
+                      mapping: TableMapping,
+                      db_table: DBTable,
+                      converter: Callable[[SalesforceQueryResult], Dict[str, Any]],
+                      sf_batches: Iterable[List[SalesforceQueryResult]],
+                      result: MappingResult,
+                      checkpoint: Optional[Checkpoint] = None,
+                      checkpointed: bool = False,
+                      on_complete: Optional[Callable[[Session, str], None]] = None,
+                      spool: Optional[Path] = None,
+                      bulk_load: bool = False,
+                      concurrent: bool = False) -> str:
+        """ Converts record batches and writes them to `db_table` batch by batch
+            so memory stays bounded by `fetch_batch_size`
+
+            Batches are committed together when the `with` block exits, after `on_complete` has staged any state
+            that must be committed with them. When `checkpointed` they are also committed every `checkpoint_interval`
+            batches along with the position of the last record. The `spool` file the batches are read from is
+            deleted once they are committed. With `bulk_load` the transaction runs on a connection with 
+            the `bulk-load` settings of db_config.yaml, short of those that would lock out the other loads running
+            when `concurrent` or `max_workers` is above 1. Returns the highest watermark value fetched.
+            On failure `result.rows_written` is left at the number of rows actually committed
+        """
+        def convert_batch(sf_batch: List[SalesforceQueryResult]) -> Tuple[List[Dict[str, Any]], str, Optional[SalesforceQueryResult]]:
+            """ Converts a fetched batch into plain row dicts plus the batch's highest watermark value and last record """
+            with stage_timer(result, "convert_seconds"):
+                rows = [converter(record) for record in sf_batch]
+                batch_max = ""
+                if mapping.sync_mode == "incremental":
+                    # Salesforce timestamps share one format and offset so they sort as strings
+                    batch_max = max((record.get(mapping.watermark_field) or "" for record in sf_batch), default="")
+            return rows, batch_max, (sf_batch[-1] if sf_batch else None)
+
+        max_watermark = ""
+        rows_committed = 0
+        try: 
+            with self.db_session.bulk_load(enabled=bulk_load, concurrent=concurrent or self.settings.max_workers > 1), self.db_session as db_session:
+                # Deleted in the same transaction so the old rows remain if the load fails
+                # A resumed run keeps the rows committed before the interruption
+                if mapping.write_mode == "replace" and checkpoint is None:
+                    clear_table(db_session, db_table=db_table)
+
+                batches_since_commit = 0
+
+                def write_batch(converted_batch: Tuple[List[Dict[str, Any]], str, Optional[SalesforceQueryResult]]) -> None:
+                    nonlocal max_watermark, rows_committed, batches_since_commit
+                    rows, batch_max, last_record = converted_batch
+                    # Converted records are plain row dicts inserted without creating ORM objects
+                    with stage_timer(result, "insert_seconds"):
+                        result.rows_written += self._loader.load(db_session, 
+                                                                 db_table=db_table,
+                                                                 rows=rows,
+                                                                 write_mode=mapping.write_mode)
+                    max_watermark = max(max_watermark, batch_max)
+
+                    batches_since_commit += 1
+                    if not checkpointed or last_record is None or batches_since_commit < self.settings.checkpoint_interval:
+                        return
+                    last_watermark = last_record.get(mapping.watermark_field) if mapping.sync_mode == "incremental" else None
+                    # The checkpoint is committed with the records it covers
+                    set_checkpoint(db_session, 
+                                   mapping_key=mapping.key,
+                                   last_id=last_record["Id"],
+                                   last_watermark=parse_sf_datetime(last_watermark) if last_watermark else None,
+                                   rows_committed=result.rows_written + (checkpoint.rows_committed if checkpoint else 0))
+                    with stage_timer(result, "commit_seconds"):
+                        db_session.commit()
+                    rows_committed = result.rows_written
+                    batches_since_commit = 0
+
+                if self.settings.pipeline:
+                    # Fetching, converting and writing overlap; bounded queues keep memory flat
+                    run_pipeline(sf_batches, 
+                                 convert_batch=convert_batch, 
+                                 write_batch=write_batch,
+                                 max_queued_batches=self.settings.pipeline_queue_size)
+                else:
+                    for sf_batch in sf_batches:
+                        write_batch(convert_batch(sf_batch))
+
+                if on_complete is not None:
+                    on_complete(db_session, max_watermark)
+
+                # The transaction commits as the `with` block exits
+                commit_started = time.perf_counter()
+            result.commit_seconds += time.perf_counter() - commit_started
+        except Exception:
+            result.rows_written = rows_committed
+            if spool is not None:
+                log.warning(f"Records of `{mapping.key}` are kept in {spool} to be loaded again without fetching them")
+            raise
+        remove_spool(spool)
+        return max_watermark
+
+    def _replay_spool_files(self,
+                            mapping: TableMapping,
+                            db_table: DBTable,
+                            converter: Callable[[SalesforceQueryResult], Dict[str, Any]],
+                            result: MappingResult,
+                            on_complete: Callable[[Session, str], None]) -> None:
+        """ Loads the spool files a failed earlier load of the mapping left behind, each in its own transaction
+
+            Only the file of a mapping fetched with one query holds every record of its run, so only it completes
+            the run with `on_complete`. A chunk file holds a single `Id` range; the other ranges of its run may not have
+            been fetched at all, so the watermark is left for the next run that fetches and commits every range
+        """
+        complete_run = spool_file(self.settings.spool_dir, mapping.key, "records")
+
+        def replayed_batches(spool: Path) -> Iterator[List[SalesforceQueryResult]]:
+            for sf_batch in read_spool(spool, batch_size=self.settings.fetch_batch_size):
+                result.rows_fetched += len(sf_batch)
+                yield sf_batch
+
+        for spool in pending_spool_files(self.settings.spool_dir, mapping.key):
+            log.info(f"Loading records of `{mapping.key}` staged by an earlier run from {spool}")
+            self._load_batches(mapping, db_table, converter,
+                               replayed_batches(spool),
+                               result,
+                               on_complete=on_complete if spool == complete_run else None,
+                               spool=spool)
+
+    def _load_in_chunks(self,
+                        mapping: TableMapping,
+                        db_table: DBTable,
+                        converter: Callable[[SalesforceQueryResult], Dict[str, Any]],
+                        fields: List[str],
+                        where_clauses: List[Any],
+                        result: MappingResult,
+                        bulk_load: bool = False) -> str:
+        """ Splits the records of the mapping into `mapping.chunks` ranges of `Id` and loads the ranges concurrently
+
+            Each range is fetched by its own query and written in its own transaction on its own thread.
+            Ranges that succeed stay committed when another fails. Returns the highest watermark value fetched
+        """
+        # Split with a few `LIMIT 1` and `COUNT()` queries of the REST API, without reading the records
+        split_at = time.perf_counter()
+        ranges = split_id_ranges(self.sf_client,
+                                 object_name=mapping.salesforce_object_name,
+                                 chunks=mapping.chunks,
+                                 where_clauses=where_clauses)
+        log.info(f"Split `{mapping.key}` into {len(ranges)} Id ranges of {[id_range.count for id_range in ranges]} records "
+                 f"in {time.perf_counter() - split_at:.2f}s")
+        if not ranges:
+            return ""
+
+        chunk_results = [MappingResult(mapping_key=f"{mapping.key}[{index}]") for index in range(len(ranges))]
+
+        def load_chunk(index: int) -> str:
+            chunk_where_clauses = where_clauses + ranges[index].where_clauses()
+            with stage_timer(chunk_results[index], "soql_build_seconds"):
+                soql_query = build_query(object_name=mapping.salesforce_object_name,
+                                         columns=fields,
+                                         where_clauses=chunk_where_clauses,
+                                         limit=None)
+            try:
+                spool = spool_file(self.settings.spool_dir, mapping.key, f"chunk-{index:03d}") if self.settings.spool_dir else None
+                # Counted when the ranges were split, so the Bulk API is picked without counting again
+                sf_batches = self._fetch_batches(mapping, soql_query, chunk_where_clauses, chunk_results[index], 
+                                                 spool=spool, expected_count=ranges[index].count)
+                return self._load_batches(mapping, db_table, converter, sf_batches, chunk_results[index], 
+                                          spool=spool, bulk_load=bulk_load, concurrent=len(ranges) > 1)
+            except Exception as e:
+                log.error(f"Error loading chunk {index} of `{mapping.key}` using SOQL query : {soql_query} : {str(e)}")
+                raise
+
+        # Leaving the executor waits for every chunk, so failed chunks do not cut the others short
+        with ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix="sf2db-chunk") as executor:
+            futures = [executor.submit(load_chunk, index) for index in range(len(ranges))]
+        for chunk_result in chunk_results:
+            result.add_metrics(chunk_result)
+        return max(future.result() for future in futures)
+
+    def _persist_salesforce_to_db(self, mapping: TableMapping, fetch: bool = True) -> MappingResult:
         """ Main function that downloads data for given `TableMapping` entry 
             in `salesforce_to_db.json`and saves in the database
 
@@ -119,50 +590,171 @@ class App:
             1. Creating the SOQL query string
             2. Fetching the data from Salesforce
             3. Coverting Salesforce results to be compatible with DBTable 
-            4. Bulk inserts
-        """
-        # Extract field/column names
-        _sf_object_fields = [sf_fields.saleforce_field for sf_fields in mapping.col_mappings]
-        _db_table_columns =[db_columns.db_column_name for db_columns in mapping.col_mappings]
-
-        # Find the matching DB table
-        db_table: DBTable = next(
-                            (dbt for dbt in self.db_tables 
-                                  if dbt.__tablename__ == mapping.db_table_name), 
-                                  None) 
-        # Build SOQL query
-        # TODO : make it a helper function of TableMapping ?
-        soql_query = build_query(
-            object_name=mapping.salesforce_object_name,
-            columns=_sf_object_fields)
-        
-        # Fetch Salesforce results
+            4. Bulk inserts/upserts with the loader of the database dialect (`db.loaders`) as per `mapping.write_mode`
+
+            Steps 2-4 run batch by batch as results are streamed from Salesforce,
+            either one after another or overlapping when `pipeline` is enabled
+            Incremental mappings only fetch records changed since their watermark and
+            advance it in the same transaction as the inserted records
+            With `checkpoint_interval` set, batches are committed as they go along with the
+            position of the last record, and an interrupted mapping resumes from that position
+            With `mapping.chunks` set, steps 1-4 run concurrently for ranges of `Id` instead,
+            and the watermark is advanced once every range is written
+            With `defer_index_build` set, the non-unique indexes of the table are dropped before a full load
+            and built once its rows are written. Full loads also run with the `bulk-load` settings of db_config.yaml
+            With `mapping.delete_mode` set, rows of records deleted in Salesforce are then deleted or flagged
+            With `spool_dir` set, step 2 writes the records to a spool file that steps 3-4 read back.
+            Spool files left by failed loads are loaded first; only these are loaded when `fetch` is False
+
+            Safe to run for several mappings at once on separate threads.
+            Returns the `MappingResult` of the mapping for the run summary
+        """
+        result = MappingResult(mapping_key=mapping.key, 
+                               salesforce_object_name=mapping.salesforce_object_name,
+                               db_table_name=mapping.db_table_name)
+        started = time.perf_counter()
+
+        # Table, fields, key order and converter of the mapping, compiled once at startup
+        plan = self._sync_plans[mapping.key]
+        db_table, converter, key_fields = plan.db_table, plan.converter, plan.key_fields
+
+        checkpoint: Optional[Checkpoint] = None
+
+        def complete(db_session: Session, max_watermark: str) -> None:
+            """ Stages the new watermark and drops the checkpoint once every record of the run is written """
+            # Records fetched before a resume sort before the checkpoint, so it is the floor of the new watermark
+            new_watermark = parse_sf_datetime(max_watermark) if max_watermark else None
+            if new_watermark is None and checkpoint is not None:
+                new_watermark = checkpoint.last_watermark
+            if new_watermark is not None:
+                set_watermark(db_session, 
+                              mapping_key=mapping.key, 
+                              watermark_field=mapping.watermark_field, 
+                              watermark=new_watermark)
+            # Also removes a checkpoint left behind by a run with a different `checkpoint_interval`
+            clear_checkpoint(db_session, mapping_key=mapping.key)
+
+        soql_query = None
+        full_load = False
+        unlogged = False
         try: 
-            sf_results = self.sf_client.query(soql_query)
+            # Staged records are loaded before the sync state is read, so they move the watermark on
+            # and the records are not fetched again. A database that is still unavailable fails here, before fetching
+            if self.settings.spool_dir:
+                self._replay_spool_files(mapping, db_table, converter, result, on_complete=complete)
+            if fetch:
+                watermark, checkpoint = self._read_sync_state(mapping, plan.checkpointed)
+                # Incremental mappings only fetch records changed since the last committed watermark
+                where_clauses = []
+                if watermark is not None:
+                    where_clauses.append((mapping.watermark_field, ">", watermark))
+                if checkpoint is not None and mapping.sync_mode == "incremental" and checkpoint.last_watermark is None:
+                    log.warning(f"Ignoring the checkpoint of `{mapping.key}` as it has no `{mapping.watermark_field}` value")
+                    checkpoint = None
+                # Only used to resume and derived from the fetched records, not needed in the filter of chunks 
+                resume_clauses = []
+                if checkpoint is not None:
+                    key_values = [checkpoint.last_watermark, checkpoint.last_id] if mapping.sync_mode == "incremental" else [checkpoint.last_id]
+                    resume_clauses.append(keyset_condition(key_fields, key_values))
+                    log.info(f"Resuming `{mapping.key}` after record `{checkpoint.last_id}`; {checkpoint.rows_committed} rows were committed by an earlier run")
+
+                full_load = self._is_full_load(mapping, db_table, checkpoint)
+                # Indexes and logging are restored once after the load below in `finally`, whether or not it succeeds
+                if full_load and self.settings.defer_index_build and any(not index.unique for index in db_table.__table__.indexes):
+                    dropped = self.db_session.drop_indexes(db_table.__table__)
+                    log.debug(f"Dropped {dropped} indexes of `{mapping.db_table_name}` until the full load of `{mapping.key}` is written")
+                if full_load and self.db_session.set_logged(db_table.__table__, logged=False):
+                    unlogged = True
+                    log.debug(f"Switched `{mapping.db_table_name}` to UNLOGGED for the full load of `{mapping.key}`")
+
+                if plan.chunked:
+                    max_watermark = self._load_in_chunks(mapping, db_table, converter, plan.salesforce_fields, where_clauses, result, bulk_load=full_load)
+                    with self.db_session as db_session:
+                        complete(db_session, max_watermark)
+                else:
+                    with stage_timer(result, "soql_build_seconds"):
+                        soql_query = plan.build_query(where_clauses + resume_clauses)
+                    spool = spool_file(self.settings.spool_dir, mapping.key, "records") if self.settings.spool_dir else None
+                    sf_batches = self._fetch_batches(mapping, soql_query, where_clauses + resume_clauses, result, spool=spool)
+                    # Committed together with the records so the watermark never runs ahead of the data
+                    self._load_batches(mapping, db_table, converter, sf_batches, result,
+                                       checkpoint=checkpoint,
+                                       checkpointed=plan.checkpointed,
+                                       on_complete=complete,
+                                       spool=spool,
+                                       bulk_load=full_load)
+                # After the load, so a record deleted while it was fetched is not written back
+                if mapping.delete_mode != "none":
+                    self._propagate_deletes(mapping, db_table, result)
         except SalesforceFetchError as e:
             log.exception(f"Error fetching salesforce data using SOQL query : {soql_query}")
-        else : 
-            log.debug(f"Successfully fetched salesforce data using SOQL query : {soql_query}")
-
-        # Prepare records for DB insertion
-        try: 
-            db_records = [
-            db_table(**convert(
-                sf_data=record,
-                salesforce_fields=_sf_object_fields,
-                db_columns=_db_table_columns
-            ))
-            for record in sf_results]
-
-            # Bulk insert records into the database
-            with self.db_session as db_session:            
-                    db_session.add_all(db_records)
+            result.error = f"Error fetching salesforce data : {str(e)}"
+        except OSError as e:
+            log.exception(f"Error staging records of `{mapping.key}` in `{self.settings.spool_dir}` : {str(e)}")
+            result.error = f"Error staging records : {str(e)}"
+        except DatabaseInitializationError as e:
+            log.exception(f"Error opening a database session for `{mapping.key}` : {str(e)}")
+            result.error = f"Error opening a database session : {str(e)}"
         except (DuplicateRecordError ) as e: 
             log.error(f"Error saving records to the database table `{mapping.db_table_name}`; Duplicate records")
+            result.error = "Duplicate records"
+        except WriteModeError as e:
+            log.error(f"Error saving records to the database table `{mapping.db_table_name}` : {str(e)}")
+            result.error = str(e)
         except DatabaseOperationError as e:
             log.exception(f"Error saving records to the database : Other transaction error {e}")
+            result.error = f"Other transaction error : {str(e)}"
         else: 
             log.info(f"Successfully stored records from Salesforce object : `{mapping.salesforce_object_name}` into database table : `{mapping.db_table_name}`")
+            result.succeeded = True
+        finally:
+            # Also after errors not handled above (e.g. of the converter) and interrupts, which would otherwise leave 
+            # the table UNLOGGED and without its indexes for every later run that is not a full load
+            if unlogged:
+                try:
+                    self.db_session.set_logged(db_table.__table__, logged=True)
+                except DatabaseOperationError as e:
+                    log.exception(f"Error switching database table `{mapping.db_table_name}` back to LOGGED : {str(e)}")
+                    result.succeeded = False
+                    result.error = result.error or f"Error switching the table back to LOGGED : {str(e)}"
+            if db_table.__table__.indexes:
+                self._build_indexes(mapping, db_table, result)
+
+        # Only rows committed at a checkpoint or by a finished chunk are kept when the mapping fails
+        if not result.succeeded:
+            result.rows_rejected = max(result.rows_fetched - result.rows_written, 0)
+        result.duration_seconds = time.perf_counter() - started
+        return result
+
+    def _run_mapping(self, mapping: TableMapping, fetch: bool = True) -> MappingResult:
+        """ Runs one mapping, turning unexpected errors into a failed result so the other mappings carry on
+            Mappings found invalid against the describe of their Salesforce object fail without fetching
+        """
+        if mapping.key in self._mapping_errors:
+            return MappingResult(mapping_key=mapping.key, 
+                                 salesforce_object_name=mapping.salesforce_object_name,
+                                 db_table_name=mapping.db_table_name,
+                                 error=f"Invalid mapping : {'; '.join(self._mapping_errors[mapping.key])}")
+        try:
+            return self._persist_salesforce_to_db(mapping = mapping, fetch = fetch)
+        except Exception as e:
+            log.exception(f"Unexpected error syncing `{mapping.key}` : {str(e)}")
+            return MappingResult(mapping_key=mapping.key, 
+                                 salesforce_object_name=mapping.salesforce_object_name,
+                                 db_table_name=mapping.db_table_name,
+                                 error=f"Unexpected error : {str(e)}")
+
+    def _export_metrics(self, started_at: datetime, finished_at: datetime) -> None:
+        """ Writes the run report and Prometheus textfile when configured. A failed export does not fail the run """
+        try:
+            if self.settings.report_json_path:
+                write_json_report(self.settings.report_json_path, self.summary, started_at=started_at, finished_at=finished_at)
+                log.debug(f"Run report written to {self.settings.report_json_path}")
+            if self.settings.prometheus_textfile_path:
+                write_prometheus_textfile(self.settings.prometheus_textfile_path, self.summary, finished_at=finished_at)
+                log.debug(f"Prometheus metrics written to {self.settings.prometheus_textfile_path}")
+        except OSError as e:
+            log.exception(f"Error exporting run metrics : {str(e)}")
             
     def run(self):
         log.info("Starting src.sf2db.app.App.run()")  
@@ -175,11 +767,83 @@ class App:
 
             This method encapsulates the complete data synchronization process.
         """
+        self._load_sync_settings()
         self._create_db_session()
         self._load_sf2db_mappings()
+        # Logged in first so the describes that validate the mappings and derive missing tables can be fetched
+        self._create_salesforce_connection()
+        self._load_describes()
         self._generate_db_tables()
+        self._compile_sync_plans()
+        self._create_db_schema()
+        self._repair_tables()
+        self._run_mappings(fetch=True)
+
+    def replay(self):
+        """ Loads the records staged in `spool_dir` by failed loads, without connecting to Salesforce
+
+            Lets the records be loaded once the database is available again without spending API calls
+        """
+        log.info("Starting src.sf2db.app.App.replay()")
+        self._load_sync_settings()
+        if not self.settings.spool_dir:
+            log.error(f"`spool-dir` is not set in `sync_config.yaml` @ {self._path_sync_config}; Nothing to replay")
+            return
+        self._create_db_session()
+        self._load_sf2db_mappings()
+        self._load_describes()
+        self._generate_db_tables()
+        self._compile_sync_plans()
+        self._create_db_schema()
+        self._repair_tables()
+        self._run_mappings(fetch=False)
+
+    def generate_db_table_config(self, path_output: Optional[str] = None):
+        """ Writes the `db_tables.json` entries of the mapped tables, derived from the describes of their Salesforce objects,
+            to `path_output` (default `db_tables.json` itself)
+
+            Entries of the mapped tables are replaced, keeping their `indexes` and `unique_constraints`, and entries of other tables are kept
+        """
+        log.info("Starting src.sf2db.app.App.generate_db_table_config()")
+        path_output = path_output or self._path_db_table_def
+        self._load_sync_settings()
+        self._load_sf2db_mappings()
         self._create_salesforce_connection()
+        self._load_describes()
 
-        for mapping in self.sf2db_mappings:
-            self._persist_salesforce_to_db(mapping = mapping)
+        derived = self._derived_table_configs()
+        derived_names = {table_config["tablename"] for table_config in derived}
+        try:
+            _config_data = json_reader.read_json(self._path_db_table_def)
+        except json_reader.JSONFileNotFoundError:
+            _config_data = []
+        kept = [table_config for table_config in _config_data if table_config.get("tablename") not in derived_names]
+        # Indexes and constraints are not part of the describe, so those declared by hand are carried over
+        for table_config in _config_data:
+            for derived_config in derived:
+                if derived_config["tablename"] == table_config.get("tablename"):
+                    derived_config.update({key: table_config[key] for key in ("indexes", "unique_constraints") if key in table_config})
+        Path(path_output).write_text(json.dumps(kept + derived, indent=4), encoding="utf-8")
+        log.info(f"Wrote {len(derived)} derived table definitions to {path_output}; {len(self._mapping_errors)} mappings skipped as invalid")
+
+    def _run_mappings(self, fetch: bool) -> None:
+        """ Runs every mapping, in parallel when `max_workers` > 1, then logs and exports the summary """
+        started_at = datetime.now(timezone.utc)
+        run_mapping = functools.partial(self._run_mapping, fetch=fetch)
+        try:
+            if self.settings.max_workers > 1:
+                # Each worker opens its own DB session and shares the logged in Salesforce clients
+                with ThreadPoolExecutor(max_workers=self.settings.max_workers, thread_name_prefix="sf2db-mapping") as executor:
+                    self.summary = list(executor.map(run_mapping, self.sf2db_mappings))
+            else:
+                self.summary = [run_mapping(mapping) for mapping in self.sf2db_mappings]
+        finally:
+            # The engine and its connection pool are shared by all mappings
+            self.db_session.dispose()
+
+        log_summary(log, self.summary)
+        api_usage = self.sf_client.request_limiter.api_usage if self.sf_client is not None else None
+        if api_usage:
+            log.info(f"Daily Salesforce API usage : {api_usage[0]} of {api_usage[1]} requests")
+        self._export_metrics(started_at=started_at, finished_at=datetime.now(timezone.utc))
             
\ No newline at end of file
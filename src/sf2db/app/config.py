@@ -7,5 +7,6 @@ class Configs(StrEnum):
     SF2DB_MAPPINGS = '../config/salesforce_to_db.json'
     DB_TABLES = '../config/db_tables.json'
     DB_COFIG = '../config/db_config.yaml'
+    SYNC_CONFIG = '../config/sync_config.yaml'
     LOGGER_CONFIG = '../config/logger_config.json'
     LOGGER_APP_NAME = "sf2db-logger"
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""
+    Instrumentation of `App._persist_salesforce_to_db` and exports of the collected `MappingResult`s
+    as a JSON run report and a Prometheus textfile (node_exporter textfile collector format)
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable, Iterator, List
+
+from sf2db.app.summary import MappingResult
+
+
+@contextmanager
+def stage_timer(result: MappingResult, attribute: str) -> Iterator[None]:
+    """ Adds the time spent in the `with` block to the `attribute` seconds of `result` """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(result, attribute, getattr(result, attribute) + time.perf_counter() - started)
+
+
+def timed_batches(batches: Iterable[List[Any]], result: MappingResult) -> Iterator[List[Any]]:
+    """ Passes batches through while recording the fetch latency and size of each """
+    iterator = iter(batches)
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                batch = next(iterator)
+            except StopIteration:
+                return
+            result.fetch_batch_seconds.append(time.perf_counter() - started)
+            result.rows_fetched += len(batch)
+            yield batch
+    finally:
+        close = getattr(iterator, "close", None)
+        if close:
+            close()
+
+
+def _write_atomically(path: str, content: str) -> None:
+    """ Readers such as the node_exporter textfile collector never see a half written file """
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temporary = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    temporary.write_text(content, encoding="utf-8")
+    os.replace(temporary, target)
+
+
+def write_json_report(path: str, results: List[MappingResult], started_at: datetime, finished_at: datetime) -> None:
+    """ Writes every metric of the run to a JSON file """
+    report = {
+        "started_at": started_at.isoformat(),
+        "finished_at": finished_at.isoformat(),
+        "duration_seconds": (finished_at - started_at).total_seconds(),
+        "mappings": [dict(asdict(result), fetch_seconds=result.fetch_seconds) for result in results],
+    }
+    _write_atomically(path, json.dumps(report, indent=2))
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def write_prometheus_textfile(path: str, results: List[MappingResult], finished_at: datetime) -> None:
+    """ Writes gauges per mapping in the Prometheus text exposition format """
+    gauges = {
+        "sf2db_mapping_success": ("1 if the last sync of the mapping succeeded", lambda r: int(r.succeeded)),
+        "sf2db_mapping_duration_seconds": ("Wall clock time of the last sync of the mapping", lambda r: r.duration_seconds),
+        "sf2db_rows_fetched": ("Rows fetched from Salesforce", lambda r: r.rows_fetched),
+        "sf2db_rows_written": ("Rows written to the database", lambda r: r.rows_written),
+        "sf2db_rows_rejected": ("Fetched rows not stored because the mapping failed", lambda r: r.rows_rejected),
+        "sf2db_rows_deleted": ("Rows deleted or flagged because their records were deleted in Salesforce", lambda r: r.rows_deleted),
+        "sf2db_fetch_batches": ("Batches fetched from Salesforce", lambda r: len(r.fetch_batch_seconds)),
+        "sf2db_fetch_batch_seconds_max": ("Slowest batch fetched from Salesforce", lambda r: max(r.fetch_batch_seconds, default=0.0)),
+    }
+    stages = {
+        "soql_build": lambda r: r.soql_build_seconds,
+        "fetch": lambda r: r.fetch_seconds,
+        "convert": lambda r: r.convert_seconds,
+        "insert": lambda r: r.insert_seconds,
+        "commit": lambda r: r.commit_seconds,
+        "delete": lambda r: r.delete_seconds,
+    }
+
+    def labels(result: MappingResult) -> str:
+        return (f'mapping="{_escape_label(result.mapping_key)}",'
+                f'salesforce_object="{_escape_label(result.salesforce_object_name)}",'
+                f'db_table="{_escape_label(result.db_table_name)}"')
+
+    lines = []
+    for name, (description, value) in gauges.items():
+        lines += [f"# HELP {name} {description}", f"# TYPE {name} gauge"]
+        lines += [f"{name}{{{labels(result)}}} {value(result)}" for result in results]
+
+    lines += ["# HELP sf2db_stage_seconds Time spent in each stage of the last sync of the mapping", 
+              "# TYPE sf2db_stage_seconds gauge"]
+    for result in results:
+        lines += [f'sf2db_stage_seconds{{{labels(result)},stage="{stage}"}} {value(result)}' for stage, value in stages.items()]
+
+    lines += ["# HELP sf2db_last_run_timestamp_seconds Unix time the last run finished",
+              "# TYPE sf2db_last_run_timestamp_seconds gauge",
+              f"sf2db_last_run_timestamp_seconds {finished_at.timestamp()}"]
+    _write_atomically(path, "\n".join(lines) + "\n")
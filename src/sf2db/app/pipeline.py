@@ -0,0 +1,103 @@
+
+import queue
+import threading
+from typing import Any, Callable, Iterable
+
+# Marks the end of the stream of batches between stages
+_END = object()
+
+# Seconds a stage waits on a full/empty queue before checking whether the pipeline was stopped
+_POLL_INTERVAL = 0.1
+
+
+class _StageFailure:
+    """Carries an exception raised by an upstream stage to the writing stage"""
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _put(q: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    """ Blocks while the queue is full (backpressure). Returns False when the pipeline was stopped """
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL_INTERVAL)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q: queue.Queue, stop: threading.Event) -> Any:
+    while not stop.is_set():
+        try:
+            return q.get(timeout=_POLL_INTERVAL)
+        except queue.Empty:
+            continue
+    return _END
+
+
+def run_pipeline(batches: Iterable[Any],
+                 convert_batch: Callable[[Any], Any],
+                 write_batch: Callable[[Any], None],
+                 max_queued_batches: int = 2) -> None:
+    """ Runs fetch, convert and write as three concurrent stages connected by bounded queues
+
+        1. A thread pulls batches from `batches` (e.g. `SFInterface.query_iter`)
+        2. A thread applies `convert_batch` to each fetched batch
+        3. The calling thread applies `write_batch` to each converted batch,
+           so thread-bound resources such as the DB session of the caller can be used
+
+        Each queue holds at most `max_queued_batches` batches. A stage ahead of the others blocks
+        until there is room, which keeps memory flat. An exception in any stage stops the other
+        stages and is re-raised in the calling thread.
+    """
+    fetched: queue.Queue = queue.Queue(maxsize=max_queued_batches)
+    converted: queue.Queue = queue.Queue(maxsize=max_queued_batches)
+    stop = threading.Event()
+
+    def fetch_stage():
+        try:
+            for batch in batches:
+                if not _put(fetched, batch, stop):
+                    break
+            else:
+                _put(fetched, _END, stop)
+        except BaseException as e:
+            _put(fetched, _StageFailure(e), stop)
+        finally:
+            # Releases open Salesforce responses when the pipeline stops early
+            close = getattr(batches, "close", None)
+            if close:
+                close()
+
+    def convert_stage():
+        while True:
+            item = _get(fetched, stop)
+            if item is _END or isinstance(item, _StageFailure):
+                _put(converted, item, stop)
+                return
+            try:
+                result = convert_batch(item)
+            except BaseException as e:
+                _put(converted, _StageFailure(e), stop)
+                return
+            if not _put(converted, result, stop):
+                return
+
+    stages = [threading.Thread(target=fetch_stage, name="sf2db-fetch", daemon=True),
+              threading.Thread(target=convert_stage, name="sf2db-convert", daemon=True)]
+    for stage in stages:
+        stage.start()
+
+    try:
+        while True:
+            item = _get(converted, stop)
+            if item is _END:
+                break
+            if isinstance(item, _StageFailure):
+                raise item.error
+            write_batch(item)
+    finally:
+        stop.set()
+        for stage in stages:
+            stage.join()
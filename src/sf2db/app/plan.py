@@ -0,0 +1,72 @@
+"""
+    Sync plans: everything about a `TableMapping` that does not change during a run, compiled once at startup
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from sf2db.db.models import DBTable
+from sf2db.mapping.models import TableMapping
+from sf2db.salesforce.soql import build_query
+from sf2db.util.sf_to_db_converter import RecordConverter, compile_converter
+
+
+@dataclass
+class SyncPlan:
+    """A `TableMapping` resolved against its `DBTable` and the sync settings of the run"""
+    mapping: TableMapping
+    db_table: DBTable
+    # Fields queried from Salesforce, followed by key fields that are queried without being mapped to a column
+    salesforce_fields: List[str]
+    db_columns: List[str]
+    # Fields records are fetched in the order of, so a rerun can pick up after the last committed record
+    key_fields: List[str]
+    checkpointed: bool
+    chunked: bool
+    converter: RecordConverter
+
+    def build_query(self, where_clauses: Optional[List[Any]] = None) -> str:
+        """ SOQL query of the mapping, ordered by its key fields """
+        return build_query(object_name=self.mapping.salesforce_object_name,
+                           columns=self.salesforce_fields,
+                           where_clauses=where_clauses,
+                           order_by=(", ".join(self.key_fields), "ASC") if self.key_fields else None,
+                           limit=None)
+
+
+def compile_sync_plan(mapping: TableMapping, db_table: DBTable, checkpoint_interval: Optional[int] = None) -> SyncPlan:
+    """ Builds the `SyncPlan` of a mapping. `checkpoint_interval` is the one of `SyncSettings` """
+    chunked = (mapping.chunks or 1) > 1
+    # Chunks are committed independently so there is no single position to resume from
+    checkpointed = bool(checkpoint_interval) and not chunked
+
+    # Incremental mappings are fetched in watermark order and checkpointed mappings in key order
+    key_fields = []
+    if mapping.sync_mode == "incremental":
+        key_fields.append(mapping.watermark_field)
+    if checkpointed:
+        key_fields.append("Id")
+
+    salesforce_fields = [column_mapping.saleforce_field for column_mapping in mapping.col_mappings]
+    db_columns = [column_mapping.db_column_name for column_mapping in mapping.col_mappings]
+    # Key fields are needed to advance the watermark and checkpoint even if they are not mapped to a column
+    salesforce_fields += [key_field for key_field in key_fields if key_field not in salesforce_fields]
+
+    # Compiled once per mapping from the types of the target columns
+    converter = compile_converter(salesforce_fields=salesforce_fields,
+                                  db_columns=db_columns,
+                                  column_types={column.name: column.type for column in db_table.__table__.columns})
+    return SyncPlan(mapping=mapping,
+                    db_table=db_table,
+                    salesforce_fields=salesforce_fields,
+                    db_columns=db_columns,
+                    key_fields=key_fields,
+                    checkpointed=checkpointed,
+                    chunked=chunked,
+                    converter=converter)
+
+
+def compile_sync_plans(mappings: List[TableMapping], db_tables: Dict[str, DBTable], checkpoint_interval: Optional[int] = None) -> Dict[str, SyncPlan]:
+    """ `SyncPlan` of each mapping whose table is in `db_tables` (table name => DBTable), by mapping key """
+    return {mapping.key: compile_sync_plan(mapping, db_tables[mapping.db_table_name], checkpoint_interval)
+            for mapping in mappings if mapping.db_table_name in db_tables}
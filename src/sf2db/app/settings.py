@@ -0,0 +1,88 @@
+
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, Optional
+
+from sf2db.salesforce.describe import DEFAULT_DESCRIBE_CACHE_TTL
+from sf2db.salesforce.SFInterface import DEFAULT_QUERY_BATCH_SIZE
+from sf2db.salesforce.throttle import (DEFAULT_API_USAGE_SLOWDOWN,
+                                      DEFAULT_API_USAGE_SLOWDOWN_DELAY,
+                                      DEFAULT_MAX_RETRIES,
+                                      DEFAULT_RETRY_BACKOFF_SECONDS)
+
+
+class SyncSettingsValueError(Exception):
+    """Raised when there is a problem instantiating SyncSettings object."""
+    pass
+
+
+@dataclass
+class SyncSettings:
+    """Representation of sync_config.yaml
+        Keys in the yaml file are hyphenated versions of the attribute names 
+        E.g.
+            fetch-batch-size: 2000
+    """
+    fetch_batch_size: int = field(default=DEFAULT_QUERY_BATCH_SIZE, metadata={"positive": True})
+    # Mappings expected to return more records than this use the Bulk API adapter. `None` disables the Bulk API
+    bulk_api_threshold: Optional[int] = field(default=None, metadata={"positive": True})
+    # Number of mappings synced at the same time, each on its own thread. 1 syncs them one after another
+    max_workers: int = field(default=1, metadata={"positive": True})
+    # Cap on Salesforce requests in flight at once across all workers. `None` does not limit
+    max_concurrent_requests: Optional[int] = field(default=None, metadata={"positive": True})
+    # Retries of Salesforce requests that failed transiently, with jittered exponential backoff from `retry_backoff_seconds`. 0 disables
+    max_retries: int = field(default=DEFAULT_MAX_RETRIES, metadata={"non_negative": True})
+    retry_backoff_seconds: float = field(default=DEFAULT_RETRY_BACKOFF_SECONDS, metadata={"seconds": True})
+    # Fractions of the org's daily API limit. Above `api_usage_slowdown` each request waits `api_usage_slowdown_delay` seconds,
+    # above `api_usage_stop` no more requests are made. `None` disables either
+    api_usage_slowdown: Optional[float] = field(default=DEFAULT_API_USAGE_SLOWDOWN, metadata={"fraction": True})
+    api_usage_slowdown_delay: float = field(default=DEFAULT_API_USAGE_SLOWDOWN_DELAY, metadata={"seconds": True})
+    api_usage_stop: Optional[float] = field(default=None, metadata={"fraction": True})
+    # Overlaps fetching, converting and writing of a mapping's batches on separate threads
+    pipeline: bool = field(default=False)
+    # Batches waiting between two pipeline stages. Bounds memory to roughly this many batches per stage
+    pipeline_queue_size: int = field(default=2, metadata={"positive": True})
+    # Commits every this many batches and records the position of the last committed record, so a mapping
+    # interrupted part way resumes from there on the next run. `None` commits each mapping in a single transaction
+    checkpoint_interval: Optional[int] = field(default=None, metadata={"positive": True})
+    # Directory fetched records are staged in before they are loaded. Files of failed loads are kept and replayed
+    # before the next fetch of their mapping or by `src/replay.py`. `None` loads records as they are fetched
+    spool_dir: Optional[str] = field(default=None)
+    # Drops the non-unique indexes of a table before a full load (replace, or into an empty table) and builds them once
+    # the rows are written, rather than maintaining them row by row
+    defer_index_build: bool = field(default=True)
+    # Directory the `describe` of each mapped Salesforce object is cached in, and seconds a cached describe is used
+    # before it is fetched again. `None` fetches every describe at startup
+    describe_cache_dir: Optional[str] = field(default=None)
+    describe_cache_ttl: int = field(default=DEFAULT_DESCRIBE_CACHE_TTL, metadata={"positive": True})
+    # Files the metrics of each run are exported to. `None` skips the export
+    report_json_path: Optional[str] = field(default=None)
+    prometheus_textfile_path: Optional[str] = field(default=None)
+
+
+def get_sync_settings(data: Dict[str, Any]) -> SyncSettings:
+    """ Creates `SyncSettings` from the contents of sync_config.yaml. Omitted keys fall back to defaults """
+    try:
+        settings = SyncSettings(**{key.replace("-", "_"): value for key, value in (data or {}).items()})
+    except (TypeError, ValueError, AttributeError) as e:
+        raise SyncSettingsValueError(f"Issue creating SyncSettings object: {str(e)}")
+
+    for setting in fields(settings):
+        value = getattr(settings, setting.name)
+        if setting.type is bool and not isinstance(value, bool):
+            raise SyncSettingsValueError(f"`{setting.name.replace('_', '-')}` must be true or false. Value provided => {value}")
+        if value is None:
+            continue
+        is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+        if setting.metadata.get("positive") and (not isinstance(value, int) or isinstance(value, bool) or value < 1):
+            raise SyncSettingsValueError(f"`{setting.name.replace('_', '-')}` must be a positive integer. Value provided => {value}")
+        if setting.metadata.get("non_negative") and (not isinstance(value, int) or isinstance(value, bool) or value < 0):
+            raise SyncSettingsValueError(f"`{setting.name.replace('_', '-')}` must be 0 or a positive integer. Value provided => {value}")
+        if setting.metadata.get("seconds") and (not is_number or value < 0):
+            raise SyncSettingsValueError(f"`{setting.name.replace('_', '-')}` must be a number of seconds. Value provided => {value}")
+        if setting.metadata.get("fraction") and (not is_number or not 0 < value <= 1):
+            raise SyncSettingsValueError(f"`{setting.name.replace('_', '-')}` must be a fraction of the daily API limit e.g. 0.8. Value provided => {value}")
+
+    # A replayed spool file is loaded from its start, so rows committed at a checkpoint would be written twice
+    if settings.spool_dir and settings.checkpoint_interval:
+        raise SyncSettingsValueError("`spool-dir` can not be combined with `checkpoint-interval`")
+    return settings
@@ -0,0 +1,68 @@
+"""
+    Staging of fetched Salesforce records on local disk as gzip compressed NDJSON, one record per line
+
+    Spool files are kept per mapping under `<spool-dir>/<mapping key>/` until their records are committed,
+    so a load that fails can be replayed later without fetching from Salesforce again
+"""
+
+import gzip
+import json
+import os
+import re
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+SPOOL_SUFFIX = ".ndjson.gz"
+
+Record = Dict[str, Any]
+
+
+def spool_file(spool_dir: str, mapping_key: str, part: str) -> Path:
+    """ Path of a spool file of a mapping. `part` tells apart the files of one run e.g. the `Id` ranges of chunks """
+    return Path(spool_dir) / re.sub(r"[^\w.-]+", "_", mapping_key) / f"{part}{SPOOL_SUFFIX}"
+
+
+def pending_spool_files(spool_dir: str, mapping_key: str) -> List[Path]:
+    """ Spool files of a mapping whose records have not been committed yet """
+    return sorted(spool_file(spool_dir, mapping_key, "*").parent.glob(f"*{SPOOL_SUFFIX}"))
+
+
+def write_spool(path: Path, batches: Iterable[List[Record]]) -> int:
+    """ Streams record batches into a spool file, holding one batch in memory at a time. Returns the number of records
+
+        Written under a temporary name and renamed when complete, so an interrupted fetch never leaves
+        a truncated file behind to be replayed
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    written = 0
+    try:
+        with gzip.open(temporary, "wt", encoding="utf-8", compresslevel=1) as spool:
+            for batch in batches:
+                spool.writelines(json.dumps(record, default=str) + "\n" for record in batch)
+                written += len(batch)
+        os.replace(temporary, path)
+    finally:
+        if temporary.exists():
+            temporary.unlink()
+    return written
+
+
+def read_spool(path: Path, batch_size: int) -> Iterator[List[Record]]:
+    """ Yields the records of a spool file in batches of `batch_size` """
+    with gzip.open(path, "rt", encoding="utf-8") as spool:
+        records = (json.loads(line) for line in spool)
+        while batch := list(islice(records, batch_size)):
+            yield batch
+
+
+def remove_spool(path: Optional[Path]) -> None:
+    """ Deletes a spool file once its records are committed, and its directory when it was the last one """
+    if path is None:
+        return
+    path.unlink(missing_ok=True)
+    try:
+        path.parent.rmdir()
+    except OSError:
+        pass
@@ -0,0 +1,57 @@
+
+from dataclasses import dataclass, field
+from logging import Logger
+from typing import List, Optional
+
+
+@dataclass
+class MappingResult:
+    """Outcome and per-stage metrics of syncing one `TableMapping`, collected into the summary at the end of `App.run`"""
+    mapping_key: str
+    salesforce_object_name: str = field(default="")
+    db_table_name: str = field(default="")
+    succeeded: bool = field(default=False)
+    rows_written: int = field(default=0)
+    duration_seconds: float = field(default=0.0)
+    error: Optional[str] = field(default=None)
+
+    # Per-stage metrics
+    soql_build_seconds: float = field(default=0.0)
+    # Latency of each batch returned by `SFInterface.query_iter`; one page per batch at the default batch size
+    fetch_batch_seconds: List[float] = field(default_factory=list)
+    rows_fetched: int = field(default=0)
+    convert_seconds: float = field(default=0.0)
+    insert_seconds: float = field(default=0.0)
+    commit_seconds: float = field(default=0.0)
+    # Fetched rows that were not stored because the mapping failed and its transaction was rolled back
+    rows_rejected: int = field(default=0)
+    # Rows deleted or flagged as deleted because their records were deleted in Salesforce
+    rows_deleted: int = field(default=0)
+    delete_seconds: float = field(default=0.0)
+
+    @property
+    def fetch_seconds(self) -> float:
+        return sum(self.fetch_batch_seconds)
+
+    def add_metrics(self, other: "MappingResult") -> None:
+        """ Adds the row counts and stage timings of `other`, e.g. one chunk of the mapping, to this result """
+        self.rows_written += other.rows_written
+        self.soql_build_seconds += other.soql_build_seconds
+        self.fetch_batch_seconds.extend(other.fetch_batch_seconds)
+        self.rows_fetched += other.rows_fetched
+        self.convert_seconds += other.convert_seconds
+        self.insert_seconds += other.insert_seconds
+        self.commit_seconds += other.commit_seconds
+
+
+def log_summary(log: Logger, results: List[MappingResult]) -> None:
+    """ Logs one line per mapping followed by the totals of the run """
+    for result in results:
+        status = "OK" if result.succeeded else f"FAILED ({result.error})"
+        log.info(f"{result.mapping_key} : {status} - {result.rows_written} of {result.rows_fetched} rows in {result.duration_seconds:.2f}s "
+                 f"(fetch {result.fetch_seconds:.2f}s, convert {result.convert_seconds:.2f}s, "
+                 f"insert {result.insert_seconds:.2f}s, commit {result.commit_seconds:.2f}s)")
+
+    failed = sum(1 for result in results if not result.succeeded)
+    total_rows = sum(result.rows_written for result in results)
+    log.info(f"Synced {len(results) - failed} of {len(results)} mappings, {total_rows} rows written; {failed} failed")
@@ -0,0 +1,255 @@
+"""
+    Benchmark suite measuring throughput and peak memory of each stage of a sync
+
+    Run from the repository root, with the configuration set up as for `src/main.py` :
+        PYTHONPATH=src python -m sf2db.bench --records 100000 --output bench.json
+        PYTHONPATH=src python -m sf2db.bench --records 100000 --output bench_new.json --baseline bench.json
+
+    Every stage is run twice; once timed and once under `tracemalloc`, as tracing slows the code down.
+    The `startup` stage instead times fresh interpreters importing what `src/main.py` imports.
+    Results are written as JSON so runs can be compared over time. With `--baseline` the run fails
+    when a stage is slower than the baseline by more than `--tolerance`, and with `--startup-budget`
+    when a start takes longer than the budget
+"""
+
+import argparse
+import functools
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import sqlalchemy
+import yaml
+
+import sf2db
+from sf2db.bench.fake_adapter import (DEFAULT_SCHEMA, FIELD_KINDS,
+                                      SyntheticSalesforceAdapter,
+                                      generate_records)
+from sf2db.db.loaders import get_loader
+from sf2db.db.model_factory import (generate_db_table,
+                                    generate_db_table_definition)
+from sf2db.db.session import DBSession
+from sf2db.db.writer import clear_table, insert_rows
+from sf2db.salesforce.soql import build_query
+from sf2db.util.sf_to_db_converter import compile_converter, convert
+
+# `build_query` is measured per call rather than per record
+BUILD_QUERY_CALLS = 10_000
+
+# Modules `src/main.py` imports before `App.run` starts, and the number of interpreters started to time them
+STARTUP_MODULES = ("sf2db.app.app", "sf2db.salesforce.SFAdapters")
+STARTUP_RUNS = 5
+
+
+@dataclass
+class StageResult:
+    stage: str
+    items: int
+    seconds: float
+    items_per_second: float
+    peak_memory_bytes: int
+
+
+def measure(stage: str, items: int, run: Callable[[], Any], reset: Callable[[], None] = lambda: None) -> StageResult:
+    """ Times `run` and then measures its peak Python memory in a second, traced, run. `reset` runs before each """
+    reset()
+    gc.collect()
+    started = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - started
+
+    reset()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result = StageResult(stage=stage,
+                         items=items,
+                         seconds=round(seconds, 4),
+                         items_per_second=round(items / seconds, 1) if seconds else 0.0,
+                         peak_memory_bytes=peak_memory)
+    print(f"{stage:<20} {result.items_per_second:>14,.0f} items/s {peak_memory / 2**20:>10.1f} MiB peak")
+    return result
+
+
+def measure_startup(runs: int = STARTUP_RUNS) -> StageResult:
+    """ Times `runs` fresh interpreters importing `STARTUP_MODULES`, the fixed cost paid by every run of the app
+        `seconds` is the median start, including the start of the interpreter itself
+    """
+    command = [sys.executable, "-c", f"import {', '.join(STARTUP_MODULES)}"]
+    environment = {**os.environ, "PYTHONPATH": str(Path(sf2db.__file__).parent.parent)}
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, env=environment, check=True, capture_output=True)
+        durations.append(time.perf_counter() - started)
+    seconds = statistics.median(durations)
+
+    result = StageResult(stage="startup",
+                         items=runs,
+                         seconds=round(seconds, 4),
+                         items_per_second=round(1 / seconds, 1),
+                         peak_memory_bytes=0)
+    print(f"{'startup':<20} {seconds * 1000:>14,.0f} ms per start")
+    return result
+
+
+def table_config(table_name: str, schema: Dict[str, str]) -> Dict[str, Any]:
+    """ `db_tables.json` entry of a table with one column per schema field, keyed on `Id` """
+    columns = []
+    for field, kind in schema.items():
+        column = {"name": field, "type": FIELD_KINDS[kind]}
+        if FIELD_KINDS[kind] == "String":
+            column["length"] = 255
+        if field == "Id":
+            column["primary_key"] = True
+        columns.append(column)
+    return {"tablename": table_name, "columns": columns}
+
+
+def run_app(work_dir: Path, table_name: str, schema: Dict[str, str], record_count: int) -> None:
+    """ Runs `App.run` end to end against a SQLite database using the synthetic adapter """
+    from sf2db.app.app import App
+
+    paths = {name: work_dir / f"{table_name}_{name}" for name in
+             ("credentials.yaml", "mappings.json", "tables.json", "db_config.yaml", "sync_config.yaml")}
+    paths["credentials.yaml"].write_text(yaml.safe_dump({}))
+    paths["mappings.json"].write_text(json.dumps([{
+        "salesforce-object": "Account",
+        "db-table": table_name,
+        "column-mapping": {field: field for field in schema}}]))
+    paths["tables.json"].write_text(json.dumps([table_config(table_name, schema)]))
+    paths["db_config.yaml"].write_text(yaml.safe_dump({"connection-string": f"sqlite:///{work_dir / table_name}.db"}))
+    paths["sync_config.yaml"].write_text(yaml.safe_dump({}))
+
+    app = App(path_sf_credentials=paths["credentials.yaml"],
+              path_sf2db_mappings=paths["mappings.json"],
+              path_db_table_def=paths["tables.json"],
+              path_db_config=paths["db_config.yaml"],
+              path_sync_config=paths["sync_config.yaml"],
+              salesforce_client_adapter=functools.partial(SyntheticSalesforceAdapter, schema=schema, record_count=record_count))
+    app.run()
+    if not all(result.succeeded for result in app.summary):
+        raise RuntimeError(f"App.run failed : {app.summary}")
+
+
+def run_benchmarks(record_count: int, schema: Dict[str, str], work_dir: Path) -> List[StageResult]:
+    fields = list(schema)
+    records = list(generate_records(schema, record_count))
+
+    db_table = generate_db_table(generate_db_table_definition(table_config("bench_records", schema)))
+    db_session = DBSession(db_uri=f"sqlite:///{work_dir / 'bench.db'}")
+    db_session.create_schema()
+
+    def reset_table():
+        with db_session as session:
+            clear_table(session, db_table=db_table)
+
+    converter = compile_converter(salesforce_fields=fields,
+                                  db_columns=fields,
+                                  column_types={column.name: column.type for column in db_table.__table__.columns})
+    rows = [converter(record) for record in records]
+    orm_objects: List[Any] = []
+
+    def construct_orm_objects():
+        orm_objects[:] = [db_table(**row) for row in rows]
+
+    def insert_core():
+        with db_session as session:
+            insert_rows(session, db_table=db_table, rows=rows)
+
+    loader = get_loader(db_session.engine.dialect)
+
+    def insert_native():
+        with db_session as session:
+            loader.load(session, db_table=db_table, rows=rows)
+
+    def insert_orm():
+        with db_session as session:
+            session.add_all([db_table(**row) for row in rows])
+
+    results = [
+        measure_startup(),
+        measure("build_query", BUILD_QUERY_CALLS,
+                lambda: [build_query(object_name="Account", columns=fields, limit=None) for _ in range(BUILD_QUERY_CALLS)]),
+        measure("convert", record_count,
+                lambda: [convert(sf_data=record, salesforce_fields=fields, db_columns=fields) for record in records]),
+        measure("convert_compiled", record_count, lambda: [converter(record) for record in records]),
+        measure("orm_construction", record_count, construct_orm_objects),
+        measure("insert_core", record_count, insert_core, reset=reset_table),
+        measure("insert_native", record_count, insert_native, reset=reset_table),
+        measure("insert_orm", record_count, insert_orm, reset=reset_table),
+    ]
+    db_session.dispose()
+
+    # Each run of App generates its own DBTable so uses a table of its own
+    app_runs = iter(("bench_app_timed", "bench_app_traced"))
+    results.append(measure("app_run", record_count, lambda: run_app(work_dir, next(app_runs), schema, record_count)))
+    return results
+
+
+def compare(results: List[StageResult], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """ Stages whose throughput dropped by more than `tolerance` (a fraction) against the baseline report """
+    baseline_rates = {stage["stage"]: stage["items_per_second"] for stage in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        baseline_rate = baseline_rates.get(result.stage)
+        if baseline_rate and result.items_per_second < baseline_rate * (1 - tolerance):
+            regressions.append(f"{result.stage} : {result.items_per_second:,.0f} items/s against {baseline_rate:,.0f} in the baseline")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(prog="python -m sf2db.bench", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--records", type=int, default=100_000, help="synthetic records per stage")
+    arg_parser.add_argument("--schema", type=Path, help=f"JSON file of {{field name: field kind}}, kinds are {list(FIELD_KINDS)}")
+    arg_parser.add_argument("--output", type=Path, default=Path("bench_results.json"), help="JSON report to write")
+    arg_parser.add_argument("--baseline", type=Path, help="JSON report of an earlier run to compare against")
+    arg_parser.add_argument("--tolerance", type=float, default=0.2, help="allowed drop in throughput against the baseline")
+    arg_parser.add_argument("--startup-budget", type=float, help="seconds a start of the app may take, see the `startup` stage")
+    args = arg_parser.parse_args(argv)
+
+    schema = json.loads(args.schema.read_text()) if args.schema else DEFAULT_SCHEMA
+    with tempfile.TemporaryDirectory(prefix="sf2db-bench-") as work_dir:
+        results = run_benchmarks(args.records, schema, Path(work_dir))
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "platform": platform.platform(),
+        "records": args.records,
+        "schema": schema,
+        "results": [asdict(result) for result in results],
+    }
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f"Results written to {args.output}")
+
+    regressions = []
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+    startup = next(result for result in results if result.stage == "startup")
+    if args.startup_budget is not None and startup.seconds > args.startup_budget:
+        regressions.append(f"startup : {startup.seconds:.3f}s per start against a budget of {args.startup_budget:.3f}s")
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+    Synthetic Salesforce adapter for benchmarks. Conforms to `SFInterface` without any network access
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sf2db.salesforce.SFInterface import (DEFAULT_QUERY_BATCH_SIZE,
+                                          SalesforceLoginError,
+                                          SalesforceQueryResult)
+from sf2db.salesforce.throttle import RequestLimiter
+
+# Field kind of a synthetic schema => SQLAlchemy type name used in `db_tables.json`
+FIELD_KINDS: Dict[str, str] = {
+    "id": "String",
+    "string": "String",
+    "int": "Integer",
+    "float": "Float",
+    "boolean": "Boolean",
+    "datetime": "DateTime",
+}
+
+# Field kind of a synthetic schema => Salesforce field type and length returned by `describe`
+DESCRIBE_FIELD_TYPES: Dict[str, Tuple[str, int]] = {
+    "id": ("id", 18),
+    "string": ("string", 255),
+    "int": ("int", 0),
+    "float": ("double", 0),
+    "boolean": ("boolean", 0),
+    "datetime": ("datetime", 0),
+}
+
+# Shaped like a typical Account
+DEFAULT_SCHEMA: Dict[str, str] = {
+    "Id": "id",
+    "Name": "string",
+    "Industry": "string",
+    "BillingCity": "string",
+    "AnnualRevenue": "float",
+    "NumberOfEmployees": "int",
+    "IsDeleted": "boolean",
+    "CreatedDate": "datetime",
+    "SystemModstamp": "datetime",
+}
+
+# Records per page of the REST query endpoint
+PAGE_SIZE = 2000
+
+_EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def _value_generator(kind: str, rng: random.Random) -> Callable[[int], Any]:
+    """ Generator of the value of a field of the given kind for the n-th record, formatted as the REST API returns it """
+    if kind == "id":
+        return lambda n: f"001{n:015d}"
+    if kind == "string":
+        return lambda n: f"value-{rng.randrange(1_000_000)}"
+    if kind == "int":
+        return lambda n: rng.randrange(100_000)
+    if kind == "float":
+        return lambda n: round(rng.random() * 1_000_000, 2)
+    if kind == "boolean":
+        return lambda n: rng.random() < 0.5
+    if kind == "datetime":
+        return lambda n: (_EPOCH + timedelta(seconds=n)).strftime("%Y-%m-%dT%H:%M:%S.000+0000")
+    raise ValueError(f"Unknown field kind `{kind}`. Must be one of {list(FIELD_KINDS)}")
+
+
+def generate_records(schema: Dict[str, str], record_count: int, seed: int = 0) -> Iterator[SalesforceQueryResult]:
+    """ Lazily generates `record_count` reproducible records of `schema` ({field name: field kind}) """
+    rng = random.Random(seed)
+    generators = [(field, _value_generator(kind, rng)) for field, kind in schema.items()]
+    for n in range(record_count):
+        yield {field: generate(n) for field, generate in generators}
+
+
+class SyntheticSalesforceAdapter:
+    """ Serves `record_count` synthetic records of `schema` for any query
+
+        Records are generated page by page as they are consumed, so memory use is that of the real adapter.
+        `App` only passes the credentials, so bind the other arguments first e.g.
+            functools.partial(SyntheticSalesforceAdapter, schema=DEFAULT_SCHEMA, record_count=100_000)
+    """
+    def __init__(self, 
+                 credential_data: Optional[Dict[str, str]] = None,
+                 schema: Optional[Dict[str, str]] = None,
+                 record_count: int = 10_000,
+                 seed: int = 0):
+        self.schema = schema or DEFAULT_SCHEMA
+        self.record_count = record_count
+        self.seed = seed
+        self.request_limiter = RequestLimiter()
+        self.logged_in = False
+        self.requests_made = 0
+
+    def login(self) -> None:
+        self.logged_in = True
+
+    def query(self, socl_query_str: str) -> List[SalesforceQueryResult]:
+        return [record for batch in self.query_iter(socl_query_str) for record in batch]
+
+    def count(self, socl_query_str: str) -> int:
+        self._check_login()
+        return self.record_count
+
+    def describe(self, object_name: str) -> Dict[str, Any]:
+        self._check_login()
+        with self.request_limiter:
+            self.requests_made += 1
+        fields = [{"name": field, "type": DESCRIBE_FIELD_TYPES[kind][0], "length": DESCRIBE_FIELD_TYPES[kind][1], "nillable": field != "Id"}
+                  for field, kind in self.schema.items()]
+        return {"name": object_name, "queryable": True, "fields": fields}
+
+    def query_iter(self, socl_query_str: str, batch_size: int = DEFAULT_QUERY_BATCH_SIZE, include_deleted: bool = False) -> Iterator[List[SalesforceQueryResult]]:
+        self._check_login()
+        # Every synthetic record is live, so there are no deleted records to return
+        if include_deleted and "IsDeleted = true" in socl_query_str:
+            return
+        batch: List[SalesforceQueryResult] = []
+        for n, record in enumerate(generate_records(self.schema, self.record_count, self.seed)):
+            # A real adapter makes one request per page
+            if n % PAGE_SIZE == 0:
+                with self.request_limiter:
+                    self.requests_made += 1
+            batch.append(record)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _check_login(self) -> None:
+        if not self.logged_in:
+            raise SalesforceLoginError("You need to login before querying")
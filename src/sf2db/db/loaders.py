@@ -0,0 +1,156 @@
+"""
+    Loaders write the converted rows of a batch using the fastest method the target database offers
+
+        PostgreSQL : `COPY ... FROM STDIN` (psycopg2 or psycopg 3 drivers)
+        MySQL      : multi-row `INSERT ... VALUES (...), (...)`
+        SQLite     : prepared `executemany` on the DBAPI cursor
+        Others     : chunked `executemany` of SQLAlchemy Core inserts (`writer.insert_rows`)
+
+    All loaders write within the transaction of the session passed in, so they commit and roll back
+    together with the rest of the mapping
+"""
+
+import io
+from datetime import date, datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Type
+
+from sqlalchemy import DateTime, Table
+from sqlalchemy.engine import Dialect
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from .models import DBTable
+from .writer import (DEFAULT_INSERT_CHUNK_SIZE, Row, build_upsert_statement,
+                     chunked, insert_rows)
+
+# `loader` values of db_config.yaml
+LOADER_NATIVE = "native"
+LOADER_GENERIC = "generic"
+
+# Characters with a meaning in the text format of COPY
+_COPY_TEXT_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+class RowLoader:
+    """Writes plain row dicts with chunked `executemany` calls. Works with every dialect"""
+    def __init__(self, chunk_size: int = DEFAULT_INSERT_CHUNK_SIZE):
+        if chunk_size < 1:
+            raise ValueError(f"`chunk_size` must be a positive integer. Value provided => {chunk_size}")
+        self.chunk_size = chunk_size
+
+    def load(self, session: Session, db_table: Type[DBTable], rows: Iterable[Row], write_mode: str = "insert") -> int:
+        """ Writes `rows` as per `write_mode` (see `writer.insert_rows`). Returns the number of rows written """
+        return insert_rows(session, db_table=db_table, rows=rows, chunk_size=self.chunk_size, write_mode=write_mode)
+
+
+class SQLiteLoader(RowLoader):
+    """Compiles the insert once per batch and hands all its rows to the `executemany` of the sqlite3 cursor,
+        skipping the per-chunk statement handling of SQLAlchemy
+    """
+    def load(self, session: Session, db_table: Type[DBTable], rows: Iterable[Row], write_mode: str = "insert") -> int:
+        rows = list(rows)
+        if not rows:
+            return 0
+        table: Table = db_table.__table__
+        connection = session.connection()
+        dialect = connection.dialect
+        statement = build_upsert_statement(table, dialect.name) if write_mode == "upsert" else table.insert()
+
+        # Rows of a batch share their keys as they come out of one compiled converter
+        compiled = statement.compile(dialect=dialect, column_keys=list(rows[0]))
+        keys = list(compiled.positiontup)
+        # Formats values the way SQLAlchemy stores them e.g. DateTime as naive `YYYY-MM-DD HH:MM:SS.ffffff` text
+        processors: List[Optional[Callable[[Any], Any]]] = [table.c[key].type.dialect_impl(dialect).bind_processor(dialect) for key in keys]
+        parameters = [tuple(process(row.get(key)) if process else row.get(key) for key, process in zip(keys, processors))
+                      for row in rows]
+        connection.exec_driver_sql(str(compiled), parameters)
+        return len(parameters)
+
+
+class MySQLLoader(RowLoader):
+    """Sends each chunk as a single multi-row `INSERT ... VALUES (...), (...)` statement"""
+    def load(self, session: Session, db_table: Type[DBTable], rows: Iterable[Row], write_mode: str = "insert") -> int:
+        table: Table = db_table.__table__
+        statement = build_upsert_statement(table, session.get_bind().dialect.name) if write_mode == "upsert" else table.insert()
+        written = 0
+        for chunk in chunked(rows, self.chunk_size):
+            session.execute(statement.values(chunk))
+            written += len(chunk)
+        return written
+
+
+def _copy_text(value: Any, naive_utc: bool) -> str:
+    """ A value in the text format of COPY. `naive_utc` drops the offset of datetimes of `timestamp without time zone` columns
+        which, unlike bound parameters, PostgreSQL would otherwise ignore instead of converting
+    """
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        if naive_utc and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value).translate(_COPY_TEXT_ESCAPES)
+
+
+class PostgreSQLCopyLoader(RowLoader):
+    """Streams each batch through `COPY <table> (<columns>) FROM STDIN`, the fastest way to load PostgreSQL
+
+        COPY can not resolve primary key conflicts, so write mode `upsert` uses `INSERT ... ON CONFLICT` instead
+    """
+    def load(self, session: Session, db_table: Type[DBTable], rows: Iterable[Row], write_mode: str = "insert") -> int:
+        if write_mode == "upsert":
+            return super().load(session, db_table=db_table, rows=rows, write_mode=write_mode)
+        rows = list(rows)
+        if not rows:
+            return 0
+
+        table: Table = db_table.__table__
+        connection = session.connection()
+        preparer = connection.dialect.identifier_preparer
+        keys = list(rows[0])
+        naive_utc = [isinstance(table.c[key].type, DateTime) and not table.c[key].type.timezone for key in keys]
+        copy_sql = f"COPY {preparer.format_table(table)} ({', '.join(preparer.quote(key) for key in keys)}) FROM STDIN"
+        data = "".join("\t".join(_copy_text(row.get(key), naive) for key, naive in zip(keys, naive_utc)) + "\n" for row in rows)
+
+        # The COPY runs on the DBAPI connection of the session, inside its transaction
+        dbapi = connection.dialect.loaded_dbapi
+        cursor = connection.connection.driver_connection.cursor()
+        try:
+            if hasattr(cursor, "copy"):
+                # psycopg 3
+                with cursor.copy(copy_sql) as copy:
+                    copy.write(data)
+            else:
+                # psycopg2
+                cursor.copy_expert(copy_sql, io.StringIO(data))
+        except dbapi.Error as e:
+            # Wrapped like errors of statements run through SQLAlchemy e.g. a duplicate key becomes `IntegrityError`
+            raise DBAPIError.instance(copy_sql, None, e, dbapi.Error, dialect=connection.dialect) from e
+        finally:
+            cursor.close()
+        return len(rows)
+
+
+# Dialect name => (loader, DBAPI drivers it supports; `None` for any)
+NATIVE_LOADERS: Dict[str, tuple] = {
+    "postgresql": (PostgreSQLCopyLoader, ("psycopg2", "psycopg")),
+    "mysql": (MySQLLoader, None),
+    "mariadb": (MySQLLoader, None),
+    "sqlite": (SQLiteLoader, ("pysqlite",)),
+}
+
+
+def get_loader(dialect: Dialect, chunk_size: int = DEFAULT_INSERT_CHUNK_SIZE, loader: str = LOADER_NATIVE) -> RowLoader:
+    """ Picks the loader of a database dialect, falling back to `RowLoader` for other dialects or drivers
+        and when `loader` is `generic`
+    """
+    if loader not in (LOADER_NATIVE, LOADER_GENERIC):
+        raise ValueError(f"`loader` must be one of {[LOADER_NATIVE, LOADER_GENERIC]}. Value provided => {loader}")
+    loader_class, drivers = NATIVE_LOADERS.get(dialect.name, (RowLoader, None))
+    if loader == LOADER_GENERIC or (drivers is not None and dialect.driver not in drivers):
+        loader_class = RowLoader
+    return loader_class(chunk_size=chunk_size)
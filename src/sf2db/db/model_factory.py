@@ -15,9 +15,14 @@ class SQLAlchemyTypeError(Exception):
 
 ALLOWED_SQLALCHEMY_TYPES: Tuple[Type, ...] = (
                                   sqlalchemy.Integer,
+                                  sqlalchemy.BigInteger,
+                                  sqlalchemy.SmallInteger,
                                   sqlalchemy.String,
+                                  sqlalchemy.Text,
                                   sqlalchemy.Float,
+                                  sqlalchemy.Numeric,
                                   sqlalchemy.Boolean,
+                                  sqlalchemy.Date,
                                   sqlalchemy.DateTime)
 
 def get_sqlalchemy_type(type_name: str)-> ALLOWED_SQLALCHEMY_TYPES:
@@ -51,19 +56,56 @@ class DBColumnDefinition():
                 "type": "String",
                 "length": 50
             },
+            {
+                "name": "amount",
+                "type": "Numeric",
+                "precision": 18,
+                "scale": 2
+            },
             ....
     """
     column_name : str
     column_type:str
     is_primary_key : bool =field(default=False)
-    column_length: int = field(default=None)  # Length is only applicable to `sqlalchemy.String`
+    column_length: int = field(default=None)  # Length is only applicable to `sqlalchemy.String` and `sqlalchemy.Text`
+    # Total digits and digits after the decimal point. Only applicable to `sqlalchemy.Numeric`
+    column_precision: int = field(default=None)
+    column_scale: int = field(default=None)
+
+
+@dataclass
+class DBIndexDefinition():
+    """Representation of db_tables.json's index and unique constraint definitions
+        Several `columns` make a composite index. `name` defaults to `ix_<table>_<columns>` (`uq_` for constraints)
+        E.g.
+            .....
+            "indexes": [
+                {
+                    "columns": ["email"],
+                    "unique": true
+                },
+                {
+                    "name": "ix_users_last_first",
+                    "columns": ["last_name", "first_name"]
+                }
+            ],
+            "unique_constraints": [
+                {
+                    "columns": ["external_id"]
+                }
+            ]
+            ....
+    """
+    columns: list[str]
+    name: str = field(default=None)
+    is_unique: bool = field(default=False)  # Only applicable to indexes; unique constraints are always unique
 
 
 @dataclass
 class DBTableDefinition():
     """Representation of db_tables.json's table definition
     Limitation : does not support relationship between tables
-    Columns of the tables of type `DBColumnDefinition`
+    Columns of the tables of type `DBColumnDefinition`, indexes and unique constraints of type `DBIndexDefinition`
         E.g.
             .....
             {
@@ -78,6 +120,8 @@ class DBTableDefinition():
     """
     table_name : str
     columns: list[DBColumnDefinition]
+    indexes: list[DBIndexDefinition] = field(default_factory=list)
+    unique_constraints: list[DBIndexDefinition] = field(default_factory=list)
 
 
 class TableDefinitionGenerationError(Exception):
@@ -94,12 +138,30 @@ def generate_db_table_definition(definition_config: JSONTableConfig) -> DBTableD
                 column_name=column_def['name'],
                 column_type=column_def.get('type'),
                 column_length=column_def.get('length'),
+                column_precision=column_def.get('precision'),
+                column_scale=column_def.get('scale'),
                 is_primary_key=column_def.get('primary_key', False)
             )
             for column_def in definition_config['columns']
         ]
 
-        table_definition = DBTableDefinition(table_name=definition_config["tablename"], columns=columns)
+        indexes = [
+            DBIndexDefinition(
+                columns=list(index_def['columns']),
+                name=index_def.get('name'),
+                is_unique=index_def.get('unique', False)
+            )
+            for index_def in definition_config.get('indexes', [])
+        ]
+        unique_constraints = [
+            DBIndexDefinition(columns=list(constraint_def['columns']), name=constraint_def.get('name'), is_unique=True)
+            for constraint_def in definition_config.get('unique_constraints', [])
+        ]
+
+        table_definition = DBTableDefinition(table_name=definition_config["tablename"], 
+                                             columns=columns, 
+                                             indexes=indexes, 
+                                             unique_constraints=unique_constraints)
 
         return table_definition
     except (KeyError, AttributeError, TypeError, ValueError) as e:
@@ -113,19 +175,42 @@ class DBTableGenerationError(Exception):
     Raised when there is an error during the dynamic generation of a DBTable's sub Classes.
     """
 # region Create SQL Tables dynamically based on DBTableDefinition
+def get_column_type(column: DBColumnDefinition) -> sqlalchemy.types.TypeEngine:
+    """ Sized instance of the SQLAlchemy type of a column e.g. `String(80)` or `Numeric(18, 2)` """
+    sqlalchemy_col_type = get_sqlalchemy_type (type_name = column.column_type )
+
+    # `get_sqlalchemy_type` returns classes, so sizes apply to subclasses (`Text` is a `String`)
+    if issubclass(sqlalchemy_col_type, sqlalchemy.String):
+        return sqlalchemy_col_type(column.column_length)
+    # Of the numeric types only `Numeric` takes a scale
+    if sqlalchemy_col_type is sqlalchemy.Numeric:
+        return sqlalchemy_col_type(precision=column.column_precision, scale=column.column_scale)
+    return sqlalchemy_col_type()
+
+def get_table_args(db_table_definition: DBTableDefinition) -> Tuple[Any, ...]:
+    """ `__table_args__` of the indexes and unique constraints of a table, created with the table by `create_schema` """
+    table_name = db_table_definition.table_name
+    column_names = {column.column_name for column in db_table_definition.columns}
+    for definition in db_table_definition.indexes + db_table_definition.unique_constraints:
+        unknown_columns = [column for column in definition.columns if column not in column_names]
+        if not definition.columns or unknown_columns:
+            raise ValueError(f"Index or constraint of table `{table_name}` must list columns of the table. Unknown columns => {unknown_columns}")
+
+    indexes = [sqlalchemy.Index(index.name or f"ix_{table_name}_{'_'.join(index.columns)}", *index.columns, unique=index.is_unique)
+               for index in db_table_definition.indexes]
+    unique_constraints = [sqlalchemy.UniqueConstraint(*constraint.columns, name=constraint.name or f"uq_{table_name}_{'_'.join(constraint.columns)}")
+                          for constraint in db_table_definition.unique_constraints]
+    return tuple(indexes + unique_constraints)
+
 def generate_db_table(db_table_definition:DBTableDefinition)-> DBTable:
     class_attrs = {'__tablename__': db_table_definition.table_name}
     try: 
         for column in db_table_definition.columns:
-            sqlalchemy_col_type = get_sqlalchemy_type (type_name = column.column_type )
-        
-            # SQLAlchemyColumnType.String requires in Column
-            if isinstance(sqlalchemy_col_type, sqlalchemy.String):
-                class_attrs[column.column_name] = sqlalchemy.Column(sqlalchemy_col_type(column.column_length),
-                                                        primary_key=column.is_primary_key)
-            else:
-                class_attrs[column.column_name] = sqlalchemy.Column(sqlalchemy_col_type,
-                                                        primary_key=column.is_primary_key)
+            class_attrs[column.column_name] = sqlalchemy.Column(get_column_type(column),
+                                                                primary_key=column.is_primary_key)
+        table_args = get_table_args(db_table_definition)
+        if table_args:
+            class_attrs['__table_args__'] = table_args
 
         dt_table = type(db_table_definition.table_name, (DBTable,), class_attrs)
         return dt_table
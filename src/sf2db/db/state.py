@@ -0,0 +1,98 @@
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy.orm import Session
+
+from .models import Base
+
+
+class SyncState(Base):
+    """Progress of each `TableMapping` kept in the target database between runs
+
+        `watermark` is the highest value of `watermark_field` that has been committed.
+        Created alongside the DBTables by `Base.metadata.create_all`
+    """
+    __tablename__ = "sf2db_sync_state"
+    mapping_key = Column(String(255), primary_key=True)
+    watermark_field = Column(String(100))
+    watermark = Column(DateTime)
+    updated_at = Column(DateTime)
+
+
+class SyncCheckpoint(Base):
+    """Position of a `TableMapping` that committed some of its batches but has not finished
+    
+        Records are fetched in (`watermark_field`, `Id`) order, or `Id` order for full syncs, so the last
+        committed record marks where a restarted run resumes. The row is deleted when the mapping completes
+    """
+    __tablename__ = "sf2db_sync_checkpoint"
+    mapping_key = Column(String(255), primary_key=True)
+    last_id = Column(String(18))
+    last_watermark = Column(DateTime)
+    rows_committed = Column(Integer)
+    updated_at = Column(DateTime)
+
+
+@dataclass
+class Checkpoint:
+    """Values of a `SyncCheckpoint` row, usable after its session has closed"""
+    last_id: str
+    last_watermark: Optional[datetime]
+    rows_committed: int
+
+
+def _to_naive_utc(value: datetime) -> datetime:
+    # Stored as naive UTC as not all databases keep the timezone
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def deleted_records_key(mapping_key: str) -> str:
+    """ State key of the watermark of the records of a mapping deleted in Salesforce, kept apart from the watermark of its records """
+    return f"{mapping_key}#deleted"
+
+
+def get_watermark(session: Session, mapping_key: str) -> Optional[datetime]:
+    """ Returns the stored watermark of a mapping, `None` when the mapping has never been synced """
+    state = session.get(SyncState, mapping_key)
+    return state.watermark if state else None
+
+
+def set_watermark(session: Session, mapping_key: str, watermark_field: str, watermark: datetime) -> None:
+    """ Stages the new watermark of a mapping. It is only persisted when the session commits """
+    state = session.get(SyncState, mapping_key) or SyncState(mapping_key=mapping_key)
+    state.watermark_field = watermark_field
+    state.watermark = _to_naive_utc(watermark)
+    state.updated_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    session.add(state)
+
+
+def get_checkpoint(session: Session, mapping_key: str) -> Optional[Checkpoint]:
+    """ Returns the checkpoint of an unfinished mapping, `None` when its last run completed """
+    checkpoint = session.get(SyncCheckpoint, mapping_key)
+    if checkpoint is None:
+        return None
+    return Checkpoint(last_id=checkpoint.last_id, 
+                      last_watermark=checkpoint.last_watermark, 
+                      rows_committed=checkpoint.rows_committed or 0)
+
+
+def set_checkpoint(session: Session, mapping_key: str, last_id: str, last_watermark: Optional[datetime], rows_committed: int) -> None:
+    """ Stages the position of the last written record. Commit it with the records it covers """
+    checkpoint = session.get(SyncCheckpoint, mapping_key) or SyncCheckpoint(mapping_key=mapping_key)
+    checkpoint.last_id = last_id
+    checkpoint.last_watermark = _to_naive_utc(last_watermark) if last_watermark else None
+    checkpoint.rows_committed = rows_committed
+    checkpoint.updated_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    session.add(checkpoint)
+
+
+def clear_checkpoint(session: Session, mapping_key: str) -> None:
+    """ Stages the removal of a mapping's checkpoint once all of its records are written """
+    checkpoint = session.get(SyncCheckpoint, mapping_key)
+    if checkpoint is not None:
+        session.delete(checkpoint)
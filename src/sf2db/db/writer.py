@@ -0,0 +1,123 @@
+
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Type
+
+from sqlalchemy import Table, delete, literal, select, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import Insert
+
+from .models import DBTable
+
+# Rows sent to the database per `executemany` call
+DEFAULT_INSERT_CHUNK_SIZE = 1000
+
+Row = Dict[str, Any]
+
+
+class WriteModeError(Exception):
+    """Raised when a write mode can not be applied to a table or database dialect."""
+    pass
+
+
+def chunked(rows: Iterable[Row], chunk_size: int) -> Iterator[List[Row]]:
+    """ Splits rows into lists of `chunk_size`. The last chunk may be smaller """
+    iterator = iter(rows)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
+
+
+def build_upsert_statement(table: Table, dialect_name: str) -> Insert:
+    """ Builds the dialect-native `INSERT ... ON CONFLICT DO UPDATE` / `ON DUPLICATE KEY UPDATE` 
+        statement of a table keyed on its primary key columns
+    """
+    key_columns = [column.name for column in table.primary_key.columns]
+    if not key_columns:
+        raise WriteModeError(f"Table `{table.name}` has no primary key to upsert on")
+    update_columns = [column.name for column in table.columns if column.name not in key_columns]
+
+    if dialect_name in ("sqlite", "postgresql"):
+        dialect_module = sqlite if dialect_name == "sqlite" else postgresql
+        statement = dialect_module.insert(table)
+        if not update_columns:
+            return statement.on_conflict_do_nothing(index_elements=key_columns)
+        return statement.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={column: statement.excluded[column] for column in update_columns})
+
+    if dialect_name in ("mysql", "mariadb"):
+        statement = mysql.insert(table)
+        # MySQL needs at least one assignment, re-assigning the key is a no-op
+        return statement.on_duplicate_key_update(
+            {column: statement.inserted[column] for column in (update_columns or key_columns)})
+
+    raise WriteModeError(f"Write mode `upsert` is not supported for database dialect `{dialect_name}`")
+
+
+def clear_table(session: Session, db_table: Type[DBTable]) -> None:
+    """ Deletes every row of the table within the current transaction. Used by write mode `replace` """
+    session.execute(delete(db_table.__table__))
+
+
+def is_empty(session: Session, db_table: Type[DBTable]) -> bool:
+    """ Whether the table has no rows, e.g. before its first full load """
+    return session.execute(select(literal(1)).select_from(db_table.__table__).limit(1)).first() is None
+
+
+def delete_rows(session: Session,
+                db_table: Type[DBTable],
+                key_column: str,
+                keys: Iterable[Any],
+                flag_column: Optional[str] = None,
+                chunk_size: int = DEFAULT_INSERT_CHUNK_SIZE) -> int:
+    """ Deletes the rows whose `key_column` is one of `keys` within the current transaction, 
+        or sets their `flag_column` to true instead when given. Used by `TableMapping.delete_mode`
+
+        Returns the number of rows deleted or flagged
+    """
+    if chunk_size < 1:
+        raise ValueError(f"`chunk_size` must be a positive integer. Value provided => {chunk_size}")
+
+    table: Table = db_table.__table__
+    affected = 0
+    # Keeps each `IN` list well below the bind parameter limits of the databases
+    for chunk in chunked(keys, chunk_size):
+        condition = table.c[key_column].in_(chunk)
+        if flag_column is None:
+            statement = delete(table).where(condition)
+        else:
+            statement = update(table).where(condition).values({flag_column: True})
+        affected += session.execute(statement).rowcount
+    return affected
+
+
+def insert_rows(session: Session, 
+                db_table: Type[DBTable], 
+                rows: Iterable[Row], 
+                chunk_size: int = DEFAULT_INSERT_CHUNK_SIZE,
+                write_mode: str = "insert") -> int:
+    """ Writes plain row dicts with Core insert constructs in chunked `executemany` calls
+
+        Bypasses the ORM unit of work, so no DBTable instances are created or tracked.
+        Keys of each row must be column names of `db_table`.
+        `write_mode` is one of `TableMapping.write_mode` : 
+            `insert` fails on primary key collisions
+            `upsert` updates the colliding rows instead
+            `replace` inserts like `insert`; the table is expected to be emptied with `clear_table` first
+
+        Returns the number of rows written
+    """
+    if chunk_size < 1:
+        raise ValueError(f"`chunk_size` must be a positive integer. Value provided => {chunk_size}")
+
+    table: Table = db_table.__table__
+    if write_mode == "upsert":
+        statement = build_upsert_statement(table, dialect_name=session.get_bind().dialect.name)
+    else:
+        statement = table.insert()
+
+    written = 0
+    for chunk in chunked(rows, chunk_size):
+        session.execute(statement, chunk)
+        written += len(chunk)
+    return written
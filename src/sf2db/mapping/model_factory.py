@@ -11,7 +11,11 @@ MappingData = Dict[str, Dict[str, str]]
           "column-mapping": {
               "Id": "ID",
               "Name": "NAME"
-              }
+              },
+        "sync-mode": "incremental",             <= optional, `full` (default) or `incremental`
+        "watermark-field": "LastModifiedDate",  <= optional, defaults to `SystemModstamp`
+        "write-mode": "upsert",                 <= optional, `insert` (default of `full`), `upsert` (default of `incremental`) or `replace`
+        "chunks": 8                             <= optional, number of `Id` ranges fetched concurrently
     }
 """
 
@@ -25,10 +29,17 @@ def mapping_factory(mapping: MappingData) -> TableMapping:
     salesforce_object = mapping.get("salesforce-object", None)
     db_table = mapping.get("db-table", None)
     column_mapping = mapping.get("column-mapping", {})
+    # Optional settings are only passed when present so `TableMapping` defaults apply
+    options = {attr: mapping[key] for key, attr in (("sync-mode", "sync_mode"),
+                                                      ("watermark-field", "watermark_field"),
+                                                      ("write-mode", "write_mode"),
+                                                      ("chunks", "chunks"),
+                                                      ("delete-mode", "delete_mode"))
+               if key in mapping}
     try:
         field_mappings = [ColumnMapping(saleforce_field=key, db_column_name=value) for key, value in column_mapping.items()]
 
-        table_mapping = TableMapping(salesforce_object_name=salesforce_object, db_table_name=db_table, col_mappings=field_mappings)
+        table_mapping = TableMapping(salesforce_object_name=salesforce_object, db_table_name=db_table, col_mappings=field_mappings, **options)
         
         return table_mapping
     except (KeyError, AttributeError, TypeError, ValueError) as e:
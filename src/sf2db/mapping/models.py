@@ -1,8 +1,8 @@
 
 
-from typing import Any, List
+from typing import Any, List, Literal, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, PositiveInt, model_validator
 from pydantic.functional_validators import AfterValidator
 from typing_extensions import Annotated
 
@@ -36,8 +36,71 @@ class ColumnMapping(BaseModel):
 
 ColMap_List = Annotated[List[ColumnMapping], AfterValidator(list_of_columns_validator)]
 
+# `full` re-fetches every record, `incremental` only fetches records changed since the stored watermark
+SyncMode = Literal["full", "incremental"]
+# `insert` fails on duplicate primary keys, `upsert` updates existing rows, `replace` empties the table first
+# Incremental mappings default to `upsert`
+WriteMode = Literal["insert", "upsert", "replace"]
+# What happens to rows of records deleted in Salesforce: `none` keeps them, `hard` deletes them,
+# `soft` sets the column mapped from `IsDeleted` to true
+DeleteMode = Literal["none", "hard", "soft"]
+
 class TableMapping(BaseModel):
     salesforce_object_name: String_Attr
     db_table_name: String_Attr
     col_mappings: ColMap_List
+    sync_mode: SyncMode = "full"
+    watermark_field: String_Attr = "SystemModstamp"
+    write_mode: WriteMode = "insert"
+    # Number of `Id` ranges the object is split into and fetched concurrently. `None` fetches it with one query
+    chunks: Optional[PositiveInt] = None
+    delete_mode: DeleteMode = "none"
+
+    @model_validator(mode="after")
+    def replace_requires_full_sync(self) -> "TableMapping":
+        # Replacing the table with only the changed records would lose every unchanged record
+        if self.write_mode == "replace" and self.sync_mode == "incremental":
+            raise ValueError("Write mode `replace` can not be combined with sync mode `incremental`")
+        return self
+
+    @model_validator(mode="after")
+    def incremental_requires_upsert(self) -> "TableMapping":
+        # Records changed since the last run are usually stored already, so inserting them again would fail every later run
+        if self.sync_mode != "incremental":
+            return self
+        if "write_mode" not in self.model_fields_set:
+            self.write_mode = "upsert"
+        elif self.write_mode == "insert":
+            raise ValueError("Write mode `insert` can not be combined with sync mode `incremental`. Use `upsert`")
+        return self
+
+    @model_validator(mode="after")
+    def replace_requires_single_query(self) -> "TableMapping":
+        # Chunks commit independently, so the emptied table would be visible until the last chunk is written
+        if self.write_mode == "replace" and (self.chunks or 1) > 1:
+            raise ValueError("Write mode `replace` can not be combined with `chunks`")
+        return self
+
+    @model_validator(mode="after")
+    def delete_mode_requires_keyed_rows(self) -> "TableMapping":
+        # Deleted records are looked up since a watermark and matched to rows by `Id`
+        if self.delete_mode == "none":
+            return self
+        if self.sync_mode != "incremental":
+            raise ValueError(f"Delete mode `{self.delete_mode}` requires sync mode `incremental`")
+        if self.column_of("Id") is None:
+            raise ValueError(f"Delete mode `{self.delete_mode}` requires `Id` to be mapped to a column")
+        if self.delete_mode == "soft" and self.column_of("IsDeleted") is None:
+            raise ValueError("Delete mode `soft` requires `IsDeleted` to be mapped to a column")
+        return self
+
+    def column_of(self, salesforce_field: str) -> Optional[str]:
+        """The column a Salesforce field is mapped to, `None` when it is not mapped"""
+        return next((column_mapping.db_column_name for column_mapping in self.col_mappings
+                     if column_mapping.saleforce_field == salesforce_field), None)
+
+    @property
+    def key(self) -> str:
+        """Identifies the mapping in the sync state table"""
+        return f"{self.salesforce_object_name}->{self.db_table_name}"
 
@@ -1,13 +1,27 @@
-from typing import Dict, List
+import csv
+import io
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, TypeVar
 
-from simple_salesforce import Salesforce
-from simple_salesforce.exceptions import SalesforceAuthenticationFailed
-
-from sf2db.salesforce.SFInterface import (SalesforceCredentialConfigValueError,
+from sf2db.salesforce.SFInterface import (DEFAULT_QUERY_BATCH_SIZE,
+                                          SalesforceCredentialConfigValueError,
                                           SalesforceCredentials,
                                           SalesforceFetchError,
                                           SalesforceLoginError,
                                           SalesforceQueryResult)
+from sf2db.salesforce.http_session import create_http_session
+from sf2db.salesforce.throttle import (INVALID_SESSION_ERROR_CODE,
+                                      ApiUsageLimitError, RequestLimiter,
+                                      error_codes, is_retryable,
+                                      parse_api_usage)
+
+# `simple_salesforce`, `requests` and `urllib3` take about as long to import as the rest of sf2db together,
+# so they are imported by the methods that use them rather than when `main.py` starts
+if TYPE_CHECKING:
+    import requests
+
+T = TypeVar("T")
 
 
 def get_credentials(data : Dict[str, str]) -> SalesforceCredentials:
@@ -17,13 +31,38 @@ def get_credentials(data : Dict[str, str]) -> SalesforceCredentials:
         raise SalesforceCredentialConfigValueError(f"Issue creating  SalesforceCredentials object: {str(e)}")
     return credential
 
+def strip_attributes(record: Dict[str, Any]) -> SalesforceQueryResult:
+    """ Filter out the `attributes` key which describes the ObjectName of a record """
+    return {field: value for field, value in record.items() if field != 'attributes'}
+
+def batched(records: Iterator[SalesforceQueryResult], batch_size: int) -> Iterator[List[SalesforceQueryResult]]:
+    """ Groups a stream of records into lists of `batch_size`. The last batch may be smaller """
+    batch: List[SalesforceQueryResult] = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
 class SimpleSalesforceAdapter:
 
     def __init__(self, credential_data: Dict[str, str]):
         self.connection = None
         self.credentials = get_credentials(credential_data)
+        # Replaced with a shared limiter when several threads use the adapters
+        self.request_limiter = RequestLimiter()
+        # Threads that find the session expired at the same time log in again only once
+        self._login_lock = threading.Lock()
+        # Replaced with a session shared by both adapters and sized to the concurrency of the run
+        self.http_session: Optional["requests.Session"] = None
 
     def login(self) -> None:
+        from simple_salesforce import Salesforce
+        from simple_salesforce.exceptions import SalesforceAuthenticationFailed
+        if self.http_session is None:
+            self.http_session = create_http_session()
         try:
             sf =   Salesforce(
                 username=self.credentials.username,
@@ -31,33 +70,295 @@ class SimpleSalesforceAdapter:
                 security_token=self.credentials.security_token,
                 consumer_key=self.credentials.consumer_key,
                 consumer_secret=self.credentials.consumer_secret,
-                domain=self.credentials.domain)
+                domain=self.credentials.domain,
+                session=self.http_session)
 
             if not sf.session_id: 
                 raise SalesforceLoginError("Authentication failed: No session id returned")
+            # Pretty printed JSON only makes every response bigger
+            sf.headers.pop("X-PrettyPrint", None)
 
             self.connection =  sf
         except SalesforceAuthenticationFailed as e:
             raise SalesforceLoginError(f"Authentication failed: {str(e)}")
 
+    def _call(self, operation: Callable[[], T], description: str, idempotent: bool = True) -> T:
+        """ Sends one request through the request limiter and records the API usage reported with its response
+
+            Idempotent requests that fail transiently (rate limited, 5xx, network errors) are retried with the jittered 
+            exponential backoff of `request_limiter.retry_policy`. An expired session is renewed by logging in again once.
+            Every other failure raises `SalesforceFetchError`
+        """
+        from requests import RequestException
+        from simple_salesforce.exceptions import SalesforceError, SalesforceExpiredSession
+        retry_policy = self.request_limiter.retry_policy
+        attempt = 0
+        session_renewed = False
+        while True:
+            session_id = self.connection.session_id
+            try:
+                with self.request_limiter:
+                    result = operation()
+                self._record_api_usage(result)
+                return result
+            except ApiUsageLimitError as e:
+                raise SalesforceFetchError(f"{description} was not sent : {str(e)}") from e
+            except SalesforceError as e:
+                codes = error_codes(e.content)
+                if not session_renewed and (isinstance(e, SalesforceExpiredSession) or INVALID_SESSION_ERROR_CODE in codes):
+                    self._renew_session(session_id)
+                    session_renewed = True
+                    continue
+                error, retryable = e, idempotent and is_retryable(e.status, codes)
+            except RequestException as e:
+                error, retryable = e, idempotent
+
+            if not retryable or attempt >= retry_policy.max_retries:
+                raise SalesforceFetchError(f"{description} failed after {attempt + 1} attempts : {str(error)}") from error
+            time.sleep(retry_policy.delay(attempt))
+            attempt += 1
+
+    def _renew_session(self, expired_session_id: str) -> None:
+        with self._login_lock:
+            # Another thread may have logged in again already
+            if self.connection.session_id != expired_session_id:
+                return
+            try:
+                self.login()
+            except SalesforceLoginError as e:
+                raise SalesforceFetchError(f"Error logging in again after the session expired : {str(e)}") from e
+
+    def _record_api_usage(self, result: Any) -> None:
+        """ Daily API usage from the `Sforce-Limit-Info` header, read by `simple_salesforce` or from a raw response """
+        headers = getattr(result, "headers", None)
+        if headers is not None:
+            usage = parse_api_usage(headers.get("Sforce-Limit-Info"))
+        else:
+            usage = getattr(self.connection, "api_usage", {}).get("api-usage")
+        if usage:
+            self.request_limiter.record_api_usage(*usage[:2])
+
     def query(self, socl_query_str: str) ->List[SalesforceQueryResult]:
         if not self.connection:
             raise SalesforceLoginError("You need to login before querying")
-        try : 
-            response = self.connection.query_all(query=socl_query_str)
-        except SalesforceFetchError as e:
-            raise SalesforceFetchError(f"Error fetching data from salesforce using SOQL query")
+        response = self._call(lambda: self.connection.query_all(query=socl_query_str), "SOQL query")
         records = response.get("records", [])
 
         # Filter out the 'attributes' key from each record
         # `attributes` key describes the ObjectName
-        filtered_response = [
-            {field: value for field, value in record.items() if field != 'attributes'}
-            for record in records
-            ]
+        filtered_response = [strip_attributes(record) for record in records]
         
         return filtered_response
-    
-    
 
-        {field: value for field, value in record.items() if field != 'attributes'}
\ No newline at end of file
+    def count(self, socl_query_str: str) -> int:
+        if not self.connection:
+            raise SalesforceLoginError("You need to login before querying")
+        response = self._call(lambda: self.connection.query(socl_query_str), "Counting salesforce records using SOQL query")
+        return response.get("totalSize", 0)
+
+    def describe(self, object_name: str) -> Dict[str, Any]:
+        if not self.connection:
+            raise SalesforceLoginError("You need to login before querying")
+        return self._call(lambda: getattr(self.connection, object_name).describe(), f"Describing salesforce object `{object_name}`")
+
+    def query_iter(self, socl_query_str: str, batch_size: int = DEFAULT_QUERY_BATCH_SIZE, include_deleted: bool = False) -> Iterator[List[SalesforceQueryResult]]:
+        if not self.connection:
+            raise SalesforceLoginError("You need to login before querying")
+        if batch_size < 1:
+            raise ValueError(f"`batch_size` must be a positive integer. Value provided => {batch_size}")
+
+        yield from batched(self._iter_records(socl_query_str, include_deleted=include_deleted), batch_size)
+
+    def _iter_records(self, socl_query_str: str, include_deleted: bool = False) -> Iterator[SalesforceQueryResult]:
+        """ Walks the result pages of a query one at a time following `nextRecordsUrl`. A failed page is retried on its own """
+        response = self._call(lambda: self.connection.query(socl_query_str, include_deleted=include_deleted),
+                              "Fetching data from salesforce using SOQL query")
+        while True:
+            for record in response.get("records", []):
+                yield strip_attributes(record)
+
+            next_records_url = response.get("nextRecordsUrl")
+            if response.get("done", True) or not next_records_url:
+                break
+            response = self._call(lambda: self.connection.query_more(next_records_url, identifier_is_url=True, include_deleted=include_deleted),
+                                  f"Fetching the result page {next_records_url}")
+
+
+def bulk_datetime_to_rest(value: str) -> str:
+    """ Bulk API 2.0 returns `2023-07-11T09:08:46.000Z` where the REST API returns `2023-07-11T09:08:46.000+0000` """
+    return value[:-1] + "+0000" if value.endswith("Z") else value
+
+def _parsed_or_unchanged(parse: Callable[[str], Any]) -> Callable[[str], Any]:
+    def parse_value(value: str) -> Any:
+        try:
+            return parse(value)
+        except ValueError:
+            return value
+    return parse_value
+
+# Salesforce field type => parser of its Bulk API CSV values into the JSON values of the REST API.
+# Values of other types, e.g. text and picklists, are strings in both
+BULK_CSV_PARSERS: Dict[str, Callable[[str], Any]] = {
+    "boolean": lambda value: {"true": True, "false": False}.get(value, value),
+    "int": _parsed_or_unchanged(int),
+    "long": _parsed_or_unchanged(int),
+    "double": _parsed_or_unchanged(float),
+    "currency": _parsed_or_unchanged(float),
+    "percent": _parsed_or_unchanged(float),
+    "datetime": bulk_datetime_to_rest,
+}
+
+def from_bulk_csv_value(value: str, field_type: Optional[str] = None) -> Any:
+    """ Converts a Bulk API CSV value of a field of `field_type` (its `type` in the describe) to the value the REST API 
+        would have returned in JSON. Values of fields of unknown type are kept as strings
+    """
+    if value == "":
+        return None
+    parse = BULK_CSV_PARSERS.get(field_type)
+    return parse(value) if parse else value
+
+
+class BulkSalesforceAdapter(SimpleSalesforceAdapter):
+    """ Queries Salesforce through Bulk API 2.0 query jobs
+
+        A job is submitted per query and polled until Salesforce has finished it. 
+        The CSV result pages are then downloaded one at a time and parsed as they stream in,
+        yielding records in the same shape as `SimpleSalesforceAdapter`.
+        CSV values are typed from the describe of the queried object (and of the parents of relationship columns
+        e.g. `Owner.Name`), so a boolean or number is returned as such while a text field holding "true" stays a string.
+        Logging in, `count` and `describe` use the REST API of `SimpleSalesforceAdapter`.
+    """
+    JOB_COMPLETE_STATE = "JobComplete"
+    JOB_FAILED_STATES = ("Failed", "Aborted")
+
+    def __init__(self, 
+                 credential_data: Dict[str, str],
+                 poll_interval: float = 2.0,
+                 max_poll_interval: float = 30.0,
+                 job_timeout: float = 3600.0,
+                 max_records_per_page: Optional[int] = None):
+        super().__init__(credential_data)
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.job_timeout = job_timeout
+        self.max_records_per_page = max_records_per_page
+        # Describes of queried objects and their parents, fetched once per adapter
+        self._describes: Dict[str, Dict[str, Any]] = {}
+        self._describes_lock = threading.Lock()
+
+    def query(self, socl_query_str: str) -> List[SalesforceQueryResult]:
+        return [record for batch in self.query_iter(socl_query_str) for record in batch]
+
+    def query_iter(self, socl_query_str: str, batch_size: int = DEFAULT_QUERY_BATCH_SIZE, include_deleted: bool = False) -> Iterator[List[SalesforceQueryResult]]:
+        if not self.connection:
+            raise SalesforceLoginError("You need to login before querying")
+        if batch_size < 1:
+            raise ValueError(f"`batch_size` must be a positive integer. Value provided => {batch_size}")
+
+        job_id = self._create_job(socl_query_str, include_deleted=include_deleted)
+        job = self._wait_for_job(job_id)
+        yield from batched(self._iter_job_records(job_id, job.get("object")), batch_size)
+
+    @property
+    def _jobs_url(self) -> str:
+        return f"{self.connection.base_url}jobs/query"
+
+    def _request(self, method: str, url: str, idempotent: bool = True, **kwargs) -> "requests.Response":
+        from simple_salesforce.util import exception_handler
+
+        def send() -> "requests.Response":
+            # Headers are read for each attempt as they change when the session is renewed
+            response = self.connection.session.request(method, url, headers=self.connection.headers, **kwargs)
+            if response.status_code >= 300:
+                # Raises the `SalesforceError` of the status, like the REST calls of `simple_salesforce`
+                exception_handler(response, name=url)
+            return response
+
+        # Streamed result pages are read after the slot is released
+        return self._call(send, f"Bulk API request `{method} {url}`", idempotent=idempotent)
+
+    def _create_job(self, socl_query_str: str, include_deleted: bool = False) -> str:
+        operation = "queryAll" if include_deleted else "query"
+        # Not retried, as a job may have been created by a request whose response was lost
+        response = self._request("POST", self._jobs_url, idempotent=False, json={"operation": operation, "query": socl_query_str})
+        return response.json()["id"]
+
+    def _wait_for_job(self, job_id: str) -> Dict[str, Any]:
+        """ Polls the job with an increasing interval until it completes, fails or times out. Returns the completed job """
+        interval = self.poll_interval
+        deadline = time.monotonic() + self.job_timeout
+        while True:
+            job = self._request("GET", f"{self._jobs_url}/{job_id}").json()
+            state = job.get("state")
+            if state == self.JOB_COMPLETE_STATE:
+                return job
+            if state in self.JOB_FAILED_STATES:
+                raise SalesforceFetchError(f"Bulk API query job {job_id} ended in state `{state}` : {job.get('errorMessage')}")
+            if time.monotonic() + interval > deadline:
+                raise SalesforceFetchError(f"Bulk API query job {job_id} did not complete within {self.job_timeout} seconds")
+            time.sleep(interval)
+            interval = min(interval * 2, self.max_poll_interval)
+
+    def _described_fields(self, object_name: str) -> Dict[str, Dict[str, Any]]:
+        """ Fields of the describe of an object by lower cased name """
+        with self._describes_lock:
+            describe = self._describes.get(object_name.lower())
+        if describe is None:
+            describe = self.describe(object_name)
+            with self._describes_lock:
+                self._describes[object_name.lower()] = describe
+        return {field["name"].lower(): field for field in describe.get("fields", [])}
+
+    def _field_type(self, object_name: Optional[str], column: str) -> Optional[str]:
+        """ Describe `type` of a CSV column, following relationship paths e.g. `Account.Owner.Email` through the
+            describes of the parents. `None` when it can not be told, e.g. the parent of a polymorphic relationship
+        """
+        *relationship_names, field_name = column.lower().split(".")
+        for relationship_name in relationship_names:
+            if object_name is None:
+                return None
+            relationships = {field["relationshipName"].lower(): field for field in self._described_fields(object_name).values()
+                             if field.get("relationshipName")}
+            references = (relationships.get(relationship_name) or {}).get("referenceTo") or []
+            object_name = references[0] if len(references) == 1 else None
+        if object_name is None:
+            return None
+        return (self._described_fields(object_name).get(field_name) or {}).get("type")
+
+    def _iter_job_records(self, job_id: str, object_name: Optional[str] = None) -> Iterator[SalesforceQueryResult]:
+        """ Follows the `Sforce-Locator` header across result pages, parsing each CSV page as it streams
+
+            Values are typed by the fields of `object_name`, the object of the job. Without it they are kept as strings
+        """
+        import requests
+        from urllib3.exceptions import HTTPError as StreamError
+        locator = None
+        field_types: Optional[List[Optional[str]]] = None
+        while True:
+            params = {}
+            if locator:
+                params["locator"] = locator
+            if self.max_records_per_page:
+                params["maxRecords"] = self.max_records_per_page
+
+            response = self._request("GET", f"{self._jobs_url}/{job_id}/results", params=params, stream=True)
+            try:
+                response.raw.decode_content = True
+                # Keep the stream open until `TextIOWrapper` has read to the end of it
+                response.raw.auto_close = False
+                reader = csv.reader(io.TextIOWrapper(response.raw, encoding="utf-8", newline=""))
+                header = next(reader, None)
+                if header:
+                    if field_types is None:
+                        field_types = [self._field_type(object_name, field) for field in header]
+                    typed_header = list(zip(header, field_types))
+                    for row in reader:
+                        yield {field: from_bulk_csv_value(value, field_type) for (field, field_type), value in zip(typed_header, row)}
+            except (csv.Error, requests.RequestException, StreamError) as e:
+                raise SalesforceFetchError(f"Error reading Bulk API results of job {job_id} : {str(e)}") from e
+            finally:
+                response.close()
+
+            locator = response.headers.get("Sforce-Locator")
+            if not locator or locator == "null":
+                break
@@ -4,7 +4,7 @@
 """
 
 from dataclasses import dataclass, field, fields
-from typing import Any, Dict, List, Protocol
+from typing import Any, Dict, Iterator, List, Protocol
 
 
 class SalesforceCredentialConfigValueError(Exception):
@@ -36,6 +36,10 @@ class SalesforceFetchError(Exception):
 
 SalesforceQueryResult = Dict[str,Dict[str,Any]]
 
+# Number of records yielded per batch by `SFInterface.query_iter`
+# Matches the largest page size returned by the Salesforce REST query endpoint
+DEFAULT_QUERY_BATCH_SIZE = 2000
+
 class SFInterface(Protocol):
     """
     Represents an interface for interacting with Salesforce.
@@ -65,4 +69,53 @@ class SFInterface(Protocol):
         Raises:
             SalesforceFetchError: If there is an issue fetching data from Salesforce.
         """
-        ...
\ No newline at end of file
+        ...
+
+    def count(self, socl_query_str: str) -> int:
+        """
+        Execute a `SELECT COUNT() ...` SOQL query on Salesforce.
+        
+        Args:
+            socl_query_str (str): The SOQL COUNT() query string to execute.
+            
+        Returns:
+            int: The number of records matching the query.
+            
+        Raises:
+            SalesforceFetchError: If there is an issue fetching data from Salesforce.
+        """
+        ...
+
+    def describe(self, object_name: str) -> Dict[str, Any]:
+        """
+        Describe a Salesforce object i.e. the `sobjects/<object>/describe` resource of the REST API.
+        
+        Args:
+            object_name (str): The API name of the Salesforce object.
+            
+        Returns:
+            Dict[str, Any]: The describe result, including the `name`, `type` and `length` of each of its `fields`.
+            
+        Raises:
+            SalesforceFetchError: If there is an issue fetching the describe from Salesforce.
+        """
+        ...
+
+    def query_iter(self, socl_query_str: str, batch_size: int = DEFAULT_QUERY_BATCH_SIZE, include_deleted: bool = False) -> Iterator[List[SalesforceQueryResult]]:
+        """
+        Execute a SOQL query on Salesforce and lazily yield the results in batches.
+        Pages are only requested from Salesforce as the batches are consumed, 
+        so memory is bounded by `batch_size` regardless of the size of the object.
+        
+        Args:
+            socl_query_str (str): The SOQL query string to execute.
+            batch_size (int): The number of records in each yielded batch. The last batch may be smaller.
+            include_deleted (bool): Run the query as `queryAll`, which also returns deleted and merged records still in the recycle bin.
+            
+        Yields:
+            List[SalesforceQueryResult]: The next batch of query results.
+            
+        Raises:
+            SalesforceFetchError: If there is an issue fetching data from Salesforce.
+        """
+        ...
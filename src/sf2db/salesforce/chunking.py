@@ -0,0 +1,173 @@
+"""
+    Splitting the records of a query into ranges of `Id` that hold about the same number of records
+
+    Salesforce Ids are base 62 numbers sorted in the ASCII order of their digits (0-9, A-Z, a-z), the order of
+    `ORDER BY Id`. Only their first 15 characters are compared, the last 3 of an 18 character Id encode the case
+    of the others. Ranges are cut in that number space like Bulk API PK chunking, and refined with `COUNT()`
+    and `LIMIT 1` queries where records are spread unevenly, so no record is read before the ranges start fetching
+"""
+
+import heapq
+import string
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from sf2db.salesforce.SFInterface import SFInterface
+from sf2db.salesforce.soql import build_query
+
+WhereClause = Union[Tuple[str, str, Any], str]
+
+ID_DIGITS = string.digits + string.ascii_uppercase + string.ascii_lowercase
+ID_LENGTH = 15
+
+# `COUNT()` and `LIMIT 1` queries spent splitting the records of a mapping, per range
+DEFAULT_QUERIES_PER_CHUNK = 8
+
+# Parts of the Id space holding more records than this many ranges are halved
+MAX_PART_SIZE = 1.25
+
+
+def id_to_number(record_id: str) -> int:
+    number = 0
+    for digit in record_id[:ID_LENGTH]:
+        number = number * len(ID_DIGITS) + ID_DIGITS.index(digit)
+    return number
+
+
+def number_to_id(number: int) -> str:
+    """ 15 character Id of a number, e.g. a boundary between two ranges. It does not need to be the Id of a record """
+    digits = []
+    for _ in range(ID_LENGTH):
+        number, digit = divmod(number, len(ID_DIGITS))
+        digits.append(ID_DIGITS[digit])
+    return "".join(reversed(digits))
+
+
+@dataclass
+class IdRange:
+    """Records whose `Id` is from `lower` (inclusive) to `upper` (exclusive). `None` bounds are open ended
+
+        `count` is the number of matching records when the range was split, `None` when it was not counted
+    """
+    lower: Optional[str]
+    upper: Optional[str]
+    count: Optional[int] = None
+
+    def where_clauses(self) -> List[WhereClause]:
+        clauses: List[WhereClause] = []
+        if self.lower is not None:
+            clauses.append(("Id", ">=", self.lower))
+        if self.upper is not None:
+            clauses.append(("Id", "<", self.upper))
+        return clauses
+
+
+def _edge_id(sf_client: SFInterface, object_name: str, where_clauses: List[WhereClause], direction: str) -> Optional[str]:
+    """ Lowest (`ASC`) or highest (`DESC`) `Id` of the matching records, `None` when there are none """
+    records = sf_client.query(build_query(object_name=object_name,
+                                          columns=["Id"],
+                                          where_clauses=where_clauses or None,
+                                          order_by=("Id", direction),
+                                          limit=1))
+    return records[0]["Id"] if records else None
+
+
+@dataclass
+class _Part:
+    """Ids from `lower` to `upper` (exclusive) holding `count` records, the lowest and highest of which are `first` and `last`
+        when they are known
+    """
+    lower: int
+    upper: int
+    count: int
+    first: Optional[int] = None
+    last: Optional[int] = None
+
+    def __lt__(self, other: "_Part") -> bool:
+        # Largest count first in a heap
+        return self.count > other.count
+
+
+def split_id_ranges(sf_client: SFInterface,
+                    object_name: str,
+                    chunks: int,
+                    where_clauses: Optional[List[WhereClause]] = None,
+                    max_queries: Optional[int] = None) -> List[IdRange]:
+    """ Splits the records matching `where_clauses` into up to `chunks` ranges of about the same size
+
+        The span between the lowest and highest `Id` (two `LIMIT 1` queries) is cut into `chunks` equal parts
+        whose records are counted. While queries are left, of `max_queries` (`DEFAULT_QUERIES_PER_CHUNK` per range),
+        the part holding the most records is halved if it holds more than `MAX_PART_SIZE` ranges: it is narrowed to its
+        lowest and highest `Id` with `LIMIT 1` queries, so clusters of Ids e.g. of an org migration are found quickly,
+        and the records of one half are counted. The parts are then merged back into `chunks` ranges of about equal counts.
+        The first and last ranges are open ended, so records created meanwhile are fetched too.
+        Returns no range when no record matches
+    """
+    where_clauses = list(where_clauses or [])
+    first_id = _edge_id(sf_client, object_name, where_clauses, "ASC")
+    if first_id is None:
+        return []
+    if chunks < 2:
+        return [IdRange(lower=None, upper=None)]
+    last_id = _edge_id(sf_client, object_name, where_clauses, "DESC")
+    low, high = id_to_number(first_id), id_to_number(last_id) + 1
+    queries_left = max_queries if max_queries is not None else chunks * DEFAULT_QUERIES_PER_CHUNK
+
+    def clauses_of(lower: int, upper: int) -> List[WhereClause]:
+        return where_clauses + IdRange(lower=number_to_id(lower), upper=number_to_id(upper)).where_clauses()
+
+    def count(lower: int, upper: int) -> int:
+        nonlocal queries_left
+        queries_left -= 1
+        return sf_client.count(build_query(object_name=object_name,
+                                           columns=["COUNT()"],
+                                           where_clauses=clauses_of(lower, upper),
+                                           limit=None))
+
+    def edge(part: _Part, direction: str) -> int:
+        nonlocal queries_left
+        queries_left -= 1
+        return id_to_number(_edge_id(sf_client, object_name, clauses_of(part.lower, part.upper), direction))
+
+    edges = sorted({low + (high - low) * index // chunks for index in range(chunks)} | {high})
+    parts = [_Part(lower, upper, count(lower, upper)) for lower, upper in zip(edges, edges[1:])]
+    parts[0].first, parts[-1].last = low, high - 1
+    total = sum(part.count for part in parts)
+
+    largest = [part for part in parts if part.count > 1]
+    heapq.heapify(largest)
+    halves: Dict[int, Tuple[_Part, _Part]] = {}
+    while largest and largest[0].count * chunks > total * MAX_PART_SIZE and queries_left >= 3:
+        part = heapq.heappop(largest)
+        if part.first is None:
+            part.first = edge(part, "ASC")
+        if part.last is None:
+            part.last = edge(part, "DESC")
+        middle = (part.first + part.last + 1) // 2
+        lower_count = count(part.lower, middle)
+        lower_half = _Part(part.lower, middle, lower_count, first=part.first)
+        upper_half = _Part(middle, part.upper, part.count - lower_count, last=part.last)
+        halves[id(part)] = (lower_half, upper_half)
+        for half in halves[id(part)]:
+            # A single record can not be split
+            if half.count > 1:
+                heapq.heappush(largest, half)
+
+    def leaves(part: _Part) -> List[_Part]:
+        return [leaf for half in halves[id(part)] for leaf in leaves(half)] if id(part) in halves else [part]
+
+    parts = [leaf for part in parts for leaf in leaves(part)]
+
+    # Merged in `Id` order, closing a range each time the running count reaches the next multiple of `total / chunks`
+    ranges: List[IdRange] = []
+    lower_id, range_count, running_count = None, 0, 0
+    for index, part in enumerate(parts):
+        range_count += part.count
+        running_count += part.count
+        is_last = index == len(parts) - 1
+        if (not is_last and range_count and running_count < total and len(ranges) < chunks - 1
+                and running_count * chunks >= total * (len(ranges) + 1)):
+            ranges.append(IdRange(lower=lower_id, upper=number_to_id(part.upper), count=range_count))
+            lower_id, range_count = number_to_id(part.upper), 0
+    ranges.append(IdRange(lower=lower_id, upper=None, count=range_count))
+    return ranges
@@ -0,0 +1,219 @@
+"""
+    Salesforce object metadata (`describe`) cached on disk, and what is derived from it
+
+        - `db_tables.json` entries of mapped objects, with column types, lengths and primary keys
+        - validation of the fields of a `TableMapping` before any record is fetched
+
+    Fields of parent records (relationship paths e.g. `Owner.Name`) are not in the describe of the object,
+    so only their relationship is validated and their columns are derived as `String`
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from sf2db.salesforce.SFInterface import SFInterface
+
+# Imported by `app.settings`, which is loaded before SQLAlchemy and pydantic are needed
+if TYPE_CHECKING:
+    from sf2db.db.model_factory import DBTableDefinition
+    from sf2db.mapping.models import TableMapping
+
+# Seconds a cached describe is used before it is fetched again
+DEFAULT_DESCRIBE_CACHE_TTL = 24 * 60 * 60
+
+# Only these attributes of each field are cached, which keeps the files small and quick to load
+DESCRIBE_FIELD_ATTRIBUTES = ("name", "type", "length", "precision", "scale", "digits", "nillable", "relationshipName")
+
+# Salesforce field type => SQLAlchemy type name used in `db_tables.json`
+SALESFORCE_FIELD_TYPES: Dict[str, str] = {
+    "id": "String",
+    "reference": "String",
+    "string": "String",
+    "picklist": "String",
+    "multipicklist": "String",
+    "combobox": "String",
+    "textarea": "String",
+    "phone": "String",
+    "email": "String",
+    "url": "String",
+    "encryptedstring": "String",
+    "time": "String",
+    "boolean": "Boolean",
+    "int": "Integer",
+    "long": "BigInteger",
+    "double": "Numeric",
+    "currency": "Numeric",
+    "percent": "Numeric",
+    "date": "Date",
+    "datetime": "DateTime",
+}
+
+# Length of String columns of field types whose describe has no length e.g. `09:08:46.000Z` times
+DEFAULT_STRING_LENGTHS: Dict[str, int] = {
+    "time": 18,
+}
+
+# Length of String columns derived for fields of parent records e.g. `Owner.Name`
+RELATIONSHIP_FIELD_LENGTH = 255
+
+# Text fields longer than this are stored in `Text` columns, as `VARCHAR` is limited to a few thousand characters on some databases
+MAX_STRING_LENGTH = 4000
+
+# `int` fields with at most this many digits fit a `SmallInteger` (-32768 to 32767)
+MAX_SMALL_INTEGER_DIGITS = 4
+
+# Field types a watermark can be compared on. Watermarks are rendered as dateTime literals, which Salesforce rejects
+# against `date` fields, and a strict `>` on a day would skip records changed later on the same day
+WATERMARK_FIELD_TYPES = ("datetime",)
+
+
+class DescribeCacheError(Exception):
+    """Raised when the describe of an object is neither cached nor can be fetched."""
+    pass
+
+
+def trim_describe(describe: Dict[str, Any]) -> Dict[str, Any]:
+    """ Keeps the parts of a describe result used by sf2db """
+    return {
+        "name": describe.get("name"),
+        "queryable": describe.get("queryable", True),
+        "fields": [{attribute: field.get(attribute) for attribute in DESCRIBE_FIELD_ATTRIBUTES}
+                   for field in describe.get("fields", [])],
+    }
+
+
+class DescribeCache:
+    """Describe results stored as `<cache_dir>/<object>.json` and reused for `ttl_seconds`
+
+        Without a `cache_dir` every describe is fetched from Salesforce
+    """
+    def __init__(self, cache_dir: Optional[str], ttl_seconds: int = DEFAULT_DESCRIBE_CACHE_TTL):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.ttl_seconds = ttl_seconds
+
+    def _path(self, object_name: str) -> Optional[Path]:
+        return self.cache_dir / f"{object_name}.json" if self.cache_dir else None
+
+    def load(self, object_name: str, fresh_only: bool = True) -> Optional[Dict[str, Any]]:
+        """ The cached describe of an object, `None` when there is none or it is older than the TTL and `fresh_only` """
+        path = self._path(object_name)
+        if path is None or not path.exists():
+            return None
+        cached = json.loads(path.read_text(encoding="utf-8"))
+        if fresh_only and time.time() - cached.get("fetched_at", 0) > self.ttl_seconds:
+            return None
+        return cached["describe"]
+
+    def store(self, object_name: str, describe: Dict[str, Any]) -> None:
+        path = self._path(object_name)
+        if path is None:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        temporary.write_text(json.dumps({"fetched_at": time.time(), "describe": describe}), encoding="utf-8")
+        os.replace(temporary, path)
+
+    def get(self, object_name: str, sf_client: Optional[SFInterface] = None) -> Dict[str, Any]:
+        """ The cached describe of an object while it is fresh, otherwise fetched with `sf_client` and cached
+            Without `sf_client` an expired describe is still used
+        """
+        try:
+            describe = self.load(object_name)
+            if describe is None and sf_client is not None:
+                describe = trim_describe(sf_client.describe(object_name))
+                self.store(object_name, describe)
+            elif describe is None:
+                describe = self.load(object_name, fresh_only=False)
+        except (OSError, ValueError, KeyError) as e:
+            raise DescribeCacheError(f"Error reading the cached describe of `{object_name}` : {str(e)}") from e
+        if describe is None:
+            raise DescribeCacheError(f"No cached describe of `{object_name}` and no Salesforce connection to fetch it")
+        return describe
+
+
+def column_config_from_field(field: Dict[str, Any], column_name: str) -> Dict[str, Any]:
+    """ `db_tables.json` column entry of a described Salesforce field """
+    column_type = SALESFORCE_FIELD_TYPES.get(field["type"])
+    if column_type is None:
+        raise ValueError(f"Salesforce field type `{field['type']}` of `{field['name']}` has no column type. "
+                         f"Must be one of {list(SALESFORCE_FIELD_TYPES)}")
+    column: Dict[str, Any] = {"name": column_name, "type": column_type}
+    if column_type == "String":
+        column["length"] = field.get("length") or DEFAULT_STRING_LENGTHS.get(field["type"], 255)
+        if column["length"] > MAX_STRING_LENGTH:
+            column = {"name": column_name, "type": "Text"}
+    elif column_type == "Integer" and 0 < (field.get("digits") or 0) <= MAX_SMALL_INTEGER_DIGITS:
+        column["type"] = "SmallInteger"
+    elif column_type == "Numeric":
+        if field.get("precision"):
+            # Exact decimals as entered in Salesforce e.g. currency with 2 decimal places
+            column["precision"] = field["precision"]
+            column["scale"] = field.get("scale") or 0
+        else:
+            # Calculated numbers without a declared precision
+            column["type"] = "Float"
+    if field["name"] == "Id":
+        column["primary_key"] = True
+    return column
+
+
+def table_config_from_describe(describe: Dict[str, Any], mapping: "TableMapping") -> Dict[str, Any]:
+    """ `db_tables.json` entry of the table of a mapping, with one column per mapped field """
+    fields = {field["name"].lower(): field for field in describe["fields"]}
+    return {
+        "tablename": mapping.db_table_name,
+        "columns": [{"name": column_mapping.db_column_name, "type": "String", "length": RELATIONSHIP_FIELD_LENGTH}
+                    if "." in column_mapping.saleforce_field else
+                    column_config_from_field(fields[column_mapping.saleforce_field.lower()], column_mapping.db_column_name)
+                    for column_mapping in mapping.col_mappings],
+    }
+
+
+def table_definition_from_describe(describe: Dict[str, Any], mapping: "TableMapping") -> "DBTableDefinition":
+    """ `DBTableDefinition` of the table of a mapping, derived from the describe of its Salesforce object """
+    from sf2db.db.model_factory import generate_db_table_definition
+    return generate_db_table_definition(table_config_from_describe(describe, mapping))
+
+
+def validate_mapping(describe: Dict[str, Any], mapping: "TableMapping") -> List[str]:
+    """ Problems that would make the query of a mapping fail or return unusable values. Empty when the mapping is valid """
+    problems = []
+    if not describe.get("queryable", True):
+        problems.append(f"`{mapping.salesforce_object_name}` can not be queried")
+
+    fields = {field["name"].lower(): field for field in describe["fields"]}
+    relationships = {field["relationshipName"].lower(): field["relationshipName"]
+                     for field in describe["fields"] if field.get("relationshipName")}
+    # Describes cached before relationships were kept can not tell
+    relationships_known = any("relationshipName" in field for field in describe["fields"])
+
+    def check(field_name: str, role: str) -> Optional[Dict[str, Any]]:
+        field = fields.get(field_name.lower())
+        if field is None:
+            problems.append(f"{role} `{field_name}` is not a field of `{mapping.salesforce_object_name}`")
+        elif field["name"] != field_name:
+            # Records are keyed by the exact field name, so a differently cased name would read as empty
+            problems.append(f"{role} `{field_name}` must be spelled `{field['name']}`")
+        return field
+
+    for column_mapping in mapping.col_mappings:
+        if "." in column_mapping.saleforce_field:
+            relationship_name = column_mapping.saleforce_field.split(".", 1)[0]
+            relationship = relationships.get(relationship_name.lower())
+            if relationships_known and relationship is None:
+                problems.append(f"Field `{column_mapping.saleforce_field}` does not start with a relationship of `{mapping.salesforce_object_name}`")
+            elif relationship is not None and relationship != relationship_name:
+                problems.append(f"Relationship `{relationship_name}` of `{column_mapping.saleforce_field}` must be spelled `{relationship}`")
+            continue
+        field = check(column_mapping.saleforce_field, "Field")
+        if field is not None and field["type"] not in SALESFORCE_FIELD_TYPES:
+            problems.append(f"Field `{field['name']}` has type `{field['type']}` which can not be stored in a column")
+
+    if mapping.sync_mode == "incremental":
+        field = check(mapping.watermark_field, "Watermark field")
+        if field is not None and field["type"] not in WATERMARK_FIELD_TYPES:
+            problems.append(f"Watermark field `{field['name']}` must be one of the types {list(WATERMARK_FIELD_TYPES)}")
+    return problems
@@ -0,0 +1,33 @@
+"""
+    The `requests.Session` shared by the Salesforce adapters, so every query, `query_more` page and Bulk API call
+    reuses pooled keep-alive connections rather than paying for a new TLS handshake
+"""
+
+from typing import TYPE_CHECKING
+
+# Imported by the adapters at login, see `SFAdapters`
+if TYPE_CHECKING:
+    import requests
+
+# Connections kept open per Salesforce host when the concurrency of the run is not known. The `requests` default
+DEFAULT_HTTP_POOL_SIZE = 10
+
+
+def create_http_session(pool_size: int = DEFAULT_HTTP_POOL_SIZE) -> "requests.Session":
+    """ Session keeping up to `pool_size` connections open per host, one for each request that can be in flight at once
+
+        Connections beyond `pool_size` are still opened when needed but closed after their request.
+        Responses are requested gzip compressed and decompressed transparently, including streamed Bulk API results
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    if pool_size < 1:
+        raise ValueError(f"`pool_size` must be a positive integer. Value provided => {pool_size}")
+    session = requests.Session()
+    # Retries are made by `SimpleSalesforceAdapter._call`, which knows which requests are safe to repeat
+    adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Accept-Encoding"] = "gzip"
+    return session
@@ -1,20 +1,52 @@
-from typing import List, Optional, Tuple
+from datetime import datetime, timezone
+from typing import Any, List, Optional, Tuple, Union
+
+
+def to_soql_datetime(value: datetime) -> str:
+    """ Formats a datetime as a SOQL dateTime literal. Naive datetimes are assumed to be UTC """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return f"{value:%Y-%m-%dT%H:%M:%S}.{value.microsecond // 1000:03d}Z"
+
+
+def to_soql_literal(value: Any) -> str:
+    """ SOQL dateTime literals must not be quoted, all other values are quoted as strings """
+    if isinstance(value, datetime):
+        return to_soql_datetime(value)
+    return f"'{value}'"
+
+
+def to_soql_condition(column: str, operator: str, value: Any) -> str:
+    return f"{column} {operator} {to_soql_literal(value)}"
+
+
+def keyset_condition(columns: List[str], values: List[Any]) -> str:
+    """ Condition matching records that sort after `values` when ordered by `columns` ascending
+        E.g. (SystemModstamp > X OR (SystemModstamp = X AND Id > 'Y'))
+    """
+    column, value = columns[0], values[0]
+    if len(columns) == 1:
+        return to_soql_condition(column, ">", value)
+    tail = keyset_condition(columns[1:], values[1:])
+    return f"({to_soql_condition(column, '>', value)} OR ({to_soql_condition(column, '=', value)} AND {tail}))"
 
 
 def build_query(object_name: str,
                      columns: List[str] = ["*"],
-                     where_clauses: Optional[List[Tuple[str, str, str]]] = None,
+                     where_clauses: Optional[List[Union[Tuple[str, str, Any], str]]] = None,
                      order_by: Optional[Tuple[str, str]] = None,
-                     limit: int = 100) -> str:
+                     limit: Optional[int] = 100) -> str:
     """
     Constructs a generic SELECT SOQL query.
     
     Parameters:
     - object_name (str): The API name of the Salesforce object.
     - columns (List[str]): The columns you want to fetch. Defaults to all (*).
-    - where_clauses (Optional[List[Tuple[str, str, str]]]): A list of where clause conditions. Each condition is a tuple of (column, operator, value).
+    - where_clauses (Optional[List[Union[Tuple[str, str, Any], str]]]): A list of where clause conditions. Each condition is a tuple of (column, operator, value).
+                                                            `datetime` values are rendered as SOQL dateTime literals.
+                                                            A string is used as a preformatted condition e.g. a combination built with `keyset_condition`.
     - order_by (Optional[Tuple[str, str]]): A tuple specifying order by column and direction.
-    - limit (int): The maximum number of records to fetch. Default is 100.
+    - limit (Optional[int]): The maximum number of records to fetch. Default is 100. `None` fetches all records.
     
     Returns:
     - str: The constructed SOQL query string.
@@ -26,7 +58,7 @@ def build_query(object_name: str,
     # Building WHERE clause
     where_clause = ""
     if where_clauses:
-        conditions = [f"{column} {operator} '{value}'" for column, operator, value in where_clauses]
+        conditions = [condition if isinstance(condition, str) else to_soql_condition(*condition) for condition in where_clauses]
         where_clause = f"WHERE {' AND '.join(conditions)} "
     
     # Building ORDER BY clause
@@ -35,13 +67,16 @@ def build_query(object_name: str,
         column, direction = order_by
         order_by_clause = f"ORDER BY {column} {direction} "
     
+    # Building LIMIT clause
+    limit_clause = f"LIMIT {limit}" if limit is not None else ""
+
     # Constructing final SOQL query
     soql_query = (f"SELECT {select_clause} FROM {object_name} "
                   f"{where_clause}"
                   f"{order_by_clause}"
-                  f"LIMIT {limit}")
+                  f"{limit_clause}")
     
-    return soql_query
+    return soql_query.strip()
 
 # Usage Example
 # if __name__ == "__main__":
@@ -0,0 +1,116 @@
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional, Set, Tuple
+
+# Retries of a failed idempotent request and the base of the jittered exponential backoff between them
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_RETRY_BACKOFF_SECONDS = 1.0
+MAX_RETRY_BACKOFF_SECONDS = 60.0
+
+# Daily API usage (fraction of the org's limit) above which each request is delayed by `DEFAULT_API_USAGE_SLOWDOWN_DELAY` seconds
+DEFAULT_API_USAGE_SLOWDOWN = 0.8
+DEFAULT_API_USAGE_SLOWDOWN_DELAY = 1.0
+
+# Responses worth retrying: rate limited, or the server or a proxy in front of it is unavailable
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+RETRYABLE_ERROR_CODES = ("REQUEST_LIMIT_EXCEEDED", "SERVER_UNAVAILABLE", "QUERY_TIMEOUT")
+# The session expired or was revoked; logging in again lets the request be retried
+INVALID_SESSION_ERROR_CODE = "INVALID_SESSION_ID"
+
+# `Sforce-Limit-Info: api-usage=25/15000`
+API_USAGE_PATTERN = re.compile(r'api-usage=(\d+)/(\d+)')
+
+
+class ApiUsageLimitError(Exception):
+    """Raised instead of making a request once daily API usage has crossed `api_usage_stop`."""
+    pass
+
+
+def parse_api_usage(limit_info: Optional[str]) -> Optional[Tuple[int, int]]:
+    """ (used, limit) of daily API requests from a `Sforce-Limit-Info` header, `None` when it has none """
+    match = API_USAGE_PATTERN.search(limit_info or "")
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def error_codes(content: Any) -> Set[str]:
+    """ `errorCode`s of a Salesforce error response body e.g. [{"errorCode": "INVALID_SESSION_ID", "message": "..."}] """
+    if isinstance(content, dict):
+        content = [content]
+    if not isinstance(content, Iterable) or isinstance(content, (str, bytes)):
+        return set()
+    return {error["errorCode"] for error in content if isinstance(error, dict) and "errorCode" in error}
+
+
+def is_retryable(status: Optional[int], codes: Set[str]) -> bool:
+    return status in RETRYABLE_STATUS_CODES or any(code in codes for code in RETRYABLE_ERROR_CODES)
+
+
+@dataclass
+class RetryPolicy:
+    """How often and after how long adapters retry idempotent requests that failed transiently"""
+    max_retries: int = DEFAULT_MAX_RETRIES
+    backoff_seconds: float = DEFAULT_RETRY_BACKOFF_SECONDS
+    max_backoff_seconds: float = MAX_RETRY_BACKOFF_SECONDS
+
+    def delay(self, attempt: int) -> float:
+        """ Seconds to wait before retry number `attempt` (from 0). Full jitter, so parallel workers do not retry in lockstep """
+        return random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * 2 ** attempt))
+
+
+class RequestLimiter:
+    """ Throttles Salesforce requests across every thread and adapter sharing it
+
+        Adapters wrap each HTTP call in `with self.request_limiter:`, and report the `Sforce-Limit-Info`
+        of the responses with `record_api_usage`.
+        `max_concurrent_requests` caps the requests in flight at once; `None` does not limit.
+        Once daily API usage crosses `api_usage_slowdown` (a fraction of the limit) each request first waits
+        `api_usage_slowdown_delay` seconds, and once it crosses `api_usage_stop` requests fail with `ApiUsageLimitError`.
+        `retry_policy` is applied by the adapters
+    """
+    def __init__(self,
+                 max_concurrent_requests: Optional[int] = None,
+                 api_usage_slowdown: Optional[float] = DEFAULT_API_USAGE_SLOWDOWN,
+                 api_usage_slowdown_delay: float = DEFAULT_API_USAGE_SLOWDOWN_DELAY,
+                 api_usage_stop: Optional[float] = None,
+                 retry_policy: Optional[RetryPolicy] = None):
+        if max_concurrent_requests is not None and max_concurrent_requests < 1:
+            raise ValueError(f"`max_concurrent_requests` must be a positive integer. Value provided => {max_concurrent_requests}")
+        self.max_concurrent_requests = max_concurrent_requests
+        self._semaphore = threading.BoundedSemaphore(max_concurrent_requests) if max_concurrent_requests else None
+        self.api_usage_slowdown = api_usage_slowdown
+        self.api_usage_slowdown_delay = api_usage_slowdown_delay
+        self.api_usage_stop = api_usage_stop
+        self.retry_policy = retry_policy or RetryPolicy()
+        self._api_usage: Optional[Tuple[int, int]] = None
+        self._api_usage_lock = threading.Lock()
+
+    @property
+    def api_usage(self) -> Optional[Tuple[int, int]]:
+        """ (used, limit) of daily API requests as of the latest response, `None` before the first one """
+        return self._api_usage
+
+    def record_api_usage(self, used: int, limit: int) -> None:
+        with self._api_usage_lock:
+            self._api_usage = (used, limit)
+
+    def _usage_ratio(self) -> Optional[float]:
+        usage = self._api_usage
+        return usage[0] / usage[1] if usage and usage[1] else None
+
+    def __enter__(self) -> "RequestLimiter":
+        ratio = self._usage_ratio()
+        if ratio is not None and self.api_usage_stop is not None and ratio >= self.api_usage_stop:
+            raise ApiUsageLimitError(f"Daily API usage {self._api_usage[0]}/{self._api_usage[1]} is above `api-usage-stop` ({self.api_usage_stop})")
+        # Waits before taking a slot, so slowed down requests do not hold back the others
+        if ratio is not None and self.api_usage_slowdown is not None and ratio >= self.api_usage_slowdown:
+            time.sleep(self.api_usage_slowdown_delay)
+        if self._semaphore:
+            self._semaphore.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if self._semaphore:
+            self._semaphore.release()
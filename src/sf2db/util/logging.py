@@ -1,24 +1,33 @@
-
+import logging
 import logging.config
-from typing import Dict
+import threading
+from typing import Dict, Optional
 
 from sf2db.app.config import Configs
 from sf2db.util.json_reader import read_json
 from sf2db.util.path import absolute
 
+# Configured once per process by the first call of `logger()`
+_logger: Optional[logging.Logger] = None
+_logger_lock = threading.Lock()
+
 
 def load_logger(log_config_file:str, app_name : str) :
-    
+
     config = read_json(log_config_file)
     logging.config.dictConfig(config)
 
     return logging.getLogger(app_name)
 
-def logger():
-    LOG_CONFIG_FILE = absolute(__file__, "../../"+Configs.LOGGER_CONFIG)
-    print(LOG_CONFIG_FILE)
-
-    logger = load_logger(log_config_file= LOG_CONFIG_FILE, app_name=Configs.LOGGER_APP_NAME)
-   
-    return logger
-
+def logger() -> logging.Logger:
+    """ The app logger. `logger_config.json` is read and applied on the first call only,
+        later calls, e.g. at import time of each module, return the same logger
+    """
+    global _logger
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                LOG_CONFIG_FILE = absolute(__file__, "../../"+Configs.LOGGER_CONFIG)
+                _logger = load_logger(log_config_file= LOG_CONFIG_FILE, app_name=Configs.LOGGER_APP_NAME)
+
+    return _logger
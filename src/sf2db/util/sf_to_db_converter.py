@@ -1,8 +1,9 @@
 import re
-from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, List
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Dict, List, Mapping, Optional
 
-from dateutil import parser
+import sqlalchemy
 
 
 def convert_datetime(func):
@@ -13,26 +14,144 @@ def convert_datetime(func):
     """
     datetime_pattern = re.compile(r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d{3}\+\d{4}$')
     
-    def wrapper(sf_data, *args, **kwargs):
-        converted_data = {
+    def convert_values(sf_data):
+        # Only the legacy `convert` uses `dateutil`; `compile_converter` parses with `datetime.fromisoformat`
+        from dateutil import parser
+        # Parent records of relationship paths are nested dicts in REST results
+        return {
             key: parser.parse(value).replace(tzinfo=timezone.utc)
                    if isinstance(value, str) and datetime_pattern.match(value)
+                   else convert_values(value) if isinstance(value, dict)
                    else value
             for key, value in sf_data.items()
         }
-        return func(converted_data, *args, **kwargs)
+
+    def wrapper(sf_data, *args, **kwargs):
+        return func(convert_values(sf_data), *args, **kwargs)
     return wrapper
 
+def path_getter(sf_field: str) -> Callable[[Dict[str, Any]], Any]:
+    """ Getter of a relationship path e.g. `Owner.Name` or `Account.Owner.Email` from a record
+
+        The REST API nests the fields of a parent under the relationship name, `{"Owner": {"attributes": {..}, "Name": ".."}}`,
+        and returns `None` in place of a missing parent. The Bulk API returns the flat column `Owner.Name`. Both are read
+    """
+    parts = tuple(sf_field.split("."))
+
+    def get_path(sf_data: Dict[str, Any]) -> Any:
+        if sf_field in sf_data:
+            return sf_data[sf_field]
+        value = sf_data
+        for part in parts:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(part)
+        return value
+
+    return get_path
+
+
 @convert_datetime
 def convert(sf_data: Dict[str, str], 
             salesforce_fields: List[str], 
             db_columns: List[str]) -> Dict[str, Any]:
-    coverted_data =   {db_column: sf_data.get(sf_field) for sf_field, db_column in zip(salesforce_fields, db_columns)}
+    coverted_data =   {db_column: path_getter(sf_field)(sf_data) if "." in sf_field else sf_data.get(sf_field) 
+                       for sf_field, db_column in zip(salesforce_fields, db_columns)}
     # print(coverted_data)
     return coverted_data
 
 
 
+def parse_sf_datetime(value: Any) -> Any:
+    """ Fast parser of Salesforce timestamps e.g. `2023-07-11T09:08:46.000+0000` into UTC datetimes
+
+        Uses the C implemented `datetime.fromisoformat` instead of the general purpose `dateutil` parser.
+        Values that are not ISO 8601 strings are returned unchanged
+    """
+    if not isinstance(value, str):
+        return value
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return value
+    return parsed.astimezone(timezone.utc) if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def parse_sf_date(value: Any) -> Any:
+    """ Parser of Salesforce dates e.g. `2023-07-11` into `date`. Values that are not ISO 8601 dates are returned unchanged """
+    if not isinstance(value, str):
+        return value
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return value
+
+
+def parse_sf_decimal(value: Any) -> Any:
+    """ Parser of Salesforce numbers into exact `Decimal`s e.g. `1234.56` of a currency field
+        
+        Floats are converted through their shortest repr so `0.1` becomes `Decimal('0.1')`, not its binary expansion.
+        Other values are returned unchanged
+    """
+    if isinstance(value, bool) or not isinstance(value, (float, int, str)):
+        return value
+    try:
+        return Decimal(repr(value) if isinstance(value, float) else value)
+    except InvalidOperation:
+        return value
+
+
+RecordConverter = Callable[[Dict[str, Any]], Dict[str, Any]]
+ValueParser = Callable[[Any], Any]
+
+def get_value_parser(column_type: sqlalchemy.types.TypeEngine) -> Optional[ValueParser]:
+    """ Parser applied to Salesforce values of a column of the given type. `None` when values are stored as is """
+    if isinstance(column_type, sqlalchemy.DateTime):
+        return parse_sf_datetime
+    if isinstance(column_type, sqlalchemy.Date):
+        return parse_sf_date
+    # `Float` columns keep the float values as they are, on versions of SQLAlchemy where `Float` is a `Numeric`
+    if isinstance(column_type, sqlalchemy.Numeric) and not isinstance(column_type, sqlalchemy.Float):
+        return parse_sf_decimal
+    return None
+
+def compile_converter(salesforce_fields: List[str], 
+                      db_columns: List[str], 
+                      column_types: Mapping[str, sqlalchemy.types.TypeEngine]) -> RecordConverter:
+    """ Builds the converter of one `TableMapping` once, ahead of converting any record
+
+        `column_types` are the types of the target columns, e.g. `{c.name: c.type for c in DBTable.__table__.columns}`.
+        Only columns whose type needs it (e.g. DateTime) have their values parsed, 
+        every other value is copied as is. Each record is mapped in a single pass without intermediate dicts,
+        unlike `convert` which pattern matches every value of every record.
+        Fields of parent records are mapped with relationship paths e.g. `Owner.Name`, see `path_getter`
+    """
+    copied_fields = []
+    parsed_fields = []
+    path_fields = []
+    for sf_field, db_column in zip(salesforce_fields, db_columns):
+        value_parser = get_value_parser(column_types[db_column]) if db_column in column_types else None
+        if "." in sf_field:
+            path_fields.append((path_getter(sf_field), db_column, value_parser))
+        elif value_parser is None:
+            copied_fields.append((sf_field, db_column))
+        else:
+            parsed_fields.append((sf_field, db_column, value_parser))
+    copied_fields = tuple(copied_fields)
+    parsed_fields = tuple(parsed_fields)
+    path_fields = tuple(path_fields)
+
+    def converter(sf_data: Dict[str, Any]) -> Dict[str, Any]:
+        get = sf_data.get
+        row = {db_column: get(sf_field) for sf_field, db_column in copied_fields}
+        for sf_field, db_column, value_parser in parsed_fields:
+            row[db_column] = value_parser(get(sf_field))
+        for get_path, db_column, value_parser in path_fields:
+            value = get_path(sf_data)
+            row[db_column] = value_parser(value) if value_parser else value
+        return row
+
+    return converter
 
 
 # Example usage
@@ -0,0 +1,241 @@
+"""
+    `BulkSalesforceAdapter` against a local `http.server` standing in for the Bulk API 2.0 query endpoints,
+    so no Salesforce org is needed
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, Dict, List
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+from sf2db.salesforce.SFAdapters import BulkSalesforceAdapter
+from sf2db.salesforce.SFInterface import SalesforceFetchError
+from sf2db.salesforce.throttle import RequestLimiter, RetryPolicy
+
+API_PATH = "/services/data/v59.0/"
+JOB_ID = "7501x000000TEST"
+
+CREDENTIALS = {"username": "user@example.com", "password": "password", "security_token": "token",
+               "consumer_key": "key", "consumer_secret": "secret"}
+
+ACCOUNT_DESCRIBE = {
+    "name": "Account",
+    "fields": [
+        {"name": "Id", "type": "id"},
+        {"name": "Name", "type": "string"},
+        {"name": "Description", "type": "textarea"},
+        {"name": "Status__c", "type": "picklist"},
+        {"name": "IsPartner", "type": "boolean"},
+        {"name": "NumberOfEmployees", "type": "int"},
+        {"name": "AnnualRevenue", "type": "currency"},
+        {"name": "LastModifiedDate", "type": "datetime"},
+        {"name": "OwnerId", "type": "reference", "relationshipName": "Owner", "referenceTo": ["User"]},
+    ],
+}
+USER_DESCRIBE = {
+    "name": "User",
+    "fields": [
+        {"name": "Name", "type": "string"},
+        {"name": "IsActive", "type": "boolean"},
+    ],
+}
+
+
+class BulkStandIn:
+    """ Bulk API 2.0 query job endpoints serving `pages` of CSV results, joined by `Sforce-Locator`
+
+        The job is reported `InProgress` for `polls_before_complete` polls. Statuses in `poll_failures`
+        are answered to the next polls, before the job is reported at all
+    """
+    def __init__(self):
+        self.pages: List[str] = []
+        self.polls_before_complete = 1
+        self.final_state = "JobComplete"
+        self.poll_failures: List[int] = []
+        self.describes = {"Account": ACCOUNT_DESCRIBE, "User": USER_DESCRIBE}
+        self.created_jobs: List[Dict[str, Any]] = []
+        self.polls = 0
+        self.result_requests: List[Dict[str, List[str]]] = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}{API_PATH}"
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str, headers: Dict[str, str] = None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Sforce-Limit-Info", "api-usage=25/15000")
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_json(self, status: int, content: Any):
+                self._send(status, json.dumps(content).encode("utf-8"), "application/json")
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if urlparse(self.path).path != f"{API_PATH}jobs/query":
+                    return self._send_json(404, [{"errorCode": "NOT_FOUND", "message": self.path}])
+                with stand_in.lock:
+                    stand_in.created_jobs.append(json.loads(body))
+                self._send_json(200, {"id": JOB_ID, "state": "UploadComplete"})
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == f"{API_PATH}jobs/query/{JOB_ID}":
+                    with stand_in.lock:
+                        failure = stand_in.poll_failures.pop(0) if stand_in.poll_failures else None
+                        if failure is None:
+                            stand_in.polls += 1
+                        polls = stand_in.polls
+                    if failure is not None:
+                        return self._send_json(failure, [{"errorCode": "SERVER_UNAVAILABLE", "message": "Try again"}])
+                    state = stand_in.final_state if polls > stand_in.polls_before_complete else "InProgress"
+                    return self._send_json(200, {"id": JOB_ID, "object": "Account", "state": state, "errorMessage": "Query failed"})
+                if url.path == f"{API_PATH}jobs/query/{JOB_ID}/results":
+                    params = parse_qs(url.query)
+                    with stand_in.lock:
+                        stand_in.result_requests.append(params)
+                    page = int(params.get("locator", ["0"])[0])
+                    locator = str(page + 1) if page + 1 < len(stand_in.pages) else "null"
+                    return self._send(200, stand_in.pages[page].encode("utf-8"), "text/csv", {"Sforce-Locator": locator})
+                for object_name, describe in stand_in.describes.items():
+                    if url.path == f"{API_PATH}sobjects/{object_name}/describe":
+                        return self._send_json(200, describe)
+                self._send_json(404, [{"errorCode": "NOT_FOUND", "message": self.path}])
+
+        return Handler
+
+
+class StandInConnection:
+    """ The parts of `simple_salesforce.Salesforce` the adapters use, pointed at the stand-in """
+    api_usage: Dict[str, Any] = {}
+
+    def __init__(self, base_url: str, session: requests.Session):
+        self.base_url = base_url
+        self.session = session
+        self.session_id = "stand-in-session"
+        self.headers = {"Authorization": f"Bearer {self.session_id}", "Content-Type": "application/json"}
+
+    def __getattr__(self, object_name: str) -> SimpleNamespace:
+        # `connection.Account.describe()`, like the `SFType`s of `simple_salesforce`
+        url = f"{self.base_url}sobjects/{object_name}/describe"
+        return SimpleNamespace(describe=lambda: self.session.get(url, headers=self.headers).json())
+
+
+@pytest.fixture
+def stand_in():
+    server = BulkStandIn()
+    thread = threading.Thread(target=server.server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.server.shutdown()
+    server.server.server_close()
+
+
+@pytest.fixture
+def adapter(stand_in):
+    bulk_adapter = BulkSalesforceAdapter(CREDENTIALS, poll_interval=0, max_poll_interval=0, job_timeout=10)
+    bulk_adapter.request_limiter = RequestLimiter(retry_policy=RetryPolicy(max_retries=2, backoff_seconds=0))
+    bulk_adapter.http_session = requests.Session()
+    bulk_adapter.connection = StandInConnection(stand_in.base_url, bulk_adapter.http_session)
+    yield bulk_adapter
+    bulk_adapter.http_session.close()
+
+
+def test_creates_polls_and_follows_locator_pages(stand_in, adapter):
+    stand_in.pages = ["Id,Name\r\n001A,One\r\n001B,Two\r\n",
+                      "Id,Name\r\n001C,Three\r\n",
+                      "Id,Name\r\n001D,Four\r\n001E,Five\r\n"]
+    stand_in.polls_before_complete = 2
+
+    batches = list(adapter.query_iter("SELECT Id, Name FROM Account", batch_size=2))
+
+    assert stand_in.created_jobs == [{"operation": "query", "query": "SELECT Id, Name FROM Account"}]
+    assert stand_in.polls == 3
+    assert [params.get("locator") for params in stand_in.result_requests] == [None, ["1"], ["2"]]
+    # Batches are cut across page boundaries
+    assert [[record["Id"] for record in batch] for batch in batches] == [["001A", "001B"], ["001C", "001D"], ["001E"]]
+    assert batches[1][1] == {"Id": "001D", "Name": "Four"}
+    assert adapter.request_limiter.api_usage == (25, 15000)
+
+
+def test_include_deleted_runs_query_all_with_page_size(stand_in, adapter):
+    stand_in.pages = ["Id\r\n001A\r\n"]
+    adapter.max_records_per_page = 5000
+
+    assert adapter.query("SELECT Id FROM Account WHERE IsDeleted = true") == [{"Id": "001A"}]
+    assert list(adapter.query_iter("SELECT Id FROM Account", include_deleted=True)) == [[{"Id": "001A"}]]
+
+    assert [job["operation"] for job in stand_in.created_jobs] == ["query", "queryAll"]
+    assert all(params["maxRecords"] == ["5000"] for params in stand_in.result_requests)
+
+
+def test_parses_quoted_and_multiline_csv_values(stand_in, adapter):
+    stand_in.pages = ['Id,Name,Description\r\n'
+                      '001A,"Smith, Jones & Co","He said ""hi""\r\nthen left"\r\n'
+                      '001B,Crème brûlée,\r\n'
+                      '001C,"",""\r\n']
+
+    records = adapter.query("SELECT Id, Name, Description FROM Account")
+
+    assert records == [{"Id": "001A", "Name": "Smith, Jones & Co", "Description": 'He said "hi"\r\nthen left'},
+                       {"Id": "001B", "Name": "Crème brûlée", "Description": None},
+                       {"Id": "001C", "Name": None, "Description": None}]
+
+
+def test_types_values_like_the_rest_api(stand_in, adapter):
+    stand_in.pages = ["Id,Name,Status__c,IsPartner,NumberOfEmployees,AnnualRevenue,LastModifiedDate,Owner.Name,Owner.IsActive\r\n"
+                      "001A,true,false,true,12,1500.5,2023-07-11T09:08:46.000Z,2023-07-11T09:08:46.000Z,false\r\n"
+                      "001B,Other,Open,false,,,,,\r\n"]
+
+    records = adapter.query("SELECT Id, Name, Status__c, IsPartner, NumberOfEmployees, AnnualRevenue, "
+                            "LastModifiedDate, Owner.Name, Owner.IsActive FROM Account")
+
+    # Text and picklist fields keep values that look like booleans or timestamps as they are
+    assert records[0] == {"Id": "001A", "Name": "true", "Status__c": "false", "IsPartner": True, "NumberOfEmployees": 12,
+                          "AnnualRevenue": 1500.5, "LastModifiedDate": "2023-07-11T09:08:46.000+0000",
+                          "Owner.Name": "2023-07-11T09:08:46.000Z", "Owner.IsActive": False}
+    assert records[1] == {"Id": "001B", "Name": "Other", "Status__c": "Open", "IsPartner": False, "NumberOfEmployees": None,
+                          "AnnualRevenue": None, "LastModifiedDate": None, "Owner.Name": None, "Owner.IsActive": None}
+
+
+def test_retries_transient_poll_failures(stand_in, adapter):
+    stand_in.pages = ["Id\r\n001A\r\n"]
+    stand_in.poll_failures = [503, 503]
+
+    assert adapter.query("SELECT Id FROM Account") == [{"Id": "001A"}]
+    assert stand_in.poll_failures == []
+
+
+def test_gives_up_after_max_retries(stand_in, adapter):
+    stand_in.poll_failures = [503, 503, 503]
+
+    with pytest.raises(SalesforceFetchError, match="after 3 attempts"):
+        adapter.query("SELECT Id FROM Account")
+
+
+def test_failed_job_raises(stand_in, adapter):
+    stand_in.final_state = "Failed"
+
+    with pytest.raises(SalesforceFetchError, match="ended in state `Failed` : Query failed"):
+        adapter.query("SELECT Id FROM Account")
+    assert stand_in.result_requests == []
@@ -0,0 +1,161 @@
+"""
+    Tables are restored after a full load that fails in any way, and repaired at startup when an earlier run
+    was killed before it could restore them (see `App._persist_salesforce_to_db` and `App._repair_tables`)
+"""
+
+import json
+from typing import Any, Dict, Iterator, List, Optional
+
+import pytest
+import yaml
+from sqlalchemy import MetaData, Table, create_engine, inspect, text
+
+from sf2db.app.app import App
+from sf2db.db.session import DBSession
+from sf2db.salesforce.throttle import RequestLimiter
+
+RECORDS = [{"Id": f"001{index:015d}", "Name": f"Account {index}", "SystemModstamp": "2024-01-01T00:00:00.000+0000"}
+           for index in range(10)]
+
+
+class StubSalesforce:
+    """ `SFInterface` serving `RECORDS` in batches of 4, raising `failure` instead of the second batch when it is set
+
+        `on_fetch` is called when the records of a mapping start being fetched
+    """
+    failure: Optional[BaseException] = None
+    on_fetch = None
+
+    def __init__(self, credential_data: Dict[str, str]):
+        self.request_limiter = RequestLimiter()
+        self.http_session = None
+
+    def login(self) -> None:
+        pass
+
+    def describe(self, object_name: str) -> Dict[str, Any]:
+        return {"name": object_name, "queryable": True,
+                "fields": [{"name": "Id", "type": "id", "length": 18},
+                           {"name": "Name", "type": "string", "length": 80},
+                           {"name": "SystemModstamp", "type": "datetime"}]}
+
+    def count(self, socl_query_str: str) -> int:
+        return len(RECORDS)
+
+    def query(self, socl_query_str: str) -> List[Dict[str, Any]]:
+        return [record for batch in self.query_iter(socl_query_str) for record in batch]
+
+    def query_iter(self, socl_query_str: str, batch_size: int = 2000, include_deleted: bool = False) -> Iterator[List[Dict[str, Any]]]:
+        if StubSalesforce.on_fetch:
+            StubSalesforce.on_fetch()
+        yield RECORDS[:4]
+        if StubSalesforce.failure is not None:
+            raise StubSalesforce.failure
+        yield RECORDS[4:]
+
+
+@pytest.fixture(autouse=True)
+def stub_salesforce():
+    yield StubSalesforce
+    StubSalesforce.failure = None
+    StubSalesforce.on_fetch = None
+
+
+def make_app(tmp_path, table_name: str, connection_string: str, db_config: Optional[Dict[str, Any]] = None) -> App:
+    (tmp_path / "credentials.yaml").write_text("{}")
+    (tmp_path / "mappings.json").write_text(json.dumps([{
+        "salesforce-object": "Account",
+        "db-table": table_name,
+        "column-mapping": {"Id": "ID", "Name": "NAME", "SystemModstamp": "MODIFIED"},
+        "sync-mode": "incremental",
+        "watermark-field": "SystemModstamp",
+    }]))
+    (tmp_path / "tables.json").write_text(json.dumps([{
+        "tablename": table_name,
+        "columns": [{"name": "ID", "type": "String", "length": 18, "primary_key": True},
+                    {"name": "NAME", "type": "String", "length": 80},
+                    {"name": "MODIFIED", "type": "DateTime"}],
+        "indexes": [{"columns": ["NAME"]}],
+    }]))
+    (tmp_path / "db.yaml").write_text(yaml.safe_dump({"connection-string": connection_string, **(db_config or {})}))
+    (tmp_path / "sync.yaml").write_text(yaml.safe_dump({"defer-index-build": True}))
+    return App(path_db_table_def=str(tmp_path / "tables.json"),
+               path_db_config=str(tmp_path / "db.yaml"),
+               path_sf_credentials=str(tmp_path / "credentials.yaml"),
+               path_sf2db_mappings=str(tmp_path / "mappings.json"),
+               salesforce_client_adapter=StubSalesforce,
+               path_sync_config=str(tmp_path / "sync.yaml"))
+
+
+def index_names(engine, table_name: str) -> List[str]:
+    return [index["name"] for index in inspect(engine).get_indexes(table_name)]
+
+
+def is_unlogged(engine, table_name: str) -> bool:
+    db_session = DBSession(engine.url)
+    try:
+        return db_session.is_unlogged(Table(table_name, MetaData(), autoload_with=engine))
+    finally:
+        db_session.dispose()
+
+
+def drop_table(engine, table_name: str) -> None:
+    """ Drops the table and the watermark of its mapping, left by an earlier run of the test against the same server """
+    with engine.begin() as connection:
+        connection.exec_driver_sql(f'DROP TABLE IF EXISTS "{table_name}"')
+        if inspect(connection).has_table("sf2db_sync_state"):
+            connection.execute(text("DELETE FROM sf2db_sync_state WHERE mapping_key = :key"), {"key": f"Account->{table_name}"})
+
+
+def test_unexpected_error_rebuilds_deferred_indexes(tmp_path):
+    table_name = "sf2db_test_restore_sqlite"
+    StubSalesforce.failure = ValueError("Unexpected value")
+    app = make_app(tmp_path, table_name, f"sqlite:///{tmp_path / 'target.db'}")
+
+    app.run()
+
+    assert not app.summary[0].succeeded and "Unexpected value" in app.summary[0].error
+    assert index_names(create_engine(f"sqlite:///{tmp_path / 'target.db'}"), table_name) == [f"ix_{table_name}_NAME"]
+
+
+@pytest.mark.parametrize("failure", [ValueError("Unexpected value"), KeyboardInterrupt()], ids=["error", "interrupt"])
+def test_failed_full_load_restores_logging_and_indexes(tmp_path, postgresql_url, failure):
+    table_name = f"sf2db_test_restore_{type(failure).__name__.lower()}"
+    engine = create_engine(postgresql_url)
+    drop_table(engine, table_name)
+    states = []
+    StubSalesforce.on_fetch = lambda: states.append((is_unlogged(engine, table_name), index_names(engine, table_name)))
+    StubSalesforce.failure = failure
+    app = make_app(tmp_path, table_name, postgresql_url, {"bulk-load": {"enabled": True, "unlogged": True}})
+
+    if isinstance(failure, KeyboardInterrupt):
+        with pytest.raises(KeyboardInterrupt):
+            app.run()
+    else:
+        app.run()
+
+    # Switched and dropped for the load, restored after it failed
+    assert states == [(True, [])]
+    assert not is_unlogged(engine, table_name)
+    assert index_names(engine, table_name) == [f"ix_{table_name}_NAME"]
+    drop_table(engine, table_name)
+
+
+def test_startup_repairs_a_table_left_unlogged_without_indexes(tmp_path, postgresql_url):
+    table_name = "sf2db_test_restore_repair"
+    engine = create_engine(postgresql_url)
+    drop_table(engine, table_name)
+    # As left by a bulk load that was killed, with the rows it had committed
+    with engine.begin() as connection:
+        connection.exec_driver_sql(f'CREATE UNLOGGED TABLE "{table_name}" ("ID" VARCHAR(18) PRIMARY KEY, "NAME" VARCHAR(80), "MODIFIED" TIMESTAMP)')
+        connection.exec_driver_sql(f"""INSERT INTO "{table_name}" VALUES ('001999999999999999', 'Earlier account', '2023-01-01')""")
+    states = []
+    StubSalesforce.on_fetch = lambda: states.append((is_unlogged(engine, table_name), index_names(engine, table_name)))
+    # Without `bulk-load` settings, and not a full load, so only the repair at startup restores the table
+    app = make_app(tmp_path, table_name, postgresql_url)
+
+    app.run()
+
+    assert app.summary[0].succeeded
+    assert states == [(False, [f"ix_{table_name}_NAME"])]
+    drop_table(engine, table_name)
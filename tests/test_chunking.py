@@ -0,0 +1,116 @@
+"""
+    `split_id_ranges` against an in-memory object whose Ids are evenly spread or clustered
+"""
+
+import random
+import re
+from bisect import bisect_left
+from typing import List
+
+import pytest
+
+from sf2db.salesforce.chunking import DEFAULT_QUERIES_PER_CHUNK, ID_DIGITS, IdRange, id_to_number, number_to_id, split_id_ranges
+
+ID_CONDITION = re.compile(r"Id (>=|<) '(\w+)'")
+
+
+def record_id(pod: str, serial: int) -> str:
+    """ 18 character Account Id, e.g. `001` `5g` `0` + base 62 serial + case suffix """
+    return "0015" + pod + number_to_id(serial)[-9:] + "AAA"
+
+
+class IdsClient:
+    """ Answers the `LIMIT 1` and `COUNT()` queries of `split_id_ranges` from a list of Ids, comparing them like Salesforce """
+    def __init__(self, ids: List[str]):
+        self.ids = sorted(ids, key=id_to_number)
+        self.numbers = [id_to_number(id_) for id_ in self.ids]
+        self.queries: List[str] = []
+
+    def _matching(self, soql_query: str) -> List[str]:
+        start, end = 0, len(self.ids)
+        for operator, value in ID_CONDITION.findall(soql_query):
+            if operator == ">=":
+                start = max(start, bisect_left(self.numbers, id_to_number(value)))
+            else:
+                end = min(end, bisect_left(self.numbers, id_to_number(value)))
+        return self.ids[start:end]
+
+    def count(self, soql_query: str) -> int:
+        self.queries.append(soql_query)
+        return len(self._matching(soql_query))
+
+    def query(self, soql_query: str):
+        self.queries.append(soql_query)
+        assert soql_query.endswith("LIMIT 1")
+        matching = self._matching(soql_query)
+        if "ORDER BY Id DESC" in soql_query:
+            matching = matching[::-1]
+        return [{"Id": id_} for id_ in matching[:1]]
+
+    def query_iter(self, *args, **kwargs):
+        raise AssertionError("Ranges must be split without reading the records")
+
+
+def records_in(client: IdsClient, id_range: IdRange) -> List[str]:
+    conditions = " AND ".join(f"Id {operator} '{value}'" for _, operator, value in id_range.where_clauses())
+    return client._matching(conditions)
+
+
+def assert_partition(client: IdsClient, ranges: List[IdRange]) -> None:
+    """ Every Id falls in exactly one range and the counts of the ranges are exact """
+    assert ranges[0].lower is None and ranges[-1].upper is None
+    assert [id_range.upper for id_range in ranges[:-1]] == [id_range.lower for id_range in ranges[1:]]
+    assert sum(len(records_in(client, id_range)) for id_range in ranges) == len(client.ids)
+    assert [id_range.count for id_range in ranges] == [len(records_in(client, id_range)) for id_range in ranges]
+
+
+def test_id_numbers_sort_like_ids():
+    ids = sorted({"".join(random.Random(seed).choice(ID_DIGITS) for _ in range(15)) for seed in range(200)})
+    assert sorted(ids, key=id_to_number) == ids
+    assert all(number_to_id(id_to_number(id_)) == id_ for id_ in ids)
+    assert id_to_number("001000000000001AAA") == id_to_number("001000000000001")
+
+
+def test_even_ids_split_into_equal_ranges():
+    client = IdsClient([record_id("5g", serial) for serial in range(0, 80_000, 10)])
+
+    ranges = split_id_ranges(client, "Account", chunks=4)
+
+    assert_partition(client, ranges)
+    assert [id_range.count for id_range in ranges] == [2000, 2000, 2000, 2000]
+    # The lowest and highest Id and a count per range
+    assert len(client.queries) == 2 + 4
+
+
+def test_clustered_ids_are_refined_within_the_query_budget():
+    # Most records were created on one pod, a few migrated from another far away in the Id space
+    ids = [record_id("5g", serial) for serial in range(100)] + [record_id("Zz", serial) for serial in range(5000, 25000, 2)]
+    client = IdsClient(ids)
+
+    ranges = split_id_ranges(client, "Account", chunks=8)
+
+    assert_partition(client, ranges)
+    assert len(ranges) == 8
+    target = len(ids) / 8
+    assert all(target * 0.5 <= id_range.count <= target * 1.5 for id_range in ranges)
+    # The lowest and highest Id, then the budget of `DEFAULT_QUERIES_PER_CHUNK` per range
+    assert len(client.queries) <= 2 + 8 * DEFAULT_QUERIES_PER_CHUNK
+
+
+def test_where_clauses_apply_to_every_query():
+    client = IdsClient([record_id("5g", serial) for serial in range(1000)])
+
+    split_id_ranges(client, "Account", chunks=3, where_clauses=["SystemModstamp > 2024-01-01T00:00:00.000Z"])
+
+    assert client.queries and all("SystemModstamp > 2024-01-01T00:00:00.000Z" in query for query in client.queries)
+
+
+@pytest.mark.parametrize("ids, expected_ranges", [([], 0), ([record_id("5g", 7)], 1), ([record_id("5g", 7), record_id("5g", 8)], 2)])
+def test_few_records(ids, expected_ranges):
+    client = IdsClient(ids)
+
+    ranges = split_id_ranges(client, "Account", chunks=4)
+
+    assert len(ranges) == expected_ranges
+    if ranges:
+        assert_partition(client, ranges)
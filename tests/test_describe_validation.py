@@ -0,0 +1,36 @@
+"""
+    Watermark fields of incremental mappings checked against the describe of their object (see `validate_mapping`)
+"""
+
+import pytest
+
+from sf2db.mapping.model_factory import mapping_factory
+from sf2db.salesforce.describe import validate_mapping
+
+DESCRIBE = {"name": "Opportunity", "queryable": True,
+            "fields": [{"name": "Id", "type": "id"},
+                       {"name": "Name", "type": "string"},
+                       {"name": "SystemModstamp", "type": "datetime"},
+                       {"name": "CloseDate", "type": "date"}]}
+
+
+def incremental_mapping(watermark_field: str):
+    return mapping_factory({"salesforce-object": "Opportunity",
+                            "db-table": "OPPORTUNITY",
+                            "column-mapping": {"Id": "ID", "Name": "NAME"},
+                            "sync-mode": "incremental",
+                            "write-mode": "upsert",
+                            "watermark-field": watermark_field})
+
+
+def test_datetime_watermark_is_valid():
+    assert validate_mapping(DESCRIBE, incremental_mapping("SystemModstamp")) == []
+
+
+@pytest.mark.parametrize("watermark_field, problem", [
+    ("CloseDate", "Watermark field `CloseDate` must be one of the types ['datetime']"),
+    ("Name", "Watermark field `Name` must be one of the types ['datetime']"),
+    ("LastModifiedDate", "Watermark field `LastModifiedDate` is not a field of `Opportunity`"),
+])
+def test_other_watermarks_are_rejected(watermark_field, problem):
+    assert validate_mapping(DESCRIBE, incremental_mapping(watermark_field)) == [problem]
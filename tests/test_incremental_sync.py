@@ -0,0 +1,366 @@
+"""
+    Incremental mappings against an in-memory org: records changed since the stored watermark are fetched, and
+    checkpointed mappings resume after the last committed record. Records deleted in Salesforce are propagated to the
+    table (see `App._persist_salesforce_to_db` and `App._propagate_deletes`). Mappings with `chunks` load their `Id` ranges
+    concurrently, also in bulk-load mode
+"""
+
+import json
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+import pytest
+import yaml
+from sqlalchemy import create_engine, text
+
+from sf2db.app.app import App
+from sf2db.app.spool import pending_spool_files, spool_file, write_spool
+from sf2db.db.models import Base
+from sf2db.mapping.model_factory import MappingValueError
+from sf2db.salesforce.SFInterface import SalesforceFetchError
+from sf2db.salesforce.soql import keyset_condition
+from sf2db.salesforce.throttle import RequestLimiter
+
+CONDITION = re.compile(r"(\w+) (>=|<=|>|<|=) ('[^']*'|\d{4}-\d\d-\d\dT[\d:.]+Z|true|false)")
+OPERATORS = {">": "__gt__", ">=": "__ge__", "<": "__lt__", "<=": "__le__", "=": "__eq__"}
+
+# Each `App` of a test stands for a new run of sf2db, which defines the table classes again
+pytestmark = pytest.mark.filterwarnings("ignore:This declarative base already contains a class")
+
+
+def modstamp(day: int, hour: int = 0) -> str:
+    return f"2024-01-{day:02d}T{hour:02d}:00:00.000+0000"
+
+
+def account(serial: int, name: str, modified: str, is_deleted: bool = False) -> Dict[str, Any]:
+    return {"Id": f"001{serial:015d}", "Name": name, "SystemModstamp": modified, "IsDeleted": is_deleted}
+
+
+def comparable(value: Any) -> Any:
+    """ Timestamps of records and dateTime literals of SOQL in one sortable text form """
+    if isinstance(value, str):
+        return value.strip("'").replace("+0000", "Z")
+    return value
+
+
+class OrgStandIn:
+    """ `SFInterface` over `records`, evaluating the conditions and order of the SOQL queries `App` builds
+
+        Deleted records are only returned by `queryAll`, i.e. with `include_deleted`.
+        When `fail_after` is set, the query raises instead of its batch of that index
+    """
+    records: List[Dict[str, Any]] = []
+    queries: List[str] = []
+    fail_after: Optional[int] = None
+
+    def __init__(self, credential_data: Dict[str, str]):
+        self.request_limiter = RequestLimiter()
+        self.http_session = None
+
+    def login(self) -> None:
+        pass
+
+    def describe(self, object_name: str) -> Dict[str, Any]:
+        return {"name": object_name, "queryable": True,
+                "fields": [{"name": "Id", "type": "id", "length": 18},
+                           {"name": "Name", "type": "string", "length": 80},
+                           {"name": "SystemModstamp", "type": "datetime"},
+                           {"name": "IsDeleted", "type": "boolean"}]}
+
+    def _matching(self, soql_query: str, include_deleted: bool) -> List[Dict[str, Any]]:
+        OrgStandIn.queries.append(soql_query)
+        where = re.search(r" WHERE (.*?)(?: ORDER BY | LIMIT |$)", soql_query)
+        order_by = re.search(r" ORDER BY (.*?) (ASC|DESC)", soql_query)
+        matching = []
+        for record in OrgStandIn.records:
+            if record["IsDeleted"] and not include_deleted:
+                continue
+            if where:
+                def evaluate(condition: re.Match) -> str:
+                    field, operator, value = condition.groups()
+                    value = {"true": True, "false": False}.get(value, value)
+                    return str(getattr(comparable(record[field]), OPERATORS[operator])(comparable(value)))
+                if not eval(CONDITION.sub(evaluate, where.group(1)).replace("AND", "and").replace("OR", "or")):
+                    continue
+            matching.append(record)
+        if order_by:
+            fields = [field.strip() for field in order_by.group(1).split(",")]
+            matching.sort(key=lambda record: [comparable(record[field]) for field in fields], reverse=order_by.group(2) == "DESC")
+        return matching
+
+    def count(self, socl_query_str: str) -> int:
+        return len(self._matching(socl_query_str, include_deleted=False))
+
+    def query(self, socl_query_str: str) -> List[Dict[str, Any]]:
+        return [record for batch in self.query_iter(socl_query_str) for record in batch]
+
+    def query_iter(self, socl_query_str: str, batch_size: int = 2000, include_deleted: bool = False) -> Iterator[List[Dict[str, Any]]]:
+        matching = self._matching(socl_query_str, include_deleted)
+        for index, start in enumerate(range(0, len(matching), batch_size)):
+            if OrgStandIn.fail_after is not None and index >= OrgStandIn.fail_after:
+                raise SalesforceFetchError("Connection reset")
+            yield [dict(record) for record in matching[start:start + batch_size]]
+
+
+@pytest.fixture(autouse=True)
+def org():
+    OrgStandIn.records = []
+    OrgStandIn.queries = []
+    OrgStandIn.fail_after = None
+    yield OrgStandIn
+
+
+def make_app(tmp_path, 
+             mapping: Optional[Dict[str, Any]] = None, 
+             sync_config: Optional[Dict[str, Any]] = None,
+             db_config: Optional[Dict[str, Any]] = None) -> App:
+    if "ACCOUNT" in Base.metadata.tables:
+        Base.metadata.remove(Base.metadata.tables["ACCOUNT"])
+    (tmp_path / "credentials.yaml").write_text("{}")
+    # Keys of `mapping` set to `None` are left out
+    mapping = {key: value for key, value in {
+        "salesforce-object": "Account",
+        "db-table": "ACCOUNT",
+        "column-mapping": {"Id": "ID", "Name": "NAME", "SystemModstamp": "MODIFIED", "IsDeleted": "IS_DELETED"},
+        "sync-mode": "incremental",
+        "write-mode": "upsert",
+        **(mapping or {}),
+    }.items() if value is not None}
+    (tmp_path / "mappings.json").write_text(json.dumps([mapping]))
+    (tmp_path / "tables.json").write_text(json.dumps([{
+        "tablename": "ACCOUNT",
+        "columns": [{"name": "ID", "type": "String", "length": 18, "primary_key": True},
+                    {"name": "NAME", "type": "String", "length": 80},
+                    {"name": "MODIFIED", "type": "DateTime"},
+                    {"name": "IS_DELETED", "type": "Boolean"}],
+    }]))
+    (tmp_path / "db.yaml").write_text(yaml.safe_dump({"connection-string": f"sqlite:///{tmp_path / 'target.db'}", **(db_config or {})}))
+    (tmp_path / "sync.yaml").write_text(yaml.safe_dump({"fetch-batch-size": 2, **(sync_config or {})}))
+    return App(path_db_table_def=str(tmp_path / "tables.json"),
+               path_db_config=str(tmp_path / "db.yaml"),
+               path_sf_credentials=str(tmp_path / "credentials.yaml"),
+               path_sf2db_mappings=str(tmp_path / "mappings.json"),
+               salesforce_client_adapter=OrgStandIn,
+               path_sync_config=str(tmp_path / "sync.yaml"))
+
+
+def stored_names(tmp_path) -> Dict[str, str]:
+    with create_engine(f"sqlite:///{tmp_path / 'target.db'}").connect() as connection:
+        return dict(connection.execute(text('SELECT "ID", "NAME" FROM "ACCOUNT"')).all())
+
+
+def stored_watermarks(tmp_path) -> Dict[str, str]:
+    with create_engine(f"sqlite:///{tmp_path / 'target.db'}").connect() as connection:
+        return {key: str(watermark) for key, watermark in connection.execute(text("SELECT mapping_key, watermark FROM sf2db_sync_state")).all()}
+
+
+def test_first_run_fetches_every_record_and_stores_the_highest_watermark(tmp_path, org):
+    org.records = [account(1, "Acme", modstamp(3)), account(2, "Globex", modstamp(5)), account(3, "Initech", modstamp(4))]
+
+    make_app(tmp_path).run()
+
+    assert stored_names(tmp_path) == {"001000000000000001": "Acme", "001000000000000002": "Globex", "001000000000000003": "Initech"}
+    assert stored_watermarks(tmp_path) == {"Account->ACCOUNT": "2024-01-05 00:00:00.000000"}
+    assert "WHERE" not in org.queries[-1] and org.queries[-1].endswith("ORDER BY SystemModstamp ASC")
+
+
+def test_next_run_only_fetches_records_changed_since_the_watermark(tmp_path, org):
+    org.records = [account(1, "Acme", modstamp(3)), account(2, "Globex", modstamp(5))]
+    make_app(tmp_path).run()
+    org.records = [account(1, "Acme", modstamp(3)), account(2, "Globex Corp", modstamp(7)), account(3, "Initech", modstamp(6))]
+    org.queries = []
+
+    app = make_app(tmp_path)
+    app.run()
+
+    assert "WHERE SystemModstamp > 2024-01-05T00:00:00.000Z" in org.queries[-1]
+    assert app.summary[0].succeeded and app.summary[0].rows_fetched == 2
+    assert stored_names(tmp_path) == {"001000000000000001": "Acme", "001000000000000002": "Globex Corp", "001000000000000003": "Initech"}
+    assert stored_watermarks(tmp_path) == {"Account->ACCOUNT": "2024-01-07 00:00:00.000000"}
+
+
+def test_failed_run_keeps_the_previous_watermark(tmp_path, org):
+    org.records = [account(1, "Acme", modstamp(3))]
+    make_app(tmp_path).run()
+    org.records = [account(2, "Globex", modstamp(5)), account(3, "Initech", modstamp(6)), account(4, "Hooli", modstamp(7))]
+    org.fail_after = 1
+
+    app = make_app(tmp_path)
+    app.run()
+
+    # Without checkpoints the mapping is one transaction, so nothing of the failed run is kept
+    assert not app.summary[0].succeeded
+    assert stored_names(tmp_path) == {"001000000000000001": "Acme"}
+    assert stored_watermarks(tmp_path) == {"Account->ACCOUNT": "2024-01-03 00:00:00.000000"}
+
+
+def test_run_without_changes_keeps_the_watermark(tmp_path, org):
+    org.records = [account(1, "Acme", modstamp(3))]
+    make_app(tmp_path).run()
+
+    app = make_app(tmp_path)
+    app.run()
+
+    assert app.summary[0].succeeded and app.summary[0].rows_fetched == 0
+    assert stored_watermarks(tmp_path) == {"Account->ACCOUNT": "2024-01-03 00:00:00.000000"}
+
+
+def stored_checkpoints(tmp_path) -> Dict[str, tuple]:
+    with create_engine(f"sqlite:///{tmp_path / 'target.db'}").connect() as connection:
+        return {key: (last_id, str(last_watermark), rows_committed) for key, last_id, last_watermark, rows_committed
+                in connection.execute(text("SELECT mapping_key, last_id, last_watermark, rows_committed FROM sf2db_sync_checkpoint")).all()}
+
+
+def test_keyset_condition_breaks_ties_on_the_next_field():
+    condition = keyset_condition(["SystemModstamp", "Id"], [datetime(2024, 1, 3, tzinfo=timezone.utc), "001000000000000004"])
+
+    assert condition == ("(SystemModstamp > 2024-01-03T00:00:00.000Z OR "
+                         "(SystemModstamp = 2024-01-03T00:00:00.000Z AND Id > '001000000000000004'))")
+    assert keyset_condition(["Id"], ["001000000000000004"]) == "Id > '001000000000000004'"
+
+
+def test_interrupted_run_resumes_after_the_last_checkpoint(tmp_path, org):
+    # Records 3 to 5 share a watermark, so the checkpoint after record 4 is told apart from them by `Id`
+    org.records = [account(1, "Acme", modstamp(1)), account(2, "Globex", modstamp(2)), account(3, "Initech", modstamp(3)),
+                   account(4, "Hooli", modstamp(3)), account(5, "Umbrella", modstamp(3)), account(6, "Wayne", modstamp(4))]
+    org.fail_after = 2
+
+    app = make_app(tmp_path, sync_config={"checkpoint-interval": 1})
+    app.run()
+
+    # The two batches written before the failure stay committed with the position of their last record
+    assert not app.summary[0].succeeded
+    assert sorted(stored_names(tmp_path)) == [f"00100000000000000{serial}" for serial in range(1, 5)]
+    assert stored_checkpoints(tmp_path) == {"Account->ACCOUNT": ("001000000000000004", "2024-01-03 00:00:00.000000", 4)}
+    assert stored_watermarks(tmp_path) == {}
+
+    org.fail_after = None
+    org.queries = []
+    app = make_app(tmp_path, sync_config={"checkpoint-interval": 1})
+    app.run()
+
+    assert ("WHERE (SystemModstamp > 2024-01-03T00:00:00.000Z OR (SystemModstamp = 2024-01-03T00:00:00.000Z AND Id > '001000000000000004')) "
+            "ORDER BY SystemModstamp, Id ASC") in org.queries[-1]
+    assert app.summary[0].succeeded and app.summary[0].rows_fetched == 2
+    assert sorted(stored_names(tmp_path)) == [f"00100000000000000{serial}" for serial in range(1, 7)]
+    assert stored_checkpoints(tmp_path) == {}
+    assert stored_watermarks(tmp_path) == {"Account->ACCOUNT": "2024-01-04 00:00:00.000000"}
+
+
+def test_interrupted_full_sync_resumes_after_the_last_id(tmp_path, org):
+    org.records = [account(serial, f"Account {serial}", modstamp(10 - serial)) for serial in range(1, 6)]
+    org.fail_after = 1
+    mapping = {"sync-mode": "full", "write-mode": "insert"}
+
+    make_app(tmp_path, mapping=mapping, sync_config={"checkpoint-interval": 1}).run()
+    org.fail_after = None
+    org.queries = []
+    app = make_app(tmp_path, mapping=mapping, sync_config={"checkpoint-interval": 1})
+    app.run()
+
+    # Inserting the first two records again would fail on their primary keys
+    assert "WHERE Id > '001000000000000002' ORDER BY Id ASC" in org.queries[-1]
+    assert app.summary[0].succeeded and app.summary[0].rows_fetched == 3
+    assert len(stored_names(tmp_path)) == 5 and stored_checkpoints(tmp_path) == {}
+
+
+def test_deleted_records_are_deleted_from_the_table(tmp_path, org):
+    org.records = [account(1, "Acme", modstamp(1)), account(2, "Globex", modstamp(2)), account(3, "Initech", modstamp(3))]
+    make_app(tmp_path, mapping={"delete-mode": "hard"}).run()
+    org.records[1] = account(2, "Globex", modstamp(8), is_deleted=True)
+
+    app = make_app(tmp_path, mapping={"delete-mode": "hard"})
+    app.run()
+
+    assert app.summary[0].succeeded and app.summary[0].rows_deleted == 1
+    assert sorted(stored_names(tmp_path)) == ["001000000000000001", "001000000000000003"]
+    # Deletes have a watermark of their own, as they are read apart from the changed records
+    assert stored_watermarks(tmp_path) == {"Account->ACCOUNT": "2024-01-03 00:00:00.000000",
+                                           "Account->ACCOUNT#deleted": "2024-01-08 00:00:00.000000"}
+
+    org.queries = []
+    app = make_app(tmp_path, mapping={"delete-mode": "hard"})
+    app.run()
+
+    assert "WHERE IsDeleted = true AND SystemModstamp > 2024-01-08T00:00:00.000Z ORDER BY SystemModstamp ASC" in org.queries[-1]
+    assert app.summary[0].rows_deleted == 0
+
+
+def test_soft_delete_flags_the_rows_of_deleted_records(tmp_path, org):
+    org.records = [account(1, "Acme", modstamp(1)), account(2, "Globex", modstamp(2))]
+    make_app(tmp_path, mapping={"delete-mode": "soft"}).run()
+    org.records[0] = account(1, "Acme", modstamp(5), is_deleted=True)
+
+    app = make_app(tmp_path, mapping={"delete-mode": "soft"})
+    app.run()
+
+    assert app.summary[0].rows_deleted == 1
+    with create_engine(f"sqlite:///{tmp_path / 'target.db'}").connect() as connection:
+        assert dict(connection.execute(text('SELECT "ID", "IS_DELETED" FROM "ACCOUNT"')).all()) == \
+               {"001000000000000001": True, "001000000000000002": False}
+
+
+def test_replayed_chunk_does_not_advance_the_watermark(tmp_path, org):
+    # Ids far apart so they fall in separate ranges; the lowest Ids were changed last
+    org.records = [dict(account(serial, f"Account {serial}", modstamp(20 - serial)), Id=f"001{serial:012d}AAA") for serial in range(1, 10)]
+    sync_config = {"spool-dir": str(tmp_path / "spool")}
+    # As left by a run whose first range failed to load and whose other ranges failed to fetch
+    write_spool(spool_file(sync_config["spool-dir"], "Account->ACCOUNT", "chunk-000"), [org.records[:3]])
+
+    app = make_app(tmp_path, mapping={"chunks": 3}, sync_config=sync_config)
+    app.run()
+
+    assert app.summary[0].succeeded
+    assert len(stored_names(tmp_path)) == 9
+    # The replayed range is fetched again with the others, as the watermark was not advanced past them
+    assert app.summary[0].rows_fetched == 3 + 9 and app.summary[0].rows_written == 3 + 9
+    assert stored_watermarks(tmp_path) == {"Account->ACCOUNT": "2024-01-19 00:00:00.000000"}
+    assert pending_spool_files(sync_config["spool-dir"], "Account->ACCOUNT") == []
+
+
+def test_replayed_records_complete_an_unchunked_run(tmp_path, org):
+    org.records = [account(1, "Acme", modstamp(3)), account(2, "Globex", modstamp(5))]
+    sync_config = {"spool-dir": str(tmp_path / "spool")}
+    write_spool(spool_file(sync_config["spool-dir"], "Account->ACCOUNT", "records"), [org.records])
+
+    app = make_app(tmp_path, sync_config=sync_config)
+    app.run()
+
+    # The file holds every record of its run, so they are not fetched again
+    assert "WHERE SystemModstamp > 2024-01-05T00:00:00.000Z" in org.queries[-1]
+    assert app.summary[0].rows_fetched == 2 and app.summary[0].rows_written == 2
+    assert stored_watermarks(tmp_path) == {"Account->ACCOUNT": "2024-01-05 00:00:00.000000"}
+
+
+@pytest.mark.parametrize("sync_config", [{}, {"max-workers": 2}], ids=["chunks", "chunks-and-workers"])
+def test_chunked_bulk_load_into_sqlite_is_not_locked_out(tmp_path, org, sync_config):
+    org.records = [dict(account(serial, f"Account {serial}", modstamp(1)), Id=f"001{serial:012d}AAA") for serial in range(1, 31)]
+
+    # Into an empty table, so a full load with the `bulk-load` settings
+    app = make_app(tmp_path, mapping={"sync-mode": "full", "write-mode": "insert", "chunks": 3},
+                   sync_config={"fetch-batch-size": 200, **sync_config}, db_config={"bulk-load": {"enabled": True}})
+    app.run()
+
+    assert app.summary[0].succeeded, app.summary[0].error
+    assert len(stored_names(tmp_path)) == 30
+
+
+def test_incremental_mappings_upsert_by_default(tmp_path, org):
+    org.records = [account(1, "Acme", modstamp(3)), account(2, "Globex", modstamp(5))]
+    make_app(tmp_path, mapping={"write-mode": None}).run()
+    # Stored by the first run, so inserting it again would fail on its primary key
+    org.records[0] = account(1, "Acme Inc", modstamp(7))
+
+    app = make_app(tmp_path, mapping={"write-mode": None})
+    app.run()
+
+    assert app.summary[0].succeeded, app.summary[0].error
+    assert stored_names(tmp_path) == {"001000000000000001": "Acme Inc", "001000000000000002": "Globex"}
+
+
+def test_incremental_mappings_can_not_insert(tmp_path):
+    app = make_app(tmp_path, mapping={"write-mode": "insert"})
+
+    with pytest.raises(MappingValueError, match="Write mode `insert` can not be combined with sync mode `incremental`"):
+        app.run()
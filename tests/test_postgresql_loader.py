@@ -0,0 +1,109 @@
+"""
+    `PostgreSQLCopyLoader` against a PostgreSQL server, with both the psycopg2 and psycopg 3 drivers (see `conftest.py`)
+"""
+
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+
+from sf2db.db.loaders import PostgreSQLCopyLoader, get_loader
+from sf2db.db.model_factory import generate_db_table, generate_db_table_definition
+from sf2db.db.session import DBSession, DuplicateRecordError
+
+COPY_TABLE = generate_db_table(generate_db_table_definition({
+    "tablename": "sf2db_test_copy_loader",
+    "columns": [
+        {"name": "ID", "type": "String", "length": 18, "primary_key": True},
+        {"name": "NAME", "type": "String", "length": 80},
+        {"name": "DESCRIPTION", "type": "Text"},
+        {"name": "AMOUNT", "type": "Numeric", "precision": 18, "scale": 2},
+        {"name": "IS_ACTIVE", "type": "Boolean"},
+        {"name": "CLOSE_DATE", "type": "Date"},
+        {"name": "MODIFIED", "type": "DateTime"},
+    ],
+}))
+TABLE = COPY_TABLE.__table__
+
+
+def row(id_: str, **values):
+    return {"ID": id_, "NAME": None, "DESCRIPTION": None, "AMOUNT": None, "IS_ACTIVE": None, "CLOSE_DATE": None, "MODIFIED": None, **values}
+
+
+@pytest.fixture(params=["psycopg2", "psycopg"])
+def db_session(request, postgresql_url):
+    pytest.importorskip(request.param)
+    session = DBSession(make_url(postgresql_url).set(drivername=f"postgresql+{request.param}"))
+    TABLE.drop(session.engine, checkfirst=True)
+    TABLE.create(session.engine)
+    yield session
+    TABLE.drop(session.engine, checkfirst=True)
+    session.dispose()
+
+
+def load(db_session: DBSession, rows, write_mode: str = "insert") -> int:
+    loader = get_loader(db_session.engine.dialect)
+    assert isinstance(loader, PostgreSQLCopyLoader)
+    with db_session as session:
+        return loader.load(session, db_table=COPY_TABLE, rows=rows, write_mode=write_mode)
+
+
+def stored_rows(db_session: DBSession):
+    with db_session.engine.connect() as connection:
+        return {stored["ID"]: dict(stored) for stored in connection.execute(select(TABLE)).mappings()}
+
+
+def test_copy_round_trips_text_that_needs_escaping(db_session):
+    rows = [
+        row("001A", NAME="Tab\tseparated", DESCRIPTION="Line one\nLine two\r\nLine three"),
+        row("001B", NAME="C:\\new\\table", DESCRIPTION="Ends with a backslash \\"),
+        # The text of a NULL in the COPY format must not be read as one
+        row("001C", NAME="\\N", DESCRIPTION=""),
+        row("001D", NAME="Crème brûlée ☕", DESCRIPTION="\\t is not a tab"),
+        row("001E"),
+    ]
+
+    assert load(db_session, rows) == len(rows)
+
+    stored = stored_rows(db_session)
+    assert {id_: (values["NAME"], values["DESCRIPTION"]) for id_, values in stored.items()} == \
+           {row["ID"]: (row["NAME"], row["DESCRIPTION"]) for row in rows}
+
+
+def test_copy_writes_typed_values(db_session):
+    rows = [
+        row("001A", AMOUNT=Decimal("1234.56"), IS_ACTIVE=True, CLOSE_DATE=date(2024, 2, 29),
+            MODIFIED=datetime(2023, 7, 11, 9, 8, 46, 123000, tzinfo=timezone.utc)),
+        # Timestamps without time zone are stored in UTC, like the values bound by the other loaders
+        row("001B", AMOUNT=Decimal("-0.01"), IS_ACTIVE=False,
+            MODIFIED=datetime(2023, 7, 11, 11, 8, 46, tzinfo=timezone(timedelta(hours=2)))),
+    ]
+
+    load(db_session, rows)
+
+    stored = stored_rows(db_session)
+    assert stored["001A"] == row("001A", AMOUNT=Decimal("1234.56"), IS_ACTIVE=True, CLOSE_DATE=date(2024, 2, 29),
+                                 MODIFIED=datetime(2023, 7, 11, 9, 8, 46, 123000))
+    assert stored["001B"] == row("001B", AMOUNT=Decimal("-0.01"), IS_ACTIVE=False, MODIFIED=datetime(2023, 7, 11, 9, 8, 46))
+
+
+def test_duplicate_keys_are_wrapped_and_rolled_back(db_session):
+    load(db_session, [row("001A", NAME="First")])
+
+    with pytest.raises(DuplicateRecordError) as raised:
+        load(db_session, [row("001B", NAME="New"), row("001A", NAME="Duplicate")])
+
+    assert isinstance(raised.value.__cause__, IntegrityError)
+    assert {id_: values["NAME"] for id_, values in stored_rows(db_session).items()} == {"001A": "First"}
+
+
+def test_upsert_updates_existing_rows(db_session):
+    load(db_session, [row("001A", NAME="First"), row("001B", NAME="Second")])
+
+    assert load(db_session, [row("001A", NAME="Updated"), row("001C", NAME="Third")], write_mode="upsert") == 2
+
+    assert {id_: values["NAME"] for id_, values in stored_rows(db_session).items()} == \
+           {"001A": "Updated", "001B": "Second", "001C": "Third"}
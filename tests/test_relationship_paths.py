@@ -0,0 +1,64 @@
+"""
+    Relationship paths such as `Owner.Name` in `column-mapping`, read from records of the REST and Bulk APIs
+    (see `path_getter`, `compile_converter` and `validate_mapping`)
+"""
+
+from datetime import datetime, timezone
+
+import pytest
+import sqlalchemy
+
+from sf2db.mapping.model_factory import mapping_factory
+from sf2db.salesforce.describe import validate_mapping
+from sf2db.util.sf_to_db_converter import compile_converter, convert
+
+SALESFORCE_FIELDS = ["Id", "Owner.Name", "Account.Owner.Email", "Owner.LastLoginDate"]
+DB_COLUMNS = ["ID", "OWNER_NAME", "ACCOUNT_OWNER_EMAIL", "OWNER_LAST_LOGIN"]
+COLUMN_TYPES = {"ID": sqlalchemy.String(18), "OWNER_NAME": sqlalchemy.String(255),
+                "ACCOUNT_OWNER_EMAIL": sqlalchemy.String(255), "OWNER_LAST_LOGIN": sqlalchemy.DateTime()}
+
+REST_RECORD = {
+    "attributes": {"type": "Contact"},
+    "Id": "0039j000008WrENAA0",
+    "Owner": {"attributes": {"type": "User"}, "Name": "Ada Lovelace", "LastLoginDate": "2023-07-11T09:08:46.000+0000"},
+    "Account": {"attributes": {"type": "Account"}, "Owner": {"attributes": {"type": "User"}, "Email": "ada@example.com"}},
+}
+BULK_RECORD = {"Id": "0039j000008WrENAA0", "Owner.Name": "Ada Lovelace", "Account.Owner.Email": "ada@example.com",
+               "Owner.LastLoginDate": "2023-07-11T09:08:46.000+0000"}
+EXPECTED_ROW = {"ID": "0039j000008WrENAA0", "OWNER_NAME": "Ada Lovelace", "ACCOUNT_OWNER_EMAIL": "ada@example.com",
+                "OWNER_LAST_LOGIN": datetime(2023, 7, 11, 9, 8, 46, tzinfo=timezone.utc)}
+
+
+@pytest.mark.parametrize("record", [REST_RECORD, BULK_RECORD], ids=["rest", "bulk"])
+def test_paths_are_flattened_into_columns(record):
+    converter = compile_converter(SALESFORCE_FIELDS, DB_COLUMNS, COLUMN_TYPES)
+
+    assert converter(record) == EXPECTED_ROW
+
+
+def test_missing_parents_are_null():
+    converter = compile_converter(SALESFORCE_FIELDS, DB_COLUMNS, COLUMN_TYPES)
+
+    row = converter({"Id": "0039j000008WrENAA0", "Owner": {"Name": "Ada Lovelace", "LastLoginDate": None}, "Account": None})
+
+    assert row == {"ID": "0039j000008WrENAA0", "OWNER_NAME": "Ada Lovelace", "ACCOUNT_OWNER_EMAIL": None, "OWNER_LAST_LOGIN": None}
+
+
+def test_legacy_convert_resolves_paths():
+    assert convert(REST_RECORD, SALESFORCE_FIELDS, DB_COLUMNS) == EXPECTED_ROW
+
+
+def test_paths_must_start_with_a_relationship_of_the_object():
+    describe = {"name": "Contact", "queryable": True,
+                "fields": [{"name": "Id", "type": "id"},
+                           {"name": "OwnerId", "type": "reference", "relationshipName": "Owner"},
+                           {"name": "AccountId", "type": "reference", "relationshipName": "Account"}]}
+    mapping = mapping_factory({"salesforce-object": "Contact",
+                               "db-table": "CONTACT",
+                               "column-mapping": {"Id": "ID", "Owner.Name": "OWNER_NAME", "owner.Email": "OWNER_EMAIL",
+                                                  "Manager.Name": "MANAGER_NAME"}})
+
+    assert validate_mapping(describe, mapping) == [
+        "Relationship `owner` of `owner.Email` must be spelled `Owner`",
+        "Field `Manager.Name` does not start with a relationship of `Contact`",
+    ]